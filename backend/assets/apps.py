@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AssetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assets'
+
+    def ready(self):
+        # Invalidate cached asset statistics, release deleted documents' files and
+        # restore the asset search triggers after migrations
+        from . import signals
+        signals.connect()
@@ -0,0 +1,262 @@
+"""
+Content-addressed storage for asset documents
+
+Document uploads stream straight to a temporary file through
+DocumentUploadHandler, which hashes each chunk as it arrives, checks the
+file's leading bytes against FILE_UPLOAD_MAGIC_NUMBERS and stops writing
+once MAX_UPLOAD_SIZE is exceeded - the upload is never re-read to validate
+it. The finished file is stored once per SHA-256 under BLOB_PREFIX, so the
+same manual attached to fifty assets occupies one blob; a blob is deleted
+when the last document referencing it is. Storing and releasing a blob both
+lock its DocumentBlob row first, so an upload reusing a blob and the release
+of that blob's last document take turns: either the upload's document is
+committed before the release checks for references, or the release has
+deleted the file before the upload checks for it and stores it again.
+
+Downloads are served by document_response with the content hash as ETag
+(conditional requests get 304) and single byte ranges (206), so clients
+resume or revalidate large PDFs instead of transferring them again.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+
+BLOB_PREFIX = 'assets/documents/blobs/'
+# Longest signature in FILE_UPLOAD_MAGIC_NUMBERS
+MAGIC_BYTES = 16
+STREAM_BLOCK_SIZE = 64 * 1024
+
+EXTENSION_ALIASES = {'jpg': 'jpeg'}
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def blob_name(content_hash):
+    return f'{BLOB_PREFIX}{content_hash[:2]}/{content_hash}'
+
+
+def guess_content_type(file_name):
+    return mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+
+
+def check_file_type(file_name, head):
+    """Error message if the name or leading bytes are not an allowed document, else None"""
+    extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+    if guess_content_type(file_name) not in settings.ALLOWED_DOCUMENT_TYPES:
+        return f'Unsupported document type: .{extension}' if extension else 'Unsupported document type'
+    signatures = settings.FILE_UPLOAD_MAGIC_NUMBERS.get(EXTENSION_ALIASES.get(extension, extension))
+    if signatures and not any(head.startswith(signature) for signature in signatures):
+        return f'File content does not match the .{extension} extension'
+    return None
+
+
+class DocumentUploadHandler(TemporaryFileUploadHandler):
+    """
+    Write uploads to a temporary file while hashing them and validating
+    their first bytes and size. The resulting file carries content_hash and
+    upload_error (None when the file is acceptable).
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.head = b''
+        self.size = 0
+        self.error = None
+        self.checked = False
+
+    def _check_head(self):
+        self.checked = True
+        self.error = check_file_type(self.file_name or '', self.head)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        if not self.checked:
+            self.head += raw_data[:MAGIC_BYTES - len(self.head)]
+            if len(self.head) >= MAGIC_BYTES:
+                self._check_head()
+                if self.error:
+                    return None
+        self.size += len(raw_data)
+        if self.size > settings.MAX_UPLOAD_SIZE:
+            self.error = f'File size must be less than {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB'
+            return None
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            self._check_head()
+        upload = super().file_complete(self.size)
+        upload.content_hash = self.digest.hexdigest()
+        upload.upload_error = self.error
+        return upload
+
+
+def inspect_upload(upload):
+    """Hash and validate an upload that did not pass through DocumentUploadHandler"""
+    if not hasattr(upload, 'content_hash'):
+        digest = hashlib.sha256()
+        head = b''
+        for chunk in upload.chunks():
+            head += chunk[:MAGIC_BYTES - len(head)]
+            digest.update(chunk)
+        upload.seek(0)
+        upload.content_hash = digest.hexdigest()
+        upload.upload_error = check_file_type(upload.name or '', head)
+        if not upload.upload_error and upload.size > settings.MAX_UPLOAD_SIZE:
+            upload.upload_error = f'File size must be less than {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB'
+    return upload.upload_error
+
+
+def lock_blob(name):
+    """
+    Lock the blob's row until the current transaction ends, creating it if
+    needed. The row is updated rather than read with select_for_update,
+    which SQLite ignores: the write takes SQLite's database lock too.
+    """
+    from .models import DocumentBlob
+
+    if not DocumentBlob.objects.filter(name=name).update(locked_at=timezone.now()):
+        DocumentBlob.objects.get_or_create(name=name)
+        DocumentBlob.objects.filter(name=name).update(locked_at=timezone.now())
+
+
+def store_blob(upload, storage):
+    """
+    Store an inspected upload under its content hash (once); returns the blob
+    name. Call inside the transaction that creates the document, so the blob
+    stays locked until the document referencing it is committed.
+    """
+    name = blob_name(upload.content_hash)
+    lock_blob(name)
+    if not storage.exists(name):
+        saved = storage.save(name, upload)
+        if saved != name:
+            # Stored concurrently by another upload of the same content
+            storage.delete(saved)
+    return name
+
+
+def document_fields(upload, storage):
+    """Model field values for a document stored from an inspected upload"""
+    return {
+        'file': store_blob(upload, storage),
+        'file_name': os.path.basename(upload.name),
+        'content_hash': upload.content_hash,
+        'content_type': guess_content_type(upload.name),
+        'size': upload.size,
+    }
+
+
+def release_blob(name, storage):
+    """Delete a stored file once the transaction commits, unless a document still uses it"""
+    from .models import AssetDocument, DocumentBlob
+
+    def delete_unreferenced():
+        with transaction.atomic():
+            lock_blob(name)
+            if AssetDocument.objects.filter(file=name).exists():
+                return
+            if storage.exists(name):
+                storage.delete(name)
+            DocumentBlob.objects.filter(name=name).delete()
+
+    if name:
+        transaction.on_commit(delete_unreferenced)
+
+
+def parse_range(header, size):
+    """(start, end) for a single satisfiable byte range, None to send everything, False if unsatisfiable"""
+    match = RANGE_PATTERN.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def _read_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            block = file.read(min(STREAM_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        file.close()
+
+
+def _hash_stored_file(document):
+    """Hash a document stored before content addressing, recording it for later requests"""
+    from .models import AssetDocument
+
+    digest = hashlib.sha256()
+    size = 0
+    with document.file.open('rb') as file:
+        for chunk in file.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+    document.content_hash, document.size = digest.hexdigest(), size
+    AssetDocument.objects.filter(pk=document.pk).update(content_hash=document.content_hash, size=size)
+
+
+def document_response(request, document):
+    """The document's file, honouring If-None-Match, Range and If-Range"""
+    if not document.content_hash or document.size is None:
+        _hash_stored_file(document)
+    etag = f'"{document.content_hash}"'
+    headers = {
+        'ETag': etag,
+        'Accept-Ranges': 'bytes',
+        # Documents are access-controlled: browsers may keep them but must revalidate
+        'Cache-Control': 'private, no-cache',
+    }
+
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        return HttpResponse(status=304, headers=headers)
+
+    size = document.size
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag:
+        byte_range = None
+    if byte_range is False:
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    file_name = document.file_name or os.path.basename(document.file.name)
+    content_type = document.content_type or guess_content_type(file_name)
+    file = document.file.storage.open(document.file.name, 'rb')
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(file, start, end - start + 1), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = str(size)
+    response['Content-Disposition'] = content_disposition_header(True, file_name)
+    for header, value in headers.items():
+        response[header] = value
+    return response
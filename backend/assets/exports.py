@@ -0,0 +1,264 @@
+"""
+Streaming fleet export
+
+The export action writes every asset matching the list filters, optionally
+joined (`include=location,driver,fuel` or `include=all`) with the asset's
+current location, current driver and last fuel fill. The joins are a LEFT
+JOIN on the location summary and correlated subqueries on the latest driver
+assignment and fuel transaction, so the whole export is one query read
+through a server-side cursor EXPORT_CHUNK_SIZE rows at a time.
+
+CSV and NDJSON are written incrementally in chunks of about
+EXPORT_BUFFER_BYTES. Parquet (for analytics tools) is written one row group
+per chunk when pyarrow is installed. Memory stays bounded by the chunk size
+whatever the fleet size.
+"""
+from django.db.models import OuterRef, Subquery
+import csv
+import json
+
+from config.streaming import LineBuffer, buffered
+from drivers.models import DriverAssetAssignment
+from fuel.models import FuelTransaction
+
+
+# Rows fetched per database round-trip (and per Parquet row group), and bytes
+# buffered per streamed chunk
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# (column, queryset lookup)
+ASSET_COLUMNS = [
+    ('asset_id', 'asset_id'),
+    ('vehicle_type', 'vehicle_type'),
+    ('make', 'make'),
+    ('model', 'model'),
+    ('year', 'year'),
+    ('vin', 'vin'),
+    ('license_plate', 'license_plate'),
+    ('department', 'department'),
+    ('status', 'status'),
+    ('current_odometer', 'current_odometer'),
+    ('purchase_date', 'purchase_date'),
+    ('purchase_cost', 'purchase_cost'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+INCLUDE_COLUMNS = {
+    'location': [
+        ('location_latitude', 'current_location__latitude'),
+        ('location_longitude', 'current_location__longitude'),
+        ('location_timestamp', 'current_location__timestamp'),
+        ('location_source', 'current_location__source'),
+        ('location_zone', 'current_location__current_zone__name'),
+    ],
+    'driver': [
+        ('driver_id', 'export_driver_id'),
+        ('driver_first_name', 'export_driver_first_name'),
+        ('driver_last_name', 'export_driver_last_name'),
+        ('driver_assigned_date', 'export_driver_assigned_date'),
+    ],
+    'fuel': [
+        ('last_fuel_timestamp', 'export_fuel_timestamp'),
+        ('last_fuel_product_type', 'export_fuel_product_type'),
+        ('last_fuel_volume', 'export_fuel_volume'),
+        ('last_fuel_unit', 'export_fuel_unit'),
+        ('last_fuel_total_cost', 'export_fuel_total_cost'),
+        ('last_fuel_odometer', 'export_fuel_odometer'),
+    ],
+}
+# Subquery annotations: name -> lookup on the current assignment / last fill
+DRIVER_ANNOTATIONS = {
+    'export_driver_id': 'driver__driver_id',
+    'export_driver_first_name': 'driver__first_name',
+    'export_driver_last_name': 'driver__last_name',
+    'export_driver_assigned_date': 'assigned_date',
+}
+FUEL_ANNOTATIONS = {
+    'export_fuel_timestamp': 'timestamp',
+    'export_fuel_product_type': 'product_type',
+    'export_fuel_volume': 'volume',
+    'export_fuel_unit': 'unit',
+    'export_fuel_total_cost': 'total_cost',
+    'export_fuel_odometer': 'odometer',
+}
+
+
+def parse_includes(value):
+    """Requested joins from `include`; raises ValueError naming unknown ones"""
+    names = [part.strip().lower() for part in (value or '').split(',') if part.strip()]
+    if 'all' in names:
+        return list(INCLUDE_COLUMNS)
+    unknown = [name for name in names if name not in INCLUDE_COLUMNS]
+    if unknown:
+        raise ValueError(
+            f'Unknown include: {", ".join(unknown)} (choose from {", ".join(INCLUDE_COLUMNS)} or all)'
+        )
+    return [name for name in INCLUDE_COLUMNS if name in names]
+
+
+def _annotate_includes(queryset, includes):
+    if 'driver' in includes:
+        current = DriverAssetAssignment.objects.filter(
+            asset=OuterRef('pk'), status='active', unassigned_date__isnull=True
+        ).order_by('priority', '-assigned_date')
+        queryset = queryset.annotate(**{
+            name: Subquery(current.values(lookup)[:1]) for name, lookup in DRIVER_ANNOTATIONS.items()
+        })
+    if 'fuel' in includes:
+        # Served by the (asset, -timestamp) index
+        last_fill = FuelTransaction.objects.filter(asset=OuterRef('pk')).order_by('-timestamp')
+        queryset = queryset.annotate(**{
+            name: Subquery(last_fill.values(lookup)[:1]) for name, lookup in FUEL_ANNOTATIONS.items()
+        })
+    return queryset
+
+
+def export_rows(queryset, includes):
+    """(column names, iterator of value tuples) for the assets in queryset"""
+    columns = ASSET_COLUMNS + [column for name in includes for column in INCLUDE_COLUMNS[name]]
+    rows = (
+        _annotate_includes(queryset, includes)
+        .values_list(*[lookup for _, lookup in columns])
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return [name for name, _ in columns], rows
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def export_csv(columns, rows):
+    buffer = LineBuffer()
+    writer = csv.writer(buffer)
+
+    def lines():
+        writer.writerow(columns)
+        yield buffer.drain()
+        for row in rows:
+            writer.writerow([_text(value) for value in row])
+            yield buffer.drain()
+
+    return buffered(lines(), EXPORT_BUFFER_BYTES)
+
+
+def export_ndjson(columns, rows):
+    def json_value(value):
+        if value is None or isinstance(value, (int, float, str)):
+            return value
+        return _text(value)
+
+    def lines():
+        for row in rows:
+            yield json.dumps({column: json_value(value) for column, value in zip(columns, row)}) + '\n'
+
+    return buffered(lines(), EXPORT_BUFFER_BYTES)
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _ByteSink:
+    """Write-only file for pyarrow that hands back what was written"""
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _parquet_type(pa, field):
+    internal_type = field.get_internal_type()
+    if internal_type in ('IntegerField', 'PositiveIntegerField', 'BigIntegerField', 'SmallIntegerField',
+                         'PositiveSmallIntegerField', 'AutoField', 'BigAutoField'):
+        return pa.int64()
+    if internal_type == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if internal_type == 'FloatField':
+        return pa.float64()
+    if internal_type == 'DateField':
+        return pa.date32()
+    if internal_type == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC')
+    return pa.string()
+
+
+def _lookup_field(model, lookup):
+    """Model field a values_list lookup (or export annotation) reads"""
+    if lookup in DRIVER_ANNOTATIONS:
+        model, lookup = DriverAssetAssignment, DRIVER_ANNOTATIONS[lookup]
+    elif lookup in FUEL_ANNOTATIONS:
+        model, lookup = FuelTransaction, FUEL_ANNOTATIONS[lookup]
+    *path, name = lookup.split('__')
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(name)
+
+
+def export_parquet(model, columns, rows, includes):
+    """Parquet with one row group per EXPORT_CHUNK_SIZE rows"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    lookups = dict(ASSET_COLUMNS + [column for name in includes for column in INCLUDE_COLUMNS[name]])
+    schema = pa.schema([
+        (column, _parquet_type(pa, _lookup_field(model, lookups[column]))) for column in columns
+    ])
+
+    def record_batch(batch):
+        return pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)],
+            schema=schema
+        )
+
+    def chunks():
+        sink = _ByteSink()
+        writer = pq.ParquetWriter(sink, schema, compression='snappy')
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= EXPORT_CHUNK_SIZE:
+                writer.write_batch(record_batch(batch))
+                batch = []
+                yield sink.drain()
+        if batch:
+            writer.write_batch(record_batch(batch))
+        writer.close()
+        yield sink.drain()
+
+    return chunks()
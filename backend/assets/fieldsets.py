@@ -0,0 +1,82 @@
+"""
+Sparse fieldsets and expansions for API responses
+
+`?fields=id,asset_id,make` limits a read response to the listed fields.
+Nested relations a serializer lists in Meta.expandable_fields are included
+when `?expand=` (or `fields=`) names them; `?expand=` alone keeps every
+plain field and only the named relations. Without either parameter the
+full payload is returned as before.
+
+Views mixing in ExpandableQueryMixin join or prefetch a relation only when
+its expansion is requested, so unrequested relations are never queried.
+Only the top-level serializer of a response is trimmed; nested serializers
+keep their fields.
+"""
+from rest_framework import permissions
+
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _param_list(request, name):
+    if request is None or name not in request.query_params:
+        return None
+    return {part.strip() for part in request.query_params[name].split(',') if part.strip()}
+
+
+def requested_fieldset(request):
+    """(fields, expand) named by the request, each None when not given"""
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None, None
+    return _param_list(request, FIELDS_PARAM), _param_list(request, EXPAND_PARAM)
+
+
+def expansion_requested(request, name):
+    """Whether a response to the request includes the expandable field name"""
+    fields, expand = requested_fieldset(request)
+    if fields is None and expand is None:
+        return True
+    return name in (fields or set()) or name in (expand or set())
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin honouring the fields and expand query parameters"""
+
+    def _is_response_root(self):
+        root = self.root
+        return root is self or getattr(root, 'child', None) is self
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        only, expand = requested_fieldset(request)
+        if (only is None and expand is None) or not self._is_response_root():
+            return fields
+
+        expandable = set(getattr(self.Meta, 'expandable_fields', []))
+        wanted = only if only is not None else set(fields) - expandable
+        wanted = wanted | ((expand or set()) & expandable)
+        return {name: field for name, field in fields.items() if name in wanted}
+
+
+class ExpandableQueryMixin:
+    """
+    ViewSet mixin loading relations only for requested expansions:
+    - expansion_select_related: {field name: [select_related lookups]}
+    - expansion_prefetch_related: {field name: [prefetch_related lookups]}
+    """
+    expansion_select_related = {}
+    expansion_prefetch_related = {}
+    expansion_actions = ['list', 'retrieve']
+
+    def expand_queryset(self, queryset):
+        if self.action not in self.expansion_actions:
+            return queryset
+        for name, lookups in self.expansion_select_related.items():
+            if expansion_requested(self.request, name):
+                queryset = queryset.select_related(*lookups)
+        for name, lookups in self.expansion_prefetch_related.items():
+            if expansion_requested(self.request, name):
+                queryset = queryset.prefetch_related(*lookups)
+        return queryset
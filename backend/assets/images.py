@@ -0,0 +1,204 @@
+"""
+Off-request image processing for asset images (and driver photos)
+
+Uploads are stored as-is while the request is handled; the model records
+the SHA-256 of the source and marks it pending. Resizing and re-encoding
+then run as a background job (see jobs.handlers) in the run_jobs worker
+pool, or inline when IMAGE_PROCESSING_ASYNC is off (and under tests).
+
+A job carries the source hash it was queued for and writes its results with
+a conditional update on that hash, so a job overtaken by a newer upload
+discards its output instead of clobbering the newer image. Saving a model
+without a new upload, or uploading the same bytes again, never reprocesses.
+
+Besides the main image and thumbnail, each asset source is rendered at
+DERIVATIVE_WIDTHS in every IMAGE_DERIVATIVE_FORMATS format. Derivative files
+are named after the source hash and width, so identical uploads share them,
+they are only ever encoded once, and their URLs never change content - they
+are served with far-future immutable cache headers (see DERIVATIVE_PREFIX).
+"""
+from io import BytesIO
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+
+logger = logging.getLogger(__name__)
+
+MAIN_SIZE = (800, 600)
+THUMBNAIL_SIZE = (150, 150)
+
+DERIVATIVE_PREFIX = 'assets/images/derivatives/'
+DERIVATIVE_WIDTHS = [64, 150, 400, 800]
+# format -> (file extension, Pillow save options)
+DERIVATIVE_ENCODERS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}),
+    'avif': ('avif', {'format': 'AVIF', 'quality': 60}),
+}
+
+
+def file_digest(field_file):
+    """SHA-256 of an uploaded (not yet stored) file, leaving it rewound"""
+    digest = hashlib.sha256()
+    for chunk in field_file.chunks():
+        digest.update(chunk)
+    field_file.seek(0)
+    return digest.hexdigest()
+
+
+def open_rgb(field_file):
+    field_file.open('rb')
+    try:
+        image = Image.open(field_file)
+        image.load()
+    finally:
+        field_file.close()
+    # Convert to RGB if necessary (handles RGBA, P mode images)
+    if image.mode in ('RGBA', 'P'):
+        image = image.convert('RGB')
+    return image
+
+
+def encode_jpeg(image):
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    return ContentFile(output.getvalue())
+
+
+def derivative_formats():
+    return getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', ['webp', 'jpeg'])
+
+
+def derivative_name(source_hash, width, extension):
+    return f'{DERIVATIVE_PREFIX}{source_hash[:2]}/{source_hash}-{width}.{extension}'
+
+
+def render_derivatives(image, source_hash, storage):
+    """
+    Write the width/format derivatives of a source image, skipping files that
+    already exist for this hash. Returns {format: {width: name}}; widths wider
+    than the source are capped at the source width.
+    """
+    variants = {}
+    width, height = image.size
+    for target in DERIVATIVE_WIDTHS:
+        scaled_width = min(target, width)
+        if variants and str(scaled_width) in next(iter(variants.values())):
+            break
+        scaled = None
+        for image_format in derivative_formats():
+            extension, options = DERIVATIVE_ENCODERS[image_format]
+            name = derivative_name(source_hash, scaled_width, extension)
+            if not storage.exists(name):
+                if scaled is None:
+                    scaled_height = max(1, round(height * scaled_width / width))
+                    scaled = image.resize((scaled_width, scaled_height), Image.Resampling.LANCZOS)
+                output = BytesIO()
+                scaled.save(output, **options)
+                storage.save(name, ContentFile(output.getvalue()))
+            variants.setdefault(image_format, {})[str(scaled_width)] = name
+    return variants
+
+
+def release_derivatives(variants, storage):
+    """Delete derivative files no asset's current source still uses"""
+    from .models import Asset
+
+    names = [name for by_width in (variants or {}).values() for name in by_width.values()]
+    hashes = {os.path.basename(name).split('-')[0] for name in names}
+    in_use = set(Asset.objects.filter(image_hash__in=hashes).values_list('image_hash', flat=True))
+    for name in names:
+        if os.path.basename(name).split('-')[0] not in in_use and storage.exists(name):
+            storage.delete(name)
+
+
+def image_srcset(variants, request=None):
+    """{format: 'url 64w, url 150w, ...'} for an asset's derivatives"""
+    from django.core.files.storage import default_storage
+
+    srcset = {}
+    for image_format, by_width in (variants or {}).items():
+        candidates = []
+        for width, name in sorted(by_width.items(), key=lambda item: int(item[0])):
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            candidates.append(f'{url} {width}w')
+        srcset[image_format] = ', '.join(candidates)
+    return srcset
+
+
+def square_crop(image):
+    """Center square of the image"""
+    width, height = image.size
+    if width > height:
+        return image.crop(((width - height) / 2, 0, (width + height) / 2, height))
+    return image.crop((0, (height - width) / 2, width, (height + width) / 2))
+
+
+def schedule(job_type, processor, instance_id, source_hash):
+    """
+    Queue processing of a newly stored source, or run it now when
+    IMAGE_PROCESSING_ASYNC is off. Returns True if it ran inline.
+    """
+    if getattr(settings, 'IMAGE_PROCESSING_ASYNC', False):
+        from jobs.runner import enqueue
+        params = {'id': str(instance_id), 'source_hash': source_hash}
+        transaction.on_commit(lambda: enqueue(job_type, params=params))
+        return False
+    processor(instance_id, source_hash)
+    return True
+
+
+def _replace_files(storage, old_names, new_names):
+    for name in old_names:
+        if name and name not in new_names and storage.exists(name):
+            storage.delete(name)
+
+
+def process_asset_image(asset_pk, source_hash):
+    """
+    Render the main image and square thumbnail for an asset's stored source.
+    Returns the resulting status ('ready', 'failed' or 'stale').
+    """
+    from .models import Asset
+
+    asset = Asset.objects.filter(pk=asset_pk, image_hash=source_hash).first()
+    if asset is None or not asset.image:
+        return 'stale'
+    current = Asset.objects.filter(pk=asset_pk, image_hash=source_hash)
+    current.update(image_status='processing')
+
+    source_name = asset.image.name
+    old_thumbnail = asset.thumbnail.name if asset.thumbnail else None
+    old_variants = asset.image_variants
+    storage = asset.image.storage
+    try:
+        image = open_rgb(asset.image)
+        variants = render_derivatives(image, source_hash, storage)
+        image.thumbnail(MAIN_SIZE, Image.Resampling.LANCZOS)
+        asset.image.save(f"{asset.asset_id}_main.jpg", encode_jpeg(image), save=False)
+
+        thumbnail = square_crop(image).resize(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        asset.thumbnail.save(f"{asset.asset_id}_thumb.jpg", encode_jpeg(thumbnail), save=False)
+    except Exception:
+        logger.exception('Image processing failed for asset %s', asset_pk)
+        current.update(image_status='failed')
+        return 'failed'
+
+    new_names = [asset.image.name, asset.thumbnail.name]
+    if current.update(image=asset.image.name, thumbnail=asset.thumbnail.name,
+                      image_variants=variants, image_status='ready'):
+        _replace_files(storage, [source_name, old_thumbnail], new_names)
+        release_derivatives(old_variants, storage)
+        return 'ready'
+    # A newer upload replaced the source while this one was processing
+    _replace_files(storage, new_names, [])
+    release_derivatives(variants, storage)
+    return 'stale'
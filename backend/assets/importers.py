@@ -0,0 +1,269 @@
+"""
+CSV import for assets
+"""
+from collections import defaultdict
+from rest_framework import serializers, status
+from rest_framework.validators import UniqueValidator
+from django.db import IntegrityError, transaction
+import csv
+import io
+from datetime import datetime
+from .models import Asset
+from .sequences import generate_asset_ids
+from .serializers import AssetCreateUpdateSerializer
+from .stats import invalidate_asset_stats
+
+
+PROGRESS_EVERY_ROWS = 100
+
+
+class AssetCSVImporter:
+    """
+    Import assets from an uploaded CSV file.
+
+    The file is parsed once. Every asset_id and VIN in it is checked against
+    the database with one IN query each (and against earlier rows of the same
+    file in memory), rows are validated with field validators built once per
+    import rather than a serializer per row, and valid rows are inserted with
+    bulk_create in chunks, each inside its own transaction. Rows without an
+    asset_id get IDs from one block reservation per vehicle type and chunk.
+    Per-row errors read exactly as the serializer-per-row import reported them.
+    """
+
+    DEFAULT_CHUNK_SIZE = 500
+    LOOKUP_BATCH_SIZE = 5000  # keeps IN lists under SQLite's variable limit
+    REQUIRED_COLUMNS = ['asset_id', 'vehicle_type', 'make', 'model', 'year']
+
+    def __init__(self, csv_file, chunk_size=None, progress_callback=None):
+        self.csv_file = csv_file
+        self.chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        self.progress_callback = progress_callback
+
+        self.valid_types = {choice[0] for choice in Asset.VEHICLE_TYPE_CHOICES}
+        self.valid_statuses = {choice[0] for choice in Asset.STATUS_CHOICES}
+
+        # Field validators without the per-row uniqueness queries, which are
+        # answered from existing_vins instead
+        self.serializer = AssetCreateUpdateSerializer()
+        self.fields = self.serializer.fields
+        self.unique_messages = {}
+        for name, field in self.fields.items():
+            unique = [validator for validator in field.validators if isinstance(validator, UniqueValidator)]
+            if unique:
+                self.unique_messages[name] = unique[0].message
+                field.validators = [validator for validator in field.validators if validator not in unique]
+
+        self.processed_rows = 0
+        self.success_count = 0
+        self.error_rows = []
+        self.existing_ids = set()
+        self.existing_vins = set()
+        self.file_ids = set()
+
+    def read_rows(self):
+        """Parse the whole upload into (fieldnames, [(row_number, row), ...])"""
+        decoded_file = self.csv_file.read().decode('utf-8')
+        reader = csv.DictReader(io.StringIO(decoded_file))
+        rows = list(enumerate(reader, start=2))  # Start at 2 (header is row 1)
+        return reader.fieldnames or [], rows
+
+    def _lookup(self, field, values):
+        found = set()
+        values = list(values)
+        for offset in range(0, len(values), self.LOOKUP_BATCH_SIZE):
+            batch = values[offset:offset + self.LOOKUP_BATCH_SIZE]
+            found.update(Asset.objects.filter(**{f'{field}__in': batch}).values_list(field, flat=True))
+        return found
+
+    def load_existing(self, rows):
+        """One IN query each for the file's asset IDs and VINs already in use"""
+        asset_ids = {(row.get('asset_id') or '').strip() for _, row in rows}
+        self.file_ids = asset_ids
+        vins = {(row.get('vin') or '').strip() for _, row in rows if row.get('vin')}
+        self.existing_ids = self._lookup('asset_id', asset_ids)
+        self.existing_vins = self._lookup('vin', vins)
+
+    @staticmethod
+    def clean_row(row):
+        """Raw CSV row -> asset data; raises ValueError for unparseable values"""
+        asset_data = {
+            'asset_id': row.get('asset_id', '').strip(),
+            'vehicle_type': row.get('vehicle_type', '').strip().lower(),
+            'make': row.get('make', '').strip(),
+            'model': row.get('model', '').strip(),
+            'year': int(row.get('year', 0)),
+        }
+
+        # Optional fields
+        if row.get('vin'):
+            asset_data['vin'] = row['vin'].strip()
+        if row.get('license_plate'):
+            asset_data['license_plate'] = row['license_plate'].strip()
+        if row.get('department'):
+            asset_data['department'] = row['department'].strip()
+        if row.get('status'):
+            asset_data['status'] = row['status'].strip().lower()
+        if row.get('current_odometer'):
+            asset_data['current_odometer'] = int(row['current_odometer'])
+        if row.get('purchase_date'):
+            asset_data['purchase_date'] = datetime.strptime(
+                row['purchase_date'], '%Y-%m-%d'
+            ).date()
+        if row.get('purchase_cost'):
+            asset_data['purchase_cost'] = float(row['purchase_cost'])
+        if row.get('notes'):
+            asset_data['notes'] = row['notes'].strip()
+        return asset_data
+
+    def validate_fields(self, asset_data, claimed_vins):
+        """Serializer field validation for one row; raises ValueError like serializer.errors"""
+        validated = {}
+        errors = {}
+        for name, field in self.fields.items():
+            if name not in asset_data:
+                continue
+            try:
+                value = field.run_validation(asset_data[name])
+                validate_method = getattr(self.serializer, f'validate_{name}', None)
+                if validate_method:
+                    value = validate_method(value)
+                validated[name] = value
+            except serializers.ValidationError as e:
+                errors[name] = list(e.detail) if isinstance(e.detail, list) else [e.detail]
+
+        vin = asset_data.get('vin')
+        if vin and (vin in self.existing_vins or vin in claimed_vins):
+            errors.setdefault('vin', []).append(
+                serializers.ErrorDetail(self.unique_messages.get('vin', 'This field must be unique.'), code='unique')
+            )
+
+        if errors:
+            raise ValueError(str(errors))
+        return validated
+
+    def assign_asset_ids(self, assets):
+        """Generate IDs for rows without one, one block reservation per vehicle type"""
+        missing = defaultdict(list)
+        for asset in assets:
+            if not asset.asset_id:
+                missing[asset.vehicle_type].append(asset)
+        for vehicle_type, typed_assets in missing.items():
+            # IDs given later in the file stay available to their rows
+            asset_ids = generate_asset_ids(vehicle_type, len(typed_assets), exclude=self.file_ids)
+            for asset, asset_id in zip(typed_assets, asset_ids):
+                asset.asset_id = asset_id
+    
+    def _record_error(self, row_num, row, message):
+        self.error_rows.append({
+            'row': row_num,
+            'asset_id': row.get('asset_id', 'N/A'),
+            'error': message
+        })
+
+    def _insert_chunk(self, chunk):
+        """Insert a chunk of (row_num, row, asset) in one transaction"""
+        self.assign_asset_ids([asset for _, _, asset in chunk])
+        try:
+            with transaction.atomic():
+                Asset.objects.bulk_create([asset for _, _, asset in chunk], batch_size=self.chunk_size)
+            self.success_count += len(chunk)
+        except IntegrityError:
+            # Rows committed concurrently since the lookups ran: insert one at a time
+            for row_num, row, asset in chunk:
+                try:
+                    with transaction.atomic():
+                        asset.save(force_insert=True)
+                    self.success_count += 1
+                except IntegrityError as e:
+                    self._record_error(row_num, row, str(e))
+        self._report_progress()
+
+    def _report_progress(self):
+        if self.progress_callback:
+            self.progress_callback({
+                'processed_rows': self.processed_rows,
+                'success_count': self.success_count,
+                'error_count': len(self.error_rows)
+            })
+
+    def run(self):
+        """Validate and insert every row; returns (response_data, http_status)"""
+        fieldnames, rows = self.read_rows()
+
+        # Validate required columns
+        missing = [col for col in self.REQUIRED_COLUMNS if col not in fieldnames]
+        if missing:
+            return (
+                {'error': f'Missing required columns: {", ".join(missing)}'},
+                status.HTTP_400_BAD_REQUEST
+            )
+
+        self.load_existing(rows)
+
+        claimed_ids = set()
+        claimed_vins = set()
+        chunk = []
+        for row_num, row in rows:
+            self.processed_rows += 1
+            try:
+                asset_data = self.clean_row(row)
+
+                if asset_data['vehicle_type'] not in self.valid_types:
+                    raise ValueError(f"Invalid vehicle type: {asset_data['vehicle_type']}")
+                if 'status' in asset_data and asset_data['status'] not in self.valid_statuses:
+                    raise ValueError(f"Invalid status: {asset_data['status']}")
+
+                asset_id = asset_data['asset_id']
+                if asset_id and (asset_id in self.existing_ids or asset_id in claimed_ids):
+                    raise ValueError(f"Asset ID '{asset_id}' already exists")
+
+                validated = self.validate_fields(asset_data, claimed_vins)
+            except Exception as e:
+                self._record_error(row_num, row, str(e))
+            else:
+                if validated.get('asset_id'):
+                    claimed_ids.add(validated['asset_id'])
+                if validated.get('vin'):
+                    claimed_vins.add(validated['vin'])
+                chunk.append((row_num, row, Asset(**validated)))
+
+            if len(chunk) >= self.chunk_size:
+                self._insert_chunk(chunk)
+                chunk = []
+            elif self.processed_rows % PROGRESS_EVERY_ROWS == 0:
+                self._report_progress()
+
+        if chunk:
+            self._insert_chunk(chunk)
+        if self.success_count:
+            # bulk_create sends no post_save signals
+            invalidate_asset_stats()
+
+        self.error_rows.sort(key=lambda error: error['row'])
+        response_data = {
+            'success_count': self.success_count,
+            'error_count': len(self.error_rows),
+            'total_rows': self.success_count + len(self.error_rows),
+        }
+        if self.error_rows:
+            response_data['errors'] = self.error_rows
+
+        # If all failed, return error status
+        if self.success_count == 0 and self.error_rows:
+            return response_data, status.HTTP_400_BAD_REQUEST
+        return response_data, status.HTTP_201_CREATED
+
+
+def import_assets_csv(csv_file, progress_callback=None):
+    """
+    Import assets from an uploaded CSV file.
+    Returns (response_data, http_status) so the same code can serve the
+    API request directly or run inside a background job.
+    """
+    try:
+        return AssetCSVImporter(csv_file, progress_callback=progress_callback).run()
+    except Exception as e:
+        return (
+            {'error': f'Failed to process CSV file: {str(e)}'},
+            status.HTTP_400_BAD_REQUEST
+        )
@@ -0,0 +1,28 @@
+"""
+Management command to generate responsive derivatives for existing asset images
+"""
+import hashlib
+
+from django.core.management.base import BaseCommand
+from assets.images import open_rgb, render_derivatives
+from assets.models import Asset
+
+
+class Command(BaseCommand):
+    help = 'Renders the responsive image derivatives for asset images processed before they existed'
+
+    def handle(self, *args, **kwargs):
+        assets = Asset.objects.filter(image_status='ready', image_variants={}).exclude(image='')
+        self.stdout.write(f'Generating derivatives for {assets.count()} asset images...')
+
+        generated = 0
+        for asset in assets.iterator():
+            source_hash = asset.image_hash
+            if not source_hash:
+                with asset.image.open('rb') as image_file:
+                    source_hash = hashlib.sha256(image_file.read()).hexdigest()
+            variants = render_derivatives(open_rgb(asset.image), source_hash, asset.image.storage)
+            Asset.objects.filter(pk=asset.pk).update(image_hash=source_hash, image_variants=variants)
+            generated += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Generated derivatives for {generated} asset images"))
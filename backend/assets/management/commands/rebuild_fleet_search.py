@@ -0,0 +1,16 @@
+"""
+Management command to rebuild the asset and driver search indexes
+"""
+from django.core.management.base import BaseCommand
+from assets.search import ASSET_SEARCH_INDEX
+from drivers.search import DRIVER_SEARCH_INDEX
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the asset and driver search indexes (run after a SQLite VACUUM)'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding fleet search indexes...')
+        ASSET_SEARCH_INDEX.rebuild()
+        DRIVER_SEARCH_INDEX.rebuild()
+        self.stdout.write(self.style.SUCCESS('Fleet search indexes rebuilt'))
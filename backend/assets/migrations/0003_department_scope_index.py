@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_asset_image_asset_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['department', 'asset_id'], name='assets_asse_departm_8861b9_idx'),
+        ),
+    ]
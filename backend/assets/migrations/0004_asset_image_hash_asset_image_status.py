@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:00
+
+from django.db import migrations, models
+
+
+def mark_existing_images_ready(apps, schema_editor):
+    # Files uploaded before off-request processing were resized on save
+    Asset = apps.get_model('assets', 'Asset')
+    Asset.objects.exclude(image='').exclude(image__isnull=True).update(image_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_department_scope_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='image_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the uploaded source image', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='image_status',
+            field=models.CharField(choices=[('none', 'No Image'), ('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', help_text='State of the generated main image and thumbnail', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_images_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_asset_image_hash_asset_image_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Responsive derivatives: {format: {width: file name}}'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+
+# Frozen copies of the index DDL: later changes to assets.search must not change
+# what this migration did
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS assets_asset_search USING fts5(asset_id, make, model, vin, "
+    "license_plate, department, content='assets_asset', tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS assets_asset_search_ai AFTER INSERT ON assets_asset BEGIN INSERT '
+    'INTO assets_asset_search(rowid, asset_id, make, model, vin, license_plate, department) VALUES '
+    '(new.rowid, new.asset_id, new.make, new.model, new.vin, new.license_plate, new.department); END',
+    "CREATE TRIGGER IF NOT EXISTS assets_asset_search_ad AFTER DELETE ON assets_asset BEGIN INSERT "
+    "INTO assets_asset_search(assets_asset_search, rowid, asset_id, make, model, vin, license_plate, "
+    "department) VALUES ('delete', old.rowid, old.asset_id, old.make, old.model, old.vin, "
+    "old.license_plate, old.department); END",
+    "CREATE TRIGGER IF NOT EXISTS assets_asset_search_au AFTER UPDATE ON assets_asset BEGIN INSERT "
+    "INTO assets_asset_search(assets_asset_search, rowid, asset_id, make, model, vin, license_plate, "
+    "department) VALUES ('delete', old.rowid, old.asset_id, old.make, old.model, old.vin, "
+    "old.license_plate, old.department); INSERT INTO assets_asset_search(rowid, asset_id, make, "
+    "model, vin, license_plate, department) VALUES (new.rowid, new.asset_id, new.make, new.model, "
+    "new.vin, new.license_plate, new.department); END",
+    "INSERT INTO assets_asset_search(assets_asset_search) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS assets_asset_search_ai',
+    'DROP TRIGGER IF EXISTS assets_asset_search_ad',
+    'DROP TRIGGER IF EXISTS assets_asset_search_au',
+    'DROP TABLE IF EXISTS assets_asset_search',
+]
+POSTGRES_INSTALL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX IF NOT EXISTS assets_asset_search_trgm ON assets_asset USING gin "
+    "((lower(coalesce(asset_id, '') || ' ' || coalesce(make, '') || ' ' || coalesce(model, '') || ' ' "
+    "|| coalesce(vin, '') || ' ' || coalesce(license_plate, '') || ' ' || coalesce(department, ''))) "
+    "gin_trgm_ops)",
+]
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS assets_asset_search_trgm',
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_INSTALL)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_INSTALL)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0005_asset_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
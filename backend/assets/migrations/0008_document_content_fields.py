@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:33
+
+from django.db import migrations, models
+import os
+
+
+def fill_file_names(apps, schema_editor):
+    # Hashes and sizes of existing files are recorded on their first download
+    AssetDocument = apps.get_model('assets', 'AssetDocument')
+    for document in AssetDocument.objects.exclude(file='').only('id', 'file').iterator():
+        AssetDocument.objects.filter(pk=document.pk).update(file_name=os.path.basename(document.file.name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0007_identifier_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assetdocument',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='assetdocument',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='assetdocument',
+            name='file_name',
+            field=models.CharField(blank=True, help_text='Name of the uploaded file', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='assetdocument',
+            name='size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_file_names, migrations.RunPython.noop),
+    ]
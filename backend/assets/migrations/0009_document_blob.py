@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0008_document_content_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage name of the file', max_length=255, unique=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
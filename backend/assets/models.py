@@ -1,6 +1,5 @@
 from django.db import models
 from django.core.validators import MinValueValidator
-from PIL import Image
 import uuid
 import os
 
@@ -36,6 +35,14 @@ class Asset(models.Model):
         ('out_of_service', 'Out of Service'),
     ]
     
+    IMAGE_STATUS_CHOICES = [
+        ('none', 'No Image'),
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
     # Unique identifiers
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     asset_id = models.CharField(max_length=50, unique=True, help_text="Unique asset identifier")
@@ -75,6 +82,11 @@ class Asset(models.Model):
         null=True,
         help_text="Auto-generated thumbnail (150x150px)"
     )
+    image_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the uploaded source image")
+    image_status = models.CharField(max_length=20, choices=IMAGE_STATUS_CHOICES, default='none',
+                                    help_text="State of the generated main image and thumbnail")
+    image_variants = models.JSONField(default=dict, blank=True,
+                                      help_text="Responsive derivatives: {format: {width: file name}}")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -84,6 +96,10 @@ class Asset(models.Model):
         ordering = ['asset_id']
         verbose_name = 'Asset'
         verbose_name_plural = 'Assets'
+        indexes = [
+            # Department-scoped listings (authentication.filters.ScopeFilterBackend)
+            models.Index(fields=['department', 'asset_id']),
+        ]
     
     def __str__(self):
         return f"{self.asset_id} - {self.year} {self.make} {self.model}"
@@ -91,90 +107,44 @@ class Asset(models.Model):
     def save(self, *args, **kwargs):
         # Auto-generate asset_id if not provided
         if not self.asset_id:
-            # Generate asset ID based on vehicle type and current count
-            type_prefix = self.vehicle_type.upper()[:3]
-            count = Asset.objects.filter(vehicle_type=self.vehicle_type).count() + 1
-            self.asset_id = f"{type_prefix}-{count:04d}"
-        
-        # Process image if provided
-        if self.image:
-            self._process_image()
-        
-        super().save(*args, **kwargs)
-    
-    def _process_image(self):
-        """Process and resize the uploaded image, create thumbnail"""
+            # Next number in the vehicle type's series (see sequences.py)
+            from .sequences import generate_asset_ids
+            self.asset_id = generate_asset_ids(self.vehicle_type)[0]
+        
+        # A new upload is stored as-is; derivatives are generated off-request
+        process_image = False
+        replaced_image = None
+        if self.image and not self.image._committed:
+            from .images import file_digest
+            digest = file_digest(self.image)
+            previous = Asset.objects.filter(pk=self.pk).values_list('image', 'image_hash').first()
+            if previous and previous[0] and previous[1] == digest:
+                # Same source as before: keep the existing derivatives
+                self.image = previous[0]
+            else:
+                self.image_hash = digest
+                self.image_status = 'pending'
+                process_image = True
+                replaced_image = previous[0] if previous else None
+        
+        released_variants = None
         if not self.image:
-            return
-            
-        # Open the image
-        image = Image.open(self.image)
-        
-        # Convert to RGB if necessary (handles RGBA, P mode images)
-        if image.mode in ('RGBA', 'P'):
-            image = image.convert('RGB')
-        
-        # Resize main image to max 800x600 while maintaining aspect ratio
-        max_size = (800, 600)
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Save the resized main image
-        from django.core.files.base import ContentFile
-        from io import BytesIO
-        
-        # Save main image
-        main_io = BytesIO()
-        image.save(main_io, format='JPEG', quality=85, optimize=True)
-        main_content = ContentFile(main_io.getvalue())
-        
-        # Generate filename for main image
-        original_name = self.image.name
-        name_without_ext = os.path.splitext(os.path.basename(original_name))[0]
-        main_filename = f"{self.asset_id}_main.jpg"
-        
-        # Save main image
-        self.image.save(main_filename, main_content, save=False)
-        
-        # Create thumbnail (150x150)
-        thumbnail_image = image.copy()
-        thumbnail_size = (150, 150)
+            released_variants = self.image_variants
+            self.image_hash = ''
+            self.image_status = 'none'
+            self.image_variants = {}
         
-        # For thumbnails, we'll crop to square to ensure consistent appearance
-        width, height = thumbnail_image.size
-        
-        # Calculate crop box for center square
-        if width > height:
-            left = (width - height) / 2
-            right = (width + height) / 2
-            top = 0
-            bottom = height
-        else:
-            left = 0
-            right = width
-            top = (height - width) / 2
-            bottom = (height + width) / 2
-        
-        # Crop to square
-        thumbnail_image = thumbnail_image.crop((left, top, right, bottom))
-        
-        # Resize to thumbnail size
-        thumbnail_image = thumbnail_image.resize(thumbnail_size, Image.Resampling.LANCZOS)
-        
-        # Save thumbnail
-        thumb_io = BytesIO()
-        thumbnail_image.save(thumb_io, format='JPEG', quality=85, optimize=True)
-        thumb_content = ContentFile(thumb_io.getvalue())
-        
-        # Generate filename for thumbnail
-        thumb_filename = f"{self.asset_id}_thumb.jpg"
+        super().save(*args, **kwargs)
         
-        # Save thumbnail
-        if not self.thumbnail:
-            from django.core.files.storage import default_storage
-            thumb_path = asset_thumbnail_upload_path(self, thumb_filename)
-            self.thumbnail.save(thumb_filename, thumb_content, save=False)
-        else:
-            self.thumbnail.save(thumb_filename, thumb_content, save=False)
+        if released_variants:
+            from .images import release_derivatives
+            release_derivatives(released_variants, self._meta.get_field('image').storage)
+        if replaced_image and replaced_image != self.image.name:
+            self.image.storage.delete(replaced_image)
+        if process_image:
+            from .images import process_asset_image, schedule
+            if schedule('asset_image', process_asset_image, self.pk, self.image_hash):
+                self.refresh_from_db(fields=['image', 'thumbnail', 'image_status', 'image_variants'])
     
     def delete(self, *args, **kwargs):
         """Delete associated image files when asset is deleted"""
@@ -182,7 +152,11 @@ class Asset(models.Model):
             self.image.delete(save=False)
         if self.thumbnail:
             self.thumbnail.delete(save=False)
-        super().delete(*args, **kwargs)
+        result = super().delete(*args, **kwargs)
+        if self.image_variants:
+            from .images import release_derivatives
+            release_derivatives(self.image_variants, self._meta.get_field('image').storage)
+        return result
 
 
 class AssetDocument(models.Model):
@@ -199,7 +173,12 @@ class AssetDocument(models.Model):
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='documents')
     document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPE_CHOICES)
     title = models.CharField(max_length=200)
+    # Uploads are stored once per content hash (see documents.py)
     file = models.FileField(upload_to='assets/documents/%Y/%m/%d/')
+    file_name = models.CharField(max_length=255, blank=True, help_text="Name of the uploaded file")
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the file")
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
@@ -207,4 +186,26 @@ class AssetDocument(models.Model):
         ordering = ['-uploaded_at']
     
     def __str__(self):
-        return f"{self.asset.asset_id} - {self.title}"
\ No newline at end of file
+        return f"{self.asset.asset_id} - {self.title}"
+
+
+class DocumentBlob(models.Model):
+    """
+    A stored document file. Storing and releasing the file lock this row, so
+    a blob is never deleted while an upload is reusing it (see documents.py)
+    """
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name of the file")
+    locked_at = models.DateTimeField(blank=True, null=True)
+    
+    def __str__(self):
+        return self.name
+
+class IdentifierSequence(models.Model):
+    """
+    Last number handed out for a generated identifier series (see sequences.py)
+    """
+    name = models.CharField(max_length=50, unique=True, help_text="Series name, e.g. 'asset:TRU' or 'driver'")
+    last_value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
@@ -0,0 +1,228 @@
+"""
+Indexed fleet search for assets and drivers
+
+The list endpoints' `search` parameter matches identifiers and descriptive
+fields (asset ID, make, VIN, plate, driver name, email, ...). Every word of
+the query must appear somewhere in a record's fields - as a prefix or any
+fragment, so "4Y1S" finds a VIN containing it - and results are ranked by
+relevance. When nothing matches exactly, words of four or more characters
+match fuzzily: a record matches a word when it contains at least
+FUZZY_THRESHOLD of the word's trigrams, and the closest records come first,
+so a mistyped plate still finds its vehicle.
+
+On SQLite each indexed model has an FTS5 table using the trigram tokenizer,
+kept in step with the model's table by triggers, so saves, bulk_create and
+queryset updates are all indexed. A migration that remakes the model's table
+drops its triggers, so after every migrate restore() re-creates any that are
+missing and re-reads the table. On PostgreSQL a pg_trgm GIN index over the
+same fields serves the search. Other databases fall back to substring
+matching without fuzzy results.
+"""
+import math
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Q, TextField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import Asset
+
+
+# Share of a word's trigrams a record must contain to match it fuzzily
+FUZZY_THRESHOLD = 0.5
+FUZZY_MIN_LENGTH = 4
+# The trigram index cannot look up shorter words; they are matched by substring
+MIN_INDEXED_LENGTH = 3
+
+TERM_PATTERN = re.compile(r'\S+')
+
+
+def search_terms(text):
+    return TERM_PATTERN.findall((text or '').lower())
+
+
+def trigrams(term):
+    return sorted({term[index:index + 3] for index in range(len(term) - 2)})
+
+
+def quote(term):
+    """FTS5 string literal matching the term as written"""
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+class FleetSearchIndex:
+    """Trigram search index over some text fields of a model"""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.table = model._meta.db_table
+        self.fts_table = f'{self.table}_search'
+
+        columns = ', '.join(fields)
+        new_values = ', '.join(f'new.{field}' for field in fields)
+        old_values = ', '.join(f'old.{field}' for field in fields)
+        fts = self.fts_table
+        self.sqlite_triggers = [f'{fts}_ai', f'{fts}_ad', f'{fts}_au']
+        # Same statements as the migration that created the index
+        self.sqlite_install = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{columns}, content='{self.table}', tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {self.table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.rowid, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {self.table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {self.table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.rowid, {new_values}); END",
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+
+        self.document_sql = "lower({})".format(" || ' ' || ".join(f"coalesce({field}, '')" for field in fields))
+
+    @staticmethod
+    def _execute(db_connection, statements):
+        with db_connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def restore(self, db_connection):
+        """
+        Re-create the SQLite triggers if a table remake dropped them, and
+        re-read the table into the index. Does nothing before the index
+        migration ran (or after it was unapplied). Returns whether anything
+        was missing.
+        """
+        if db_connection.vendor != 'sqlite':
+            return False
+        names = [self.fts_table, *self.sqlite_triggers]
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names
+            )
+            existing = {name for name, in cursor.fetchall()}
+        if self.fts_table not in existing or existing.issuperset(self.sqlite_triggers):
+            return False
+        self._execute(db_connection, self.sqlite_install)
+        return True
+
+    def rebuild(self):
+        """Re-read every row into the SQLite index (needed after a VACUUM renumbers rowids)"""
+        if connection.vendor == 'sqlite':
+            self._execute(connection, [f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')"])
+
+    def _substring_condition(self, terms):
+        condition = Q()
+        for term in terms:
+            term_condition = Q()
+            for field in self.fields:
+                term_condition |= Q(**{f'{field}__icontains': term})
+            condition &= term_condition
+        return condition
+
+    def _sqlite_match(self, queryset, match):
+        fts = self.fts_table
+        return queryset.filter(
+            id__in=RawSQL(
+                f'SELECT id FROM {self.table} WHERE rowid IN '
+                f'(SELECT rowid FROM {fts} WHERE {fts} MATCH %s)',
+                [match]
+            )
+        ).annotate(
+            # bm25: lower is better
+            search_rank=RawSQL(
+                f'SELECT rank FROM {fts} WHERE {fts} MATCH %s AND {fts}.rowid = {self.table}.rowid',
+                [match]
+            )
+        )
+
+    def _sqlite_fuzzy(self, queryset, terms):
+        """Every term matches exactly or, if long enough, by trigram overlap"""
+        fts = self.fts_table
+        for term in terms:
+            if len(term) < FUZZY_MIN_LENGTH:
+                sql = f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s'
+                params = [quote(term)]
+            else:
+                grams = trigrams(term)
+                # Rows containing enough of the term's trigrams
+                overlap = ' UNION ALL '.join(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s' for _ in grams)
+                sql = f'SELECT rowid FROM ({overlap}) GROUP BY rowid HAVING COUNT(*) >= %s'
+                params = [*(quote(gram) for gram in grams), max(1, math.ceil(len(grams) * FUZZY_THRESHOLD))]
+            queryset = queryset.filter(
+                id__in=RawSQL(f'SELECT id FROM {self.table} WHERE rowid IN ({sql})', params)
+            )
+        # The OR query ranks rows by how many of the trigrams they share
+        grams = sorted({gram for term in terms for gram in trigrams(term)})
+        return queryset.annotate(
+            search_rank=RawSQL(
+                f'SELECT rank FROM {fts} WHERE {fts} MATCH %s AND {fts}.rowid = {self.table}.rowid',
+                [' OR '.join(quote(gram) for gram in grams)]
+            )
+        )
+
+    def search(self, queryset, text):
+        """
+        Restrict a queryset of the model to records matching text, annotated
+        with search_rank (lower is better) where the index ranks them
+        """
+        terms = search_terms(text)
+        if not terms:
+            return queryset.none()
+
+        indexed = [term for term in terms if len(term) >= MIN_INDEXED_LENGTH]
+        short = [term for term in terms if len(term) < MIN_INDEXED_LENGTH]
+
+        if connection.vendor == 'sqlite' and indexed:
+            results = self._sqlite_match(queryset, ' AND '.join(quote(term) for term in indexed))
+            results = results.filter(self._substring_condition(short))
+            if any(len(term) >= FUZZY_MIN_LENGTH for term in indexed) and not results.exists():
+                results = self._sqlite_fuzzy(queryset, indexed).filter(self._substring_condition(short))
+            return results
+
+        if connection.vendor == 'postgresql':
+            # LIKE on the lowered document uses the trigram index
+            queryset = queryset.annotate(
+                search_document=RawSQL(self.document_sql, [], output_field=TextField())
+            )
+            results = queryset.filter(*[Q(search_document__contains=term) for term in terms])
+            fuzzy_terms = [term for term in indexed if len(term) >= FUZZY_MIN_LENGTH]
+            if fuzzy_terms and not results.exists():
+                results = queryset
+                for term in terms:
+                    if term in fuzzy_terms:
+                        results = results.filter(id__in=RawSQL(
+                            f'SELECT id FROM {self.table} WHERE word_similarity(%s, {self.document_sql}) >= %s',
+                            [term, FUZZY_THRESHOLD]
+                        ))
+                    else:
+                        results = results.filter(search_document__contains=term)
+                results = results.annotate(search_rank=RawSQL(
+                    f'1 - word_similarity(%s, {self.document_sql})', [' '.join(fuzzy_terms)],
+                    output_field=FloatField()
+                ))
+            return results
+
+        return queryset.filter(self._substring_condition(terms))
+
+
+class IndexedSearchFilter(SearchFilter):
+    """
+    `search` backed by the view's search_index. Listed after OrderingFilter:
+    without an explicit `ordering` parameter, best matches come first.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        if not text.strip():
+            return queryset
+        results = view.search_index.search(queryset, text)
+        if 'search_rank' in results.query.annotations and not request.query_params.get('ordering'):
+            results = results.order_by(F('search_rank').asc(nulls_last=True), *(view.ordering or []))
+        return results
+
+
+ASSET_SEARCH_INDEX = FleetSearchIndex(
+    Asset, ['asset_id', 'make', 'model', 'vin', 'license_plate', 'department']
+)
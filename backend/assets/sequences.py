@@ -0,0 +1,111 @@
+"""
+Generated asset and driver identifiers
+
+Each identifier series ('asset:TRU', 'driver', ...) keeps its last number in
+an IdentifierSequence row. Reserving a block of numbers is a single
+UPDATE ... RETURNING on that row, so concurrent creates never receive the
+same number, a bulk import reserves all of its IDs at once, and nothing
+counts the table. Numbers are never reused after deletes.
+
+A series row is created on first use, starting after the highest number
+already present in identifiers of that series. Generated identifiers that
+were since taken by hand-entered ones are skipped.
+"""
+import re
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import IdentifierSequence
+
+
+SEQUENCE_TABLE = IdentifierSequence._meta.db_table
+TRAILING_NUMBER = re.compile(r'(\d+)$')
+
+
+def _supports_update_returning():
+    return connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert
+    )
+
+
+def _increment(name, count):
+    """Advance an existing series by count; returns its new last value, or None"""
+    if _supports_update_returning():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {SEQUENCE_TABLE} SET last_value = last_value + %s WHERE name = %s RETURNING last_value',
+                [count, name]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    with transaction.atomic():
+        if not IdentifierSequence.objects.filter(name=name).update(last_value=F('last_value') + count):
+            return None
+        return IdentifierSequence.objects.filter(name=name).values_list('last_value', flat=True).get()
+
+
+def reserve(name, count=1, seed=None):
+    """
+    Reserve count consecutive numbers of a series; returns the first.
+    seed() gives the number to continue from when the series is new.
+    """
+    last_value = _increment(name, count)
+    if last_value is None:
+        try:
+            with transaction.atomic():
+                last_value = (seed() if seed else 0) + count
+                IdentifierSequence.objects.create(name=name, last_value=last_value)
+        except IntegrityError:
+            # Another writer started the series first
+            last_value = _increment(name, count)
+    return last_value - count + 1
+
+
+def highest_number(queryset, field, pattern):
+    """Largest trailing number among field values matching the regex pattern"""
+    values = queryset.filter(**{f'{field}__regex': pattern}).values_list(field, flat=True)
+    return max((int(TRAILING_NUMBER.search(value).group(1)) for value in values), default=0)
+
+
+def allocate_identifiers(name, count, format_id, queryset, field, pattern, exclude=()):
+    """
+    count unused identifiers format_id(number) from the series, skipping any
+    already in queryset's field or in exclude
+    """
+    identifiers = []
+    while len(identifiers) < count:
+        needed = count - len(identifiers)
+        first = reserve(name, needed, seed=lambda: highest_number(queryset, field, pattern))
+        candidates = [format_id(number) for number in range(first, first + needed)]
+        taken = set(queryset.filter(**{f'{field}__in': candidates}).values_list(field, flat=True))
+        identifiers.extend(
+            candidate for candidate in candidates if candidate not in taken and candidate not in exclude
+        )
+    return identifiers
+
+
+def asset_id_prefix(vehicle_type):
+    return vehicle_type.upper()[:3]
+
+
+def generate_asset_ids(vehicle_type, count=1, exclude=()):
+    """count new asset IDs ('TRU-0042', ...) for a vehicle type"""
+    from .models import Asset
+
+    prefix = asset_id_prefix(vehicle_type)
+    return allocate_identifiers(
+        f'asset:{prefix}', count, lambda number: f'{prefix}-{number:04d}',
+        Asset.objects.all(), 'asset_id', rf'^{re.escape(prefix)}-[0-9]+$', exclude
+    )
+
+
+def generate_driver_id(last_name):
+    """A new driver ID ('DRV-SMI-0042'); the number runs across all drivers"""
+    from drivers.models import Driver
+
+    name_prefix = last_name[:3].upper()
+    return allocate_identifiers(
+        'driver', 1, lambda number: f'DRV-{name_prefix}-{number:04d}',
+        Driver.objects.all(), 'driver_id', r'^DRV-.*-[0-9]+$'
+    )[0]
@@ -1,13 +1,26 @@
+from django.urls import reverse
 from rest_framework import serializers
+from .fieldsets import SparseFieldsetMixin
+from .images import image_srcset
 from .models import Asset, AssetDocument
 from drivers.models import DriverAssetAssignment
 
 
 class AssetDocumentSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = AssetDocument
-        fields = ['id', 'document_type', 'title', 'file', 'description', 'uploaded_at']
-        read_only_fields = ['id', 'uploaded_at']
+        fields = [
+            'id', 'document_type', 'title', 'file', 'file_name', 'content_type', 'size',
+            'content_hash', 'download_url', 'description', 'uploaded_at'
+        ]
+        read_only_fields = ['id', 'file_name', 'content_type', 'size', 'content_hash', 'uploaded_at']
+    
+    def get_download_url(self, obj):
+        url = reverse('asset-download-document', args=[obj.asset_id, obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
 class DriverAssignmentSerializer(serializers.ModelSerializer):
@@ -37,7 +50,7 @@ class DriverAssignmentSerializer(serializers.ModelSerializer):
         }
 
 
-class AssetSerializer(serializers.ModelSerializer):
+class AssetSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     documents = AssetDocumentSerializer(many=True, read_only=True)
     driver_assignments = serializers.SerializerMethodField()
     
@@ -47,17 +60,20 @@ class AssetSerializer(serializers.ModelSerializer):
             'id', 'asset_id', 'vehicle_type', 'make', 'model', 'year',
             'vin', 'license_plate', 'department', 'purchase_date',
             'purchase_cost', 'current_odometer', 'status', 'notes',
-            'image', 'thumbnail', 'created_at', 'updated_at', 'documents',
+            'image', 'thumbnail', 'image_status', 'created_at', 'updated_at', 'documents',
             'driver_assignments'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'image_status', 'created_at', 'updated_at']
+        expandable_fields = ['documents', 'driver_assignments']
     
     def get_driver_assignments(self, obj):
-        # Get active driver assignments for this asset
-        assignments = obj.driver_assignments.filter(
-            status='active',
-            unassigned_date__isnull=True
-        ).select_related('driver').order_by('priority', '-assigned_date')
+        # Get active driver assignments for this asset (prefetched by the viewset)
+        assignments = getattr(obj, 'active_driver_assignments', None)
+        if assignments is None:
+            assignments = obj.driver_assignments.filter(
+                status='active',
+                unassigned_date__isnull=True
+            ).select_related('driver').order_by('priority', '-assigned_date')
         
         return DriverAssignmentSerializer(assignments, many=True).data
     
@@ -74,20 +90,26 @@ class AssetSerializer(serializers.ModelSerializer):
         return value
 
 
-class AssetListSerializer(serializers.ModelSerializer):
+class AssetListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Simplified serializer for list views"""
     documents_count = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Asset
         fields = [
             'id', 'asset_id', 'vehicle_type', 'make', 'model', 'year',
             'license_plate', 'department', 'current_odometer', 'status',
-            'image', 'thumbnail', 'created_at', 'documents_count'
+            'image', 'thumbnail', 'image_status', 'image_srcset', 'created_at', 'documents_count'
         ]
     
     def get_documents_count(self, obj):
-        return obj.documents.count()
+        # Annotated by the list queryset; nested uses count per asset
+        count = getattr(obj, 'documents_count', None)
+        return obj.documents.count() if count is None else count
+    
+    def get_image_srcset(self, obj):
+        return image_srcset(obj.image_variants, self.context.get('request'))
 
 
 class AssetCreateUpdateSerializer(serializers.ModelSerializer):
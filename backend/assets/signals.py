@@ -0,0 +1,37 @@
+"""
+Signal handlers keeping cached asset statistics, stored document files and
+the asset search index in step with the database
+"""
+from django.apps import apps
+from django.db import connections
+from django.db.models.signals import post_save, post_delete, post_migrate
+
+from .documents import release_blob
+from .models import Asset, AssetDocument
+from .search import ASSET_SEARCH_INDEX
+from .stats import invalidate_asset_stats
+
+
+def invalidate_stats(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    invalidate_asset_stats()
+
+
+def release_document_file(sender, instance, **kwargs):
+    # Also runs for documents deleted along with their asset
+    if instance.file:
+        release_blob(instance.file.name, instance.file.storage)
+
+
+def restore_search_index(sender, using, **kwargs):
+    """A migration that remade the asset table dropped the search triggers"""
+    ASSET_SEARCH_INDEX.restore(connections[using])
+
+
+def connect():
+    post_save.connect(invalidate_stats, sender=Asset, dispatch_uid='invalidate_asset_stats_save')
+    post_delete.connect(invalidate_stats, sender=Asset, dispatch_uid='invalidate_asset_stats_delete')
+    post_delete.connect(release_document_file, sender=AssetDocument, dispatch_uid='release_document_file')
+    post_migrate.connect(restore_search_index, sender=apps.get_app_config('assets'),
+                         dispatch_uid='restore_asset_search')
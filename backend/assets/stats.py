@@ -0,0 +1,70 @@
+"""
+Asset dashboard statistics
+
+One grouped query with conditional aggregation yields the status counts per
+(vehicle type, department) pair; everything the stats endpoint reports is
+folded from those rows. With a SHARED_CACHE the result is cached for
+ASSET_STATS_CACHE_TIMEOUT seconds or until an Asset is saved or deleted (see
+signals.py) or an import bulk-inserts assets. A per-process cache only hears
+about the writes its own worker handled, so without a shared cache the
+stats are kept for just ASSET_STATS_LOCAL_CACHE_TIMEOUT seconds: other
+workers show a change after at most that long.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from authentication.permission_cache import cache_is_shared
+from .models import Asset
+
+
+ASSET_STATS_CACHE_KEY = 'assets:stats'
+
+
+def invalidate_asset_stats():
+    cache.delete(ASSET_STATS_CACHE_KEY)
+
+
+def compute_asset_stats():
+    statuses = [value for value, _ in Asset.STATUS_CHOICES]
+    type_labels = dict(Asset.VEHICLE_TYPE_CHOICES)
+
+    rows = (
+        Asset.objects.order_by()
+        .values('vehicle_type', 'department')
+        .annotate(total=Count('id'), **{status: Count('id', filter=Q(status=status)) for status in statuses})
+    )
+
+    empty = dict.fromkeys(['total'] + statuses, 0)
+    totals = dict(empty)
+    by_type = {value: dict(empty) for value in type_labels}
+    by_department = {}
+    for row in rows:
+        department = row['department'] or 'Unassigned'
+        for bucket in (totals, by_type.setdefault(row['vehicle_type'], dict(empty)),
+                       by_department.setdefault(department, dict(empty))):
+            for key in empty:
+                bucket[key] += row[key]
+
+    return {
+        'total_assets': totals['total'],
+        'active_assets': totals['active'],
+        'maintenance_assets': totals['maintenance'],
+        'retired_assets': totals['retired'],
+        'out_of_service_assets': totals['out_of_service'],
+        'vehicle_types': {type_labels.get(value, value): counts['total'] for value, counts in by_type.items()},
+        'status_by_vehicle_type': by_type,
+        'departments': dict(sorted(by_department.items())),
+    }
+
+
+def get_asset_stats():
+    stats = cache.get(ASSET_STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_asset_stats()
+        if cache_is_shared():
+            timeout = getattr(settings, 'ASSET_STATS_CACHE_TIMEOUT', 300)
+        else:
+            timeout = getattr(settings, 'ASSET_STATS_LOCAL_CACHE_TIMEOUT', 5)
+        cache.set(ASSET_STATS_CACHE_KEY, stats, timeout)
+    return stats
@@ -1,14 +1,21 @@
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from rest_framework.authtoken.models import Token
 from decimal import Decimal
 from datetime import date
 import json
+from unittest import mock
 
+from .importers import import_assets_csv
 from .models import Asset, AssetDocument
+from .stats import ASSET_STATS_CACHE_KEY
 
 
 class AssetAPITestCase(APITestCase):
@@ -548,7 +555,7 @@ class AssetCustomEndpointsTestCase(APITestCase):
         # Create test file
         test_file = SimpleUploadedFile(
             "test_upload.pdf",
-            b"test file content",
+            b"%PDF-1.4 test file content",
             content_type="application/pdf"
         )
         
@@ -583,4 +590,170 @@ class AssetCustomEndpointsTestCase(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('document_type', response.data)
-        self.assertIn('file', response.data)
\ No newline at end of file
+        self.assertIn('file', response.data)
+
+@override_settings(SHARED_CACHE=True)
+class AssetStatsCacheTestCase(APITestCase):
+    """Grouped, cached asset stats"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_superuser(username='statsadmin', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        Asset.objects.create(asset_id='TRK-1', vehicle_type='truck', make='Ford', model='F-150',
+                             year=2020, department='Operations')
+        Asset.objects.create(asset_id='TRK-2', vehicle_type='truck', make='Ford', model='F-250',
+                             year=2021, status='maintenance', department='Operations')
+        Asset.objects.create(asset_id='VAN-1', vehicle_type='van', make='Ford', model='Transit',
+                             year=2022, status='retired')
+    
+    def tearDown(self):
+        cache.clear()
+    
+    def test_stats_in_one_query(self):
+        url = reverse('asset-stats')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([q for q in queries if 'assets_asset' in q['sql']]), 1)
+        
+        self.assertEqual(response.data['total_assets'], 3)
+        self.assertEqual(response.data['active_assets'], 1)
+        self.assertEqual(response.data['maintenance_assets'], 1)
+        self.assertEqual(response.data['retired_assets'], 1)
+        self.assertEqual(response.data['vehicle_types']['Truck'], 2)
+        self.assertEqual(response.data['vehicle_types']['Bus'], 0)
+        self.assertEqual(response.data['status_by_vehicle_type']['truck']['maintenance'], 1)
+        self.assertEqual(response.data['status_by_vehicle_type']['van']['retired'], 1)
+        self.assertEqual(response.data['departments']['Operations']['total'], 2)
+        self.assertEqual(response.data['departments']['Unassigned']['retired'], 1)
+    
+    def test_cached_until_asset_changes(self):
+        url = reverse('asset-stats')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([q for q in queries if 'assets_asset' in q['sql']])
+        
+        asset = Asset.objects.create(asset_id='CAR-1', vehicle_type='car', make='Toyota', model='Camry', year=2023)
+        self.assertEqual(self.client.get(url).data['total_assets'], 4)
+        
+        asset.status = 'out_of_service'
+        asset.save()
+        self.assertEqual(self.client.get(url).data['out_of_service_assets'], 1)
+        
+        asset.delete()
+        self.assertEqual(self.client.get(url).data['total_assets'], 3)
+    
+    def test_bulk_import_invalidates(self):
+        url = reverse('asset-stats')
+        self.client.get(url)
+        csv_file = SimpleUploadedFile(
+            'assets.csv',
+            b'asset_id,vehicle_type,make,model,year\nBUS-1,bus,Blue Bird,Vision,2019\n',
+            content_type='text/csv'
+        )
+        import_assets_csv(csv_file)
+        self.assertEqual(self.client.get(url).data['vehicle_types']['Bus'], 1)
+    
+    @override_settings(SHARED_CACHE=False, ASSET_STATS_LOCAL_CACHE_TIMEOUT=5)
+    def test_per_process_cache_kept_briefly(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.client.get(reverse('asset-stats'))
+        cache_set.assert_called_once_with(ASSET_STATS_CACHE_KEY, mock.ANY, 5)
+
+
+class AssetListQueryTestCase(APITestCase):
+    """The asset list annotates document counts instead of loading documents"""
+    
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='listadmin', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+    
+    def create_assets(self, start, count):
+        for number in range(start, start + count):
+            asset = Asset.objects.create(asset_id=f'CAR-{number}', vehicle_type='car', make='Toyota',
+                                         model='Camry', year=2022)
+            for index in range(number % 3):
+                AssetDocument.objects.create(
+                    asset=asset, document_type='other', title=f'Doc {index}',
+                    file=SimpleUploadedFile(f'doc{index}.pdf', b'%PDF-1.4', content_type='application/pdf')
+                )
+    
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('asset-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, queries
+    
+    def test_documents_count_annotated(self):
+        self.create_assets(1, 3)
+        response, queries = self.list_queries()
+        counts = {row['asset_id']: row['documents_count'] for row in response.data['results']}
+        self.assertEqual(counts, {'CAR-1': 1, 'CAR-2': 2, 'CAR-3': 0})
+        self.assertFalse([q for q in queries if 'assets_assetdocument"."file' in q['sql']])
+    
+    def test_constant_queries(self):
+        self.create_assets(1, 2)
+        self.list_queries()  # per-process lookups happen on the first request
+        _, few = self.list_queries()
+        self.create_assets(3, 6)
+        _, many = self.list_queries()
+        self.assertEqual(len(few), len(many))
+
+
+class AssetFieldsetTestCase(APITestCase):
+    """fields= and expand= on asset responses"""
+    
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='fieldsadmin', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.asset = Asset.objects.create(asset_id='VAN-1', vehicle_type='van', make='Ford',
+                                          model='Transit', year=2022)
+        AssetDocument.objects.create(
+            asset=self.asset, document_type='other', title='Manual',
+            file=SimpleUploadedFile('manual.pdf', b'%PDF-1.4', content_type='application/pdf')
+        )
+        self.url = reverse('asset-detail', args=[self.asset.pk])
+    
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, [query['sql'] for query in queries]
+    
+    def test_full_payload_by_default(self):
+        data, _ = self.get(self.url)
+        self.assertEqual(len(data['documents']), 1)
+        self.assertEqual(data['driver_assignments'], [])
+    
+    def test_sparse_fields_skip_relations(self):
+        data, queries = self.get(self.url, fields='id,asset_id,make')
+        self.assertEqual(set(data), {'id', 'asset_id', 'make'})
+        self.assertFalse([sql for sql in queries if 'assets_assetdocument' in sql])
+        self.assertFalse([sql for sql in queries if 'drivers_driverassetassignment' in sql])
+    
+    def test_expand_selects_relations(self):
+        data, queries = self.get(self.url, expand='documents')
+        self.assertIn('make', data)
+        self.assertEqual(len(data['documents']), 1)
+        self.assertNotIn('driver_assignments', data)
+        self.assertFalse([sql for sql in queries if 'drivers_driverassetassignment' in sql])
+        
+        data, _ = self.get(self.url, expand='')
+        self.assertNotIn('documents', data)
+        self.assertIn('vin', data)
+        
+        data, _ = self.get(self.url, fields='asset_id', expand='documents')
+        self.assertEqual(set(data), {'asset_id', 'documents'})
+    
+    def test_list_fields(self):
+        data, _ = self.get(reverse('asset-list'), fields='asset_id,documents_count')
+        self.assertEqual(data['results'], [{'asset_id': 'VAN-1', 'documents_count': 1}])
+    
+    def test_writes_ignore_fieldsets(self):
+        response = self.client.patch(f'{self.url}?fields=asset_id', {'make': 'Mercedes'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['make'], 'Mercedes')
+        self.assertIn('model', response.data)
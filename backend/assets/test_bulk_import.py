@@ -1,10 +1,14 @@
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from .importers import import_assets_csv
 from .models import Asset, AssetDocument
+from .serializers import AssetCreateUpdateSerializer
 import csv
 import io
 
@@ -248,6 +252,98 @@ class BulkImportTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class AssetImportEngineTestCase(TestCase):
+    HEADER = 'asset_id,vehicle_type,make,model,year,vin,status\n'
+
+    def run_import(self, lines):
+        upload = SimpleUploadedFile('assets.csv', (self.HEADER + ''.join(lines)).encode('utf-8'))
+        return import_assets_csv(upload)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        lines = [f'BUS-{n:05d},bus,Blue Bird,Vision,2022,VIN{n:014d},active\n' for n in range(1200)]
+        with CaptureQueriesContext(connection) as queries:
+            data, http_status = self.run_import(lines)
+        statements = [query['sql'].split()[0] for query in queries.captured_queries]
+        # Two lookups, then multi-row INSERTs in one transaction per 500-row chunk
+        self.assertEqual(statements.count('SELECT'), 2)
+        self.assertEqual(statements.count('SAVEPOINT'), 3)
+        self.assertLess(statements.count('INSERT'), 1200 / 10)
+        self.assertEqual(http_status, status.HTTP_201_CREATED)
+        self.assertEqual(data['success_count'], 1200)
+        self.assertEqual(Asset.objects.count(), 1200)
+
+    def test_duplicates_against_database_and_file(self):
+        Asset.objects.create(asset_id='BUS-001', vehicle_type='bus', make='Test', model='Model',
+                             year=2020, vin='EXISTINGVIN000001')
+        data, http_status = self.run_import([
+            'BUS-001,bus,Blue Bird,Vision,2022,,\n',
+            'BUS-002,bus,Blue Bird,Vision,2022,EXISTINGVIN000001,\n',
+            'BUS-003,bus,Blue Bird,Vision,2022,NEWVIN00000000001,\n',
+            'BUS-003,bus,Blue Bird,Vision,2022,,\n',
+            'BUS-004,bus,Blue Bird,Vision,2022,NEWVIN00000000001,\n',
+        ])
+
+        self.assertEqual(http_status, status.HTTP_201_CREATED)
+        self.assertEqual(data['success_count'], 1)
+        self.assertEqual([error['row'] for error in data['errors']], [2, 3, 5, 6])
+        self.assertEqual(data['errors'][0]['error'], "Asset ID 'BUS-001' already exists")
+        self.assertEqual(data['errors'][2]['error'], "Asset ID 'BUS-003' already exists")
+        self.assertIn('Asset with this vin already exists.', data['errors'][1]['error'])
+        self.assertIn('Asset with this vin already exists.', data['errors'][3]['error'])
+
+    def test_row_errors_match_serializer(self):
+        data, _ = self.run_import([
+            'CAR-001,car,Honda,Civic,2099,SHORTVIN,\n',
+            'CAR-002,car,,Civic,2022,,\n',
+            'CAR-003,car,Honda,Civic,abc,,\n',
+            'CAR-004,rocket,Honda,Civic,2022,,\n',
+            'CAR-005,car,Honda,Civic,2022,,parked\n',
+        ])
+
+        serializer = AssetCreateUpdateSerializer(data={
+            'asset_id': 'CAR-001', 'vehicle_type': 'car', 'make': 'Honda', 'model': 'Civic',
+            'year': 2099, 'vin': 'SHORTVIN',
+        })
+        self.assertFalse(serializer.is_valid())
+        errors = [error['error'] for error in data['errors']]
+        self.assertEqual(errors[0], str(serializer.errors))
+        self.assertIn('This field may not be blank.', errors[1])
+        self.assertEqual(errors[2], "invalid literal for int() with base 10: 'abc'")
+        self.assertEqual(errors[3], 'Invalid vehicle type: rocket')
+        self.assertEqual(errors[4], 'Invalid status: parked')
+        self.assertEqual(data['success_count'], 0)
+
+    def test_blank_asset_ids_are_generated(self):
+        Asset.objects.create(asset_id='TRU-0001', vehicle_type='truck', make='Ford', model='F-150', year=2020)
+        data, _ = self.run_import([
+            ',truck,Ford,F-150,2022,,\n',
+            ',truck,Ford,F-250,2022,,\n',
+        ])
+        self.assertEqual(data['success_count'], 2)
+        self.assertEqual(
+            sorted(Asset.objects.values_list('asset_id', flat=True)),
+            ['TRU-0001', 'TRU-0002', 'TRU-0003']
+        )
+
+    def test_generated_ids_reserved_as_one_block(self):
+        with CaptureQueriesContext(connection) as queries:
+            data, _ = self.run_import([
+                ',truck,Ford,F-150,2022,,\n',
+                ',truck,Ford,F-250,2022,,\n',
+                'TRU-0002,truck,Ford,F-350,2022,,\n',
+                ',truck,Ford,F-450,2022,,\n',
+            ])
+        self.assertEqual(data['success_count'], 4)
+        # IDs given later in the file are not handed to earlier blank rows
+        self.assertEqual(
+            sorted(Asset.objects.values_list('asset_id', flat=True)),
+            ['TRU-0001', 'TRU-0002', 'TRU-0003', 'TRU-0004']
+        )
+        updates = [query for query in queries
+                   if query['sql'].startswith('UPDATE') and 'assets_identifiersequence' in query['sql']]
+        self.assertEqual(len(updates), 2)  # first reservation, then the skipped number's replacement
+
+
 class DocumentUploadTestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -272,7 +368,7 @@ class DocumentUploadTestCase(TestCase):
         # Create a test file
         test_file = SimpleUploadedFile(
             "test_document.pdf",
-            b"PDF file content",
+            b"%PDF-1.4 file content",
             content_type="application/pdf"
         )
         
@@ -308,7 +404,7 @@ class DocumentUploadTestCase(TestCase):
         for filename, doc_type, title in documents:
             test_file = SimpleUploadedFile(
                 filename,
-                b"File content",
+                b"%PDF-1.4 file content",
                 content_type="application/pdf"
             )
             
@@ -332,7 +428,7 @@ class DocumentUploadTestCase(TestCase):
         """Test uploading document with invalid type"""
         test_file = SimpleUploadedFile(
             "test.pdf",
-            b"PDF content",
+            b"%PDF-1.4 content",
             content_type="application/pdf"
         )
         
@@ -370,7 +466,7 @@ class DocumentUploadTestCase(TestCase):
         
         test_file = SimpleUploadedFile(
             "test.pdf",
-            b"PDF content",
+            b"%PDF-1.4 content",
             content_type="application/pdf"
         )
         
@@ -386,7 +482,7 @@ class DocumentUploadTestCase(TestCase):
         """Test uploading document to non-existent asset"""
         test_file = SimpleUploadedFile(
             "test.pdf",
-            b"PDF content",
+            b"%PDF-1.4 content",
             content_type="application/pdf"
         )
         
@@ -0,0 +1,211 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+import hashlib
+import os
+import shutil
+import tempfile
+
+from .documents import BLOB_PREFIX, blob_name
+from .models import Asset, AssetDocument, DocumentBlob
+
+
+DOCUMENTS_MEDIA_ROOT = tempfile.mkdtemp()
+
+PDF = b'%PDF-1.4\n' + bytes(range(256)) * 40
+
+
+@override_settings(MEDIA_ROOT=DOCUMENTS_MEDIA_ROOT)
+class DocumentStoreTestCase(TestCase):
+    """Content-addressed document uploads and range downloads"""
+    
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(DOCUMENTS_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+    
+    def tearDown(self):
+        # Blobs outlive the rolled-back documents; start each test with none
+        shutil.rmtree(os.path.join(DOCUMENTS_MEDIA_ROOT, BLOB_PREFIX), ignore_errors=True)
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_superuser(username='docadmin', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.asset = Asset.objects.create(asset_id='BUS-1', vehicle_type='bus', make='Blue Bird',
+                                          model='Vision', year=2020)
+        self.other = Asset.objects.create(asset_id='BUS-2', vehicle_type='bus', make='Blue Bird',
+                                          model='Vision', year=2021)
+    
+    def upload(self, asset, content=PDF, name='manual.pdf'):
+        return self.client.post(
+            f'/api/assets/{asset.id}/upload_document/',
+            {'file': SimpleUploadedFile(name, content), 'document_type': 'manual', 'title': 'Manual'},
+            format='multipart'
+        )
+    
+    def blob_files(self):
+        root = os.path.join(DOCUMENTS_MEDIA_ROOT, BLOB_PREFIX)
+        return [name for _, _, names in os.walk(root) for name in names]
+    
+    def download(self, document_id, asset=None, **headers):
+        asset = asset or self.asset
+        response = self.client.get(f'/api/assets/{asset.id}/documents/{document_id}/download/', **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+    
+    def test_identical_uploads_share_a_blob(self):
+        first = self.upload(self.asset)
+        second = self.upload(self.other, name='copy.pdf')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        
+        digest = hashlib.sha256(PDF).hexdigest()
+        self.assertEqual(first.data['content_hash'], digest)
+        self.assertEqual(first.data['size'], len(PDF))
+        self.assertEqual(first.data['file_name'], 'manual.pdf')
+        self.assertEqual(second.data['file_name'], 'copy.pdf')
+        self.assertEqual(set(AssetDocument.objects.values_list('file', flat=True)), {blob_name(digest)})
+        self.assertEqual(self.blob_files().count(digest), 1)
+    
+    def test_blob_deleted_with_last_document(self):
+        self.upload(self.asset)
+        self.upload(self.other)
+        name = AssetDocument.objects.first().file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            AssetDocument.objects.filter(asset=self.asset).delete()
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertFalse(default_storage.exists(name))
+    
+    def test_release_locks_blob_before_checking_references(self):
+        self.upload(self.asset)
+        name = AssetDocument.objects.get().file.name
+        self.assertTrue(DocumentBlob.objects.filter(name=name).exists())
+        
+        with self.captureOnCommitCallbacks() as callbacks:
+            AssetDocument.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        statements = [query['sql'] for query in queries.captured_queries]
+        lock = next(i for i, sql in enumerate(statements) if sql.startswith('UPDATE "assets_documentblob"'))
+        check = next(i for i, sql in enumerate(statements) if 'FROM "assets_assetdocument"' in sql)
+        self.assertLess(lock, check)
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(DocumentBlob.objects.filter(name=name).exists())
+    
+    def test_upload_stores_blob_again_after_release(self):
+        # As after a release that held the lock while this upload waited on it
+        self.upload(self.asset)
+        name = AssetDocument.objects.get().file.name
+        default_storage.delete(name)
+        response = self.upload(self.other)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(DocumentBlob.objects.filter(name=name).count(), 1)
+    
+    def test_magic_number_checked(self):
+        response = self.upload(self.asset, content=b'MZ\x90\x00 not a pdf')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('does not match the .pdf extension', response.data['file'][0])
+        
+        response = self.upload(self.asset, content=b'#!/bin/sh\n', name='run.sh')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['file'], ['Unsupported document type: .sh'])
+        
+        response = self.upload(self.asset, content=b'\x89PNG\r\n\x1a\n' + b'\x00' * 32, name='photo.png')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['content_type'], 'image/png')
+        self.assertEqual(AssetDocument.objects.count(), 1)
+    
+    @override_settings(MAX_UPLOAD_SIZE=1024)
+    def test_size_limit_enforced_while_streaming(self):
+        response = self.upload(self.asset)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('File size must be less than', response.data['file'][0])
+        self.assertFalse(AssetDocument.objects.exists())
+        self.assertFalse(default_storage.exists(blob_name(hashlib.sha256(PDF).hexdigest())))
+    
+    def test_replaced_file_goes_through_store(self):
+        document_id = self.upload(self.asset).data['id']
+        old_name = AssetDocument.objects.get().file.name
+        replacement = b'%PDF-1.7\n' + b'revised' * 500
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/documents/{document_id}/',
+                                         {'file': SimpleUploadedFile('revised.pdf', replacement)},
+                                         format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        digest = hashlib.sha256(replacement).hexdigest()
+        self.assertEqual(response.data['content_hash'], digest)
+        self.assertEqual(response.data['size'], len(replacement))
+        self.assertEqual(response.data['file_name'], 'revised.pdf')
+        self.assertFalse(default_storage.exists(old_name))
+        
+        response, body = self.download(document_id)
+        self.assertEqual(body, replacement)
+        self.assertEqual(response['ETag'], f'"{digest}"')
+        self.assertEqual(int(response['Content-Length']), len(replacement))
+        
+        response = self.client.patch(f'/api/documents/{document_id}/',
+                                     {'file': SimpleUploadedFile('run.pdf', b'MZ\x90\x00 not a pdf')},
+                                     format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('does not match the .pdf extension', response.data['file'][0])
+    
+    def test_full_download_with_etag(self):
+        document_id = self.upload(self.asset).data['id']
+        response, body = self.download(document_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, PDF)
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(PDF).hexdigest()}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('manual.pdf', response['Content-Disposition'])
+        
+        response, body = self.download(document_id, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(body, b'')
+    
+    def test_range_requests(self):
+        document_id = self.upload(self.asset).data['id']
+        response, body = self.download(document_id, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(body, PDF[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(PDF)}')
+        self.assertEqual(response['Content-Length'], '100')
+        
+        response, body = self.download(document_id, HTTP_RANGE='bytes=-10')
+        self.assertEqual(body, PDF[-10:])
+        response, body = self.download(document_id, HTTP_RANGE='bytes=10000-')
+        self.assertEqual(body, PDF[10000:])
+        
+        response, _ = self.download(document_id, HTTP_RANGE=f'bytes={len(PDF)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(PDF)}')
+        
+        # A stale If-Range validator gets the whole (changed) file
+        response, body = self.download(document_id, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, PDF)
+    
+    def test_download_scoped_to_asset(self):
+        document_id = self.upload(self.asset).data['id']
+        response, _ = self.download(document_id, asset=self.other)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_legacy_document_hashed_on_first_download(self):
+        name = default_storage.save('assets/documents/2024/01/01/old.pdf', SimpleUploadedFile('old.pdf', PDF))
+        document = AssetDocument.objects.create(asset=self.asset, document_type='manual', title='Old', file=name)
+        response, body = self.download(document.id)
+        self.assertEqual(body, PDF)
+        document.refresh_from_db()
+        self.assertEqual(document.content_hash, hashlib.sha256(PDF).hexdigest())
+        self.assertEqual(response['ETag'], f'"{document.content_hash}"')
@@ -0,0 +1,130 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import skipUnless
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from drivers.models import Driver, DriverAssetAssignment
+from fuel.models import FuelTransaction
+from locations.models import AssetLocationSummary, LocationUpdate
+from .exports import ASSET_COLUMNS, parquet_available
+from .models import Asset
+
+
+class FleetExportTestCase(TestCase):
+    """Streaming fleet export"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_superuser(username='exportadmin', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.truck = Asset.objects.create(asset_id='TRK-0001', vehicle_type='truck', make='Ford', model='F-150',
+                                          year=2020, department='Operations', purchase_cost=Decimal('45000.00'))
+        self.van = Asset.objects.create(asset_id='VAN-0001', vehicle_type='van', make='Ford', model='Transit',
+                                        year=2021, department='Delivery')
+        
+        now = timezone.now()
+        update = LocationUpdate.objects.create(asset=self.truck, latitude=Decimal('40.7128'),
+                                               longitude=Decimal('-74.0060'), timestamp=now, source='gps_device')
+        AssetLocationSummary.update_for_asset(update)
+        
+        driver = Driver.objects.create(
+            first_name='Dana', last_name='Lopez', email='dana@example.com', phone='+1234567890',
+            date_of_birth='1990-01-01', hire_date='2020-01-01', license_number='D000000001',
+            license_type='regular', license_expiration=date.today() + timedelta(days=365), license_state='CA',
+            address_line1='123 Main St', city='Anytown', state='CA', zip_code='12345',
+            emergency_contact_name='Contact', emergency_contact_phone='+0987654321',
+            emergency_contact_relationship='Spouse'
+        )
+        self.driver_id = driver.driver_id
+        DriverAssetAssignment.objects.create(driver=driver, asset=self.truck, assignment_type='primary',
+                                             status='active', assigned_date=now - timedelta(days=3),
+                                             assigned_by='Fleet Manager')
+        
+        FuelTransaction.objects.create(asset=self.truck, timestamp=now - timedelta(days=2), product_type='diesel',
+                                       volume=Decimal('20.000'), total_cost=Decimal('7000'))
+        FuelTransaction.objects.create(asset=self.truck, timestamp=now - timedelta(days=1), product_type='diesel',
+                                       volume=Decimal('18.500'), total_cost=Decimal('6500'))
+    
+    def export(self, **params):
+        response = self.client.get(reverse('asset-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+    
+    def test_csv_export(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="assets_', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([row['asset_id'] for row in rows], ['TRK-0001', 'VAN-0001'])
+        self.assertEqual(list(rows[0]), [name for name, _ in ASSET_COLUMNS])
+        self.assertEqual(rows[0]['purchase_cost'], '45000.00')
+        self.assertEqual(rows[1]['vin'], '')
+    
+    def test_joined_columns_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            _, body = self.export(include='all')
+        # Besides per-request user and audit queries
+        self.assertEqual(len([q for q in queries if 'FROM "assets_asset"' in q['sql']]), 1)
+        
+        truck, van = csv.DictReader(io.StringIO(body.decode()))
+        self.assertEqual(Decimal(truck['location_latitude']), Decimal('40.7128'))
+        self.assertEqual(truck['location_source'], 'gps_device')
+        self.assertEqual(truck['driver_id'], self.driver_id)
+        self.assertEqual(truck['driver_last_name'], 'Lopez')
+        self.assertEqual(Decimal(truck['last_fuel_volume']), Decimal('18.5'))
+        self.assertEqual(Decimal(truck['last_fuel_total_cost']), Decimal('6500'))
+        self.assertEqual(van['driver_id'], '')
+        self.assertEqual(van['location_latitude'], '')
+        self.assertEqual(van['last_fuel_timestamp'], '')
+    
+    def test_filters_apply(self):
+        _, body = self.export(department='Delivery', include='driver')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([row['asset_id'] for row in rows], ['VAN-0001'])
+        self.assertIn('driver_id', rows[0])
+        self.assertNotIn('location_latitude', rows[0])
+        
+        _, body = self.export(search='transit', export_format='ndjson')
+        self.assertEqual([json.loads(line)['asset_id'] for line in body.decode().splitlines()], ['VAN-0001'])
+    
+    def test_ndjson_export(self):
+        response, body = self.export(export_format='ndjson', include='fuel')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        truck = json.loads(body.decode().splitlines()[0])
+        self.assertEqual(truck['year'], 2020)
+        self.assertEqual(truck['last_fuel_product_type'], 'diesel')
+        self.assertEqual(Decimal(truck['last_fuel_volume']), Decimal('18.5'))
+    
+    @skipUnless(parquet_available(), 'pyarrow is not installed')
+    def test_parquet_export(self):
+        import pyarrow.parquet as pq
+        
+        response, body = self.export(export_format='parquet', include='all')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+        table = pq.read_table(BytesIO(body))
+        self.assertEqual(table.column('asset_id').to_pylist(), ['TRK-0001', 'VAN-0001'])
+        self.assertEqual(table.column('year').to_pylist(), [2020, 2021])
+        self.assertEqual(table.column('last_fuel_volume').to_pylist(), [Decimal('18.500'), None])
+        self.assertEqual(table.column('driver_id').to_pylist(), [self.driver_id, None])
+    
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('asset-export'), {'export_format': 'xlsx'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('export_format must be one of', response.data['error'])
+        
+        response = self.client.get(reverse('asset-export'), {'include': 'driver,tires'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Unknown include: tires', response.data['error'])
@@ -1,4 +1,5 @@
-from django.test import TestCase
+from django.test import TestCase, RequestFactory, override_settings
+from django.core.management import call_command
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
@@ -8,8 +9,17 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from PIL import Image
 import io
 import json
+import os
+import shutil
+import tempfile
 
+from drivers.models import Driver
+from jobs.models import BackgroundJob
+from jobs.runner import claim_next_job, run_job
+from .images import process_asset_image
 from .models import Asset
+from .serializers import AssetListSerializer
+from .views import serve_image_derivative
 
 User = get_user_model()
 
@@ -335,4 +345,167 @@ class AssetImageIntegrationTestCase(TestCase):
         
         # Verify files are cleaned up
         self.assertFalse(os.path.exists(image_path))
-        self.assertFalse(os.path.exists(thumbnail_path))
\ No newline at end of file
+        self.assertFalse(os.path.exists(thumbnail_path))
+
+
+PIPELINE_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=PIPELINE_MEDIA_ROOT)
+class ImagePipelineTestCase(TestCase):
+    """Off-request image processing for asset images and driver photos"""
+    
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PIPELINE_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+    
+    def setUp(self):
+        self.asset = Asset.objects.create(vehicle_type='truck', make='Ford', model='F-150', year=2022)
+    
+    def upload(self, color='red', size=(1200, 900), format='PNG'):
+        image_io = io.BytesIO()
+        Image.new('RGB', size, color).save(image_io, format=format)
+        return SimpleUploadedFile(f'upload.{format.lower()}', image_io.getvalue())
+    
+    def test_inline_processing_builds_derivatives(self):
+        self.asset.image = self.upload()
+        self.asset.save()
+        
+        self.assertEqual(self.asset.image_status, 'ready')
+        self.assertEqual(len(self.asset.image_hash), 64)
+        with Image.open(self.asset.image.path) as main:
+            self.assertEqual(main.size, (800, 600))
+            self.assertEqual(main.format, 'JPEG')
+        with Image.open(self.asset.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (150, 150))
+    
+    def test_metadata_save_and_same_upload_do_not_reprocess(self):
+        self.asset.image = self.upload()
+        self.asset.save()
+        image_name, thumbnail_name = self.asset.image.name, self.asset.thumbnail.name
+        
+        self.asset.notes = 'Updated'
+        self.asset.save()
+        self.asset.image = self.upload()
+        self.asset.save()
+        
+        self.asset.refresh_from_db()
+        self.assertEqual((self.asset.image.name, self.asset.thumbnail.name), (image_name, thumbnail_name))
+    
+    def test_new_upload_replaces_old_files(self):
+        self.asset.image = self.upload()
+        self.asset.save()
+        old_image, old_thumbnail = self.asset.image.path, self.asset.thumbnail.path
+        
+        self.asset.image = self.upload(color='blue')
+        self.asset.save()
+        
+        self.assertEqual(self.asset.image_status, 'ready')
+        self.assertFalse(os.path.exists(old_image))
+        self.assertFalse(os.path.exists(old_thumbnail))
+        self.assertTrue(os.path.exists(self.asset.thumbnail.path))
+    
+    @override_settings(IMAGE_PROCESSING_ASYNC=True)
+    def test_async_upload_queues_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.asset.image = self.upload()
+            self.asset.save()
+        
+        self.asset.refresh_from_db()
+        self.assertEqual(self.asset.image_status, 'pending')
+        self.assertFalse(self.asset.thumbnail)
+        
+        job_id = claim_next_job('test-worker')
+        self.assertEqual(BackgroundJob.objects.get(pk=job_id).job_type, 'asset_image')
+        run_job(job_id)
+        
+        self.asset.refresh_from_db()
+        self.assertEqual(self.asset.image_status, 'ready')
+        self.assertTrue(self.asset.thumbnail)
+    
+    @override_settings(IMAGE_PROCESSING_ASYNC=True)
+    def test_stale_job_is_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.asset.image = self.upload()
+            self.asset.save()
+        first_hash = self.asset.image_hash
+        with self.captureOnCommitCallbacks(execute=True):
+            self.asset.image = self.upload(color='green')
+            self.asset.save()
+        
+        self.assertEqual(process_asset_image(self.asset.pk, first_hash), 'stale')
+        self.assertEqual(process_asset_image(self.asset.pk, self.asset.image_hash), 'ready')
+    
+    def test_unreadable_upload_marks_failed(self):
+        self.asset.image = SimpleUploadedFile('broken.jpg', b'not an image')
+        with self.assertLogs('assets.images', 'ERROR'):
+            self.asset.save()
+        self.assertEqual(self.asset.image_status, 'failed')
+    
+    def test_responsive_derivatives(self):
+        self.asset.image = self.upload(size=(1200, 900))
+        self.asset.save()
+        
+        variants = self.asset.image_variants
+        self.assertEqual(sorted(variants), ['jpeg', 'webp'])
+        self.assertEqual(list(variants['webp']), ['64', '150', '400', '800'])
+        self.assertTrue(variants['webp']['400'].endswith(f'{self.asset.image_hash}-400.webp'))
+        with Image.open(os.path.join(PIPELINE_MEDIA_ROOT, variants['jpeg']['400'])) as derivative:
+            self.assertEqual(derivative.size, (400, 300))
+        
+        srcset = AssetListSerializer(self.asset).data['image_srcset']
+        self.assertEqual(srcset['webp'].split(', ')[0], f"/media/{variants['webp']['64']} 64w")
+        self.assertTrue(srcset['jpeg'].endswith(' 800w'))
+    
+    def test_small_source_caps_widths(self):
+        self.asset.image = self.upload(size=(300, 200))
+        self.asset.save()
+        self.assertEqual(list(self.asset.image_variants['jpeg']), ['64', '150', '300'])
+    
+    def test_shared_derivatives_released_when_unused(self):
+        other = Asset.objects.create(vehicle_type='truck', make='Ford', model='F-250', year=2022)
+        for asset in [self.asset, other]:
+            asset.image = self.upload()
+            asset.save()
+        self.assertEqual(self.asset.image_variants, other.image_variants)
+        path = os.path.join(PIPELINE_MEDIA_ROOT, other.image_variants['webp']['150'])
+        
+        self.asset.delete()
+        self.assertTrue(os.path.exists(path))
+        other.image = None
+        other.save()
+        self.assertFalse(os.path.exists(path))
+    
+    def test_derivatives_served_immutable(self):
+        self.asset.image = self.upload()
+        self.asset.save()
+        name = self.asset.image_variants['webp']['64']
+        
+        response = serve_image_derivative(RequestFactory().get(f'/media/{name}'), name)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+    
+    def test_backfill_command(self):
+        self.asset.image = self.upload()
+        self.asset.save()
+        Asset.objects.filter(pk=self.asset.pk).update(image_variants={})
+        
+        call_command('generate_image_derivatives', stdout=io.StringIO())
+        self.asset.refresh_from_db()
+        self.assertEqual(list(self.asset.image_variants['jpeg']), ['64', '150', '400', '800'])
+    
+    def test_driver_photo_resized(self):
+        driver = Driver.objects.create(
+            first_name='Test', last_name='Driver', email='driver@example.com', phone='+15555555555',
+            date_of_birth='1990-01-01', hire_date='2020-01-01', license_number='D1234567',
+            license_type='class_a', license_expiration='2030-01-01', license_state='CA',
+            address_line1='1 Main St', city='Town', state='CA', zip_code='90001',
+            emergency_contact_name='Contact', emergency_contact_phone='+15555555556',
+            emergency_contact_relationship='Friend',
+        )
+        driver.profile_photo = self.upload(size=(600, 450))
+        driver.save()
+        
+        self.assertEqual(driver.photo_status, 'ready')
+        with Image.open(driver.profile_photo.path) as photo:
+            self.assertEqual(photo.size, (300, 225))
@@ -0,0 +1,103 @@
+from django.contrib.auth.models import User
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .models import Asset
+from .search import ASSET_SEARCH_INDEX
+
+
+class FleetSearchTestCase(TestCase):
+    """Indexed asset search"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_superuser(username='searchadmin', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        Asset.objects.create(asset_id='TRK-0001', vehicle_type='truck', make='Ford', model='F-150', year=2020,
+                             vin='1FTFW1ET5DFC10312', license_plate='7ABC123', department='Operations')
+        Asset.objects.create(asset_id='VAN-0001', vehicle_type='van', make='Mercedes', model='Sprinter',
+                             year=2021, vin='WD3PE8CC5E5812345', license_plate='8XYZ789', department='Delivery')
+        Asset.objects.create(asset_id='VAN-0002', vehicle_type='van', make='Ford', model='Transit Van',
+                             year=2022, license_plate='9VAN555', department='Operations')
+    
+    def search(self, text, **params):
+        response = self.client.get(reverse('asset-list'), {'search': text, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['asset_id'] for row in response.data['results']]
+    
+    def test_fragments_and_prefixes(self):
+        self.assertEqual(self.search('FC103'), ['TRK-0001'])
+        self.assertEqual(self.search('abc1'), ['TRK-0001'])
+        self.assertEqual(sorted(self.search('VAN-')), ['VAN-0001', 'VAN-0002'])
+        self.assertEqual(self.search('delivery'), ['VAN-0001'])
+    
+    def test_every_word_must_match(self):
+        self.assertEqual(sorted(self.search('ford operations')), ['TRK-0001', 'VAN-0002'])
+        self.assertEqual(self.search('ford sprinter'), [])
+        self.assertEqual(self.search('f-150 op'), ['TRK-0001'])
+    
+    def test_fuzzy_match_when_nothing_matches_exactly(self):
+        self.assertEqual(self.search('1FTFW1XT5DFC10312'), ['TRK-0001'])
+        self.assertEqual(self.search('Sprintr'), ['VAN-0001'])
+        self.assertEqual(self.search('qqqqqq'), [])
+    
+    def test_ranked_unless_ordering_requested(self):
+        # "van" is the asset ID, model and plate of VAN-0002
+        self.assertEqual(self.search('van')[0], 'VAN-0002')
+        self.assertEqual(self.search('van', ordering='-asset_id'), ['VAN-0002', 'VAN-0001'])
+    
+    def test_index_follows_updates_and_deletes(self):
+        asset = Asset.objects.get(asset_id='TRK-0001')
+        asset.license_plate = '5NEW999'
+        asset.save()
+        self.assertEqual(self.search('5NEW'), ['TRK-0001'])
+        self.assertEqual(self.search('7ABC123'), [])
+        Asset.objects.filter(asset_id='VAN-0001').update(make='Dodge')
+        self.assertEqual(self.search('dodge'), ['VAN-0001'])
+        asset.delete()
+        self.assertEqual(self.search('5NEW'), [])
+    
+    def test_single_search_pass(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search('sprinter')
+        searches = [query['sql'] for query in queries if 'MATCH' in query['sql']]
+        # exact-match check, page count and page rows
+        self.assertEqual(len(searches), 3)
+        self.assertFalse([sql for sql in searches if 'LIKE' in sql])
+    
+    def test_rebuild(self):
+        ASSET_SEARCH_INDEX.rebuild()
+        self.assertEqual(self.search('transit'), ['VAN-0002'])
+
+
+class FleetSearchMigrationTestCase(TransactionTestCase):
+    """The search triggers outlive migrations that remake the asset table"""
+    
+    def remake_table(self):
+        # AlterField on SQLite copies the table into a new one, without its triggers
+        old_field = Asset._meta.get_field('department')
+        new_field = old_field.clone()
+        new_field.max_length = old_field.max_length + 1
+        new_field.set_attributes_from_name('department')
+        with connection.schema_editor() as editor:
+            editor.alter_field(Asset, old_field, new_field)
+            editor.alter_field(Asset, new_field, old_field)
+    
+    def test_triggers_restored_after_table_remake(self):
+        Asset.objects.create(asset_id='TRK-0001', vehicle_type='truck', make='Ford', model='F-150', year=2020)
+        self.remake_table()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'assets_asset'")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        Asset.objects.create(asset_id='VAN-0001', vehicle_type='van', make='Mercedes', model='Sprinter', year=2021)
+        found = ASSET_SEARCH_INDEX.search(Asset.objects.all(), 'sprinter').values_list('asset_id', flat=True)
+        self.assertEqual(list(found), ['VAN-0001'])
+        found = ASSET_SEARCH_INDEX.search(Asset.objects.all(), 'F-150').values_list('asset_id', flat=True)
+        self.assertEqual(list(found), ['TRK-0001'])
@@ -10,7 +10,11 @@ import tempfile
 from PIL import Image
 import io
 
-from .models import Asset, AssetDocument
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .models import Asset, AssetDocument, IdentifierSequence
+from .sequences import generate_asset_ids, reserve
 
 
 class AssetModelTestCase(TestCase):
@@ -557,4 +561,38 @@ class AssetImageTestCase(TestCase):
         with Image.open(self.asset.image.path) as img:
             width, height = img.size
             self.assertEqual(width, 150)
-            self.assertEqual(height, 600)
\ No newline at end of file
+            self.assertEqual(height, 600)
+
+
+class IdentifierSequenceTestCase(TestCase):
+    """Generated asset IDs come from per-prefix sequences"""
+    
+    def create_asset(self, asset_id='', vehicle_type='truck'):
+        return Asset.objects.create(asset_id=asset_id, vehicle_type=vehicle_type, make='Ford',
+                                    model='F-150', year=2020)
+    
+    def test_numbers_are_not_reused_after_delete(self):
+        first = self.create_asset()
+        second = self.create_asset()
+        self.assertEqual([first.asset_id, second.asset_id], ['TRU-0001', 'TRU-0002'])
+        second.delete()
+        self.assertEqual(self.create_asset().asset_id, 'TRU-0003')
+        self.assertEqual(self.create_asset(vehicle_type='van').asset_id, 'VAN-0001')
+    
+    def test_new_series_continues_after_existing_ids(self):
+        self.create_asset('TRU-0041')
+        self.create_asset('TRU-LEGACY')
+        self.assertEqual(self.create_asset().asset_id, 'TRU-0042')
+    
+    def test_skips_hand_entered_ids(self):
+        self.create_asset()
+        self.create_asset('TRU-0002')
+        self.assertEqual(self.create_asset().asset_id, 'TRU-0003')
+        self.assertEqual(generate_asset_ids('truck', 2, exclude={'TRU-0004'}), ['TRU-0005', 'TRU-0006'])
+    
+    def test_block_reserved_in_one_statement(self):
+        self.assertEqual(reserve('test', 10), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(reserve('test', 500), 11)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(IdentifierSequence.objects.get(name='test').last_value, 510)
@@ -2,13 +2,17 @@ from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from authentication.permissions import AssetPermission, GranularAssetPermission
-from django.db.models import Q
+from authentication.filters import ScopeFilterBackend
+from authentication.audit_middleware import AuditedViewSetMixin, set_audit_resource
+from django.conf import settings
 from django.db import transaction
-from django.http import HttpResponse
+from django.db.models import Count, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.static import serve
 import csv
-import io
 from datetime import datetime
 from .models import Asset, AssetDocument
 from .serializers import (
@@ -17,17 +21,51 @@ from .serializers import (
     AssetCreateUpdateSerializer,
     AssetDocumentSerializer
 )
+from .documents import DocumentUploadHandler, document_fields, document_response, inspect_upload, release_blob
+from .exports import (
+    EXPORT_CONTENT_TYPES, export_csv, export_ndjson, export_parquet, export_rows, parquet_available,
+    parse_includes
+)
+from .fieldsets import ExpandableQueryMixin
+from .importers import import_assets_csv
+from .search import ASSET_SEARCH_INDEX, IndexedSearchFilter
+from .stats import get_asset_stats
+from drivers.models import DriverAssetAssignment
+from jobs.runner import enqueue, should_run_in_background
+from jobs.serializers import BackgroundJobSerializer
 
 
-class AssetViewSet(viewsets.ModelViewSet):
-    queryset = Asset.objects.all().prefetch_related('documents')
+class AssetViewSet(AuditedViewSetMixin, ExpandableQueryMixin, viewsets.ModelViewSet):
+    queryset = Asset.objects.all()
     # Use granular permissions if available, fallback to role-based
     permission_classes = [GranularAssetPermission]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [ScopeFilterBackend, DjangoFilterBackend, filters.OrderingFilter, IndexedSearchFilter]
+    scope_fields = {'department': 'department', 'vehicle_type': 'vehicle_type', 'asset_id': 'asset_id'}
+    scope_view_all_permission = 'assets.view_all'
     filterset_fields = ['vehicle_type', 'status', 'department', 'year']
-    search_fields = ['asset_id', 'make', 'model', 'vin', 'license_plate']
+    search_fields = ASSET_SEARCH_INDEX.fields
+    search_index = ASSET_SEARCH_INDEX
     ordering_fields = ['asset_id', 'make', 'model', 'year', 'current_odometer', 'created_at']
     ordering = ['asset_id']
+    expansion_prefetch_related = {
+        'documents': ['documents'],
+        'driver_assignments': [
+            Prefetch(
+                'driver_assignments',
+                queryset=DriverAssetAssignment.objects.filter(
+                    status='active', unassigned_date__isnull=True
+                ).select_related('driver').order_by('priority', '-assigned_date'),
+                to_attr='active_driver_assignments'
+            )
+        ],
+    }
+    
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        if self.action == 'upload_document':
+            # Stream document uploads to disk, hashing and checking them on the way
+            request.upload_handlers = [DocumentUploadHandler(request)]
+        return drf_request
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -37,39 +75,46 @@ class AssetViewSet(viewsets.ModelViewSet):
         return AssetSerializer
     
     def get_queryset(self):
-        queryset = Asset.objects.all().prefetch_related('documents')
-        
-        # Custom filtering for advanced search
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(asset_id__icontains=search) |
-                Q(make__icontains=search) |
-                Q(model__icontains=search) |
-                Q(vin__icontains=search) |
-                Q(license_plate__icontains=search) |
-                Q(department__icontains=search)
-            )
-        
-        return queryset
+        if self.action == 'list':
+            # The list only shows how many documents an asset has
+            return Asset.objects.annotate(documents_count=Count('documents'))
+        return self.expand_queryset(Asset.objects.all())
     
     @action(detail=True, methods=['get'])
     def documents(self, request, pk=None):
         """Get all documents for an asset"""
         asset = self.get_object()
         documents = asset.documents.all()
-        serializer = AssetDocumentSerializer(documents, many=True)
+        serializer = AssetDocumentSerializer(documents, many=True, context={'request': request})
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def upload_document(self, request, pk=None):
         """Upload a document for an asset"""
         asset = self.get_object()
-        serializer = AssetDocumentSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save(asset=asset)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer = AssetDocumentSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload = serializer.validated_data.pop('file')
+        error = inspect_upload(upload)
+        if error:
+            return Response({'file': [error]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Identical files share one stored blob, locked until the document is committed
+        storage = AssetDocument._meta.get_field('file').storage
+        with transaction.atomic():
+            serializer.save(asset=asset, **document_fields(upload, storage))
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'], url_path=r'documents/(?P<document_pk>[^/.]+)/download')
+    def download_document(self, request, pk=None, document_pk=None):
+        """Download a document, with ETag revalidation and byte-range support"""
+        asset = self.get_object()
+        document = asset.documents.filter(pk=document_pk).first() if document_pk.isdigit() else None
+        if document is None or not document.file:
+            return Response({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
+        return document_response(request, document)
     
     @action(detail=True, methods=['post'])
     def upload_image(self, request, pk=None):
@@ -99,13 +144,8 @@ class AssetViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Delete old image files if they exist
-        if asset.image:
-            asset.image.delete(save=False)
-        if asset.thumbnail:
-            asset.thumbnail.delete(save=False)
-        
-        # Set new image and save (this will trigger image processing)
+        # Store the new image; the previous files are replaced once its
+        # derivatives are ready (re-uploading the same image is a no-op)
         asset.image = image_file
         asset.save()
         
@@ -113,7 +153,8 @@ class AssetViewSet(viewsets.ModelViewSet):
         return Response({
             'message': 'Image uploaded successfully',
             'image': request.build_absolute_uri(asset.image.url) if asset.image else None,
-            'thumbnail': request.build_absolute_uri(asset.thumbnail.url) if asset.thumbnail else None
+            'thumbnail': request.build_absolute_uri(asset.thumbnail.url) if asset.thumbnail else None,
+            'image_status': asset.image_status
         }, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['delete'])
@@ -145,24 +186,8 @@ class AssetViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get basic statistics about assets"""
-        total_assets = Asset.objects.count()
-        active_assets = Asset.objects.filter(status='active').count()
-        maintenance_assets = Asset.objects.filter(status='maintenance').count()
-        retired_assets = Asset.objects.filter(status='retired').count()
-        
-        vehicle_types = {}
-        for choice in Asset.VEHICLE_TYPE_CHOICES:
-            count = Asset.objects.filter(vehicle_type=choice[0]).count()
-            vehicle_types[choice[1]] = count
-        
-        return Response({
-            'total_assets': total_assets,
-            'active_assets': active_assets,
-            'maintenance_assets': maintenance_assets,
-            'retired_assets': retired_assets,
-            'vehicle_types': vehicle_types
-        })
+        """Get asset counts by status, vehicle type and department"""
+        return Response(get_asset_stats())
     
     @action(detail=False, methods=['post'])
     def bulk_import(self, request):
@@ -189,110 +214,48 @@ class AssetViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Parse CSV
-        try:
-            decoded_file = csv_file.read().decode('utf-8')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            
-            # Validate required columns
-            required_columns = ['asset_id', 'vehicle_type', 'make', 'model', 'year']
-            if not all(col in reader.fieldnames for col in required_columns):
-                missing = [col for col in required_columns if col not in reader.fieldnames]
-                return Response(
-                    {'error': f'Missing required columns: {", ".join(missing)}'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Process rows
-            success_count = 0
-            error_rows = []
-            created_assets = []
-            
-            with transaction.atomic():
-                for row_num, row in enumerate(reader, start=2):  # Start at 2 (header is row 1)
-                    try:
-                        # Clean and validate data
-                        asset_data = {
-                            'asset_id': row.get('asset_id', '').strip(),
-                            'vehicle_type': row.get('vehicle_type', '').strip().lower(),
-                            'make': row.get('make', '').strip(),
-                            'model': row.get('model', '').strip(),
-                            'year': int(row.get('year', 0)),
-                        }
-                        
-                        # Optional fields
-                        if row.get('vin'):
-                            asset_data['vin'] = row['vin'].strip()
-                        if row.get('license_plate'):
-                            asset_data['license_plate'] = row['license_plate'].strip()
-                        if row.get('department'):
-                            asset_data['department'] = row['department'].strip()
-                        if row.get('status'):
-                            asset_data['status'] = row['status'].strip().lower()
-                        if row.get('current_odometer'):
-                            asset_data['current_odometer'] = int(row['current_odometer'])
-                        if row.get('purchase_date'):
-                            asset_data['purchase_date'] = datetime.strptime(
-                                row['purchase_date'], '%Y-%m-%d'
-                            ).date()
-                        if row.get('purchase_cost'):
-                            asset_data['purchase_cost'] = float(row['purchase_cost'])
-                        if row.get('notes'):
-                            asset_data['notes'] = row['notes'].strip()
-                        
-                        # Validate vehicle type
-                        valid_types = [choice[0] for choice in Asset.VEHICLE_TYPE_CHOICES]
-                        if asset_data['vehicle_type'] not in valid_types:
-                            raise ValueError(f"Invalid vehicle type: {asset_data['vehicle_type']}")
-                        
-                        # Validate status if provided
-                        if 'status' in asset_data:
-                            valid_statuses = [choice[0] for choice in Asset.STATUS_CHOICES]
-                            if asset_data['status'] not in valid_statuses:
-                                raise ValueError(f"Invalid status: {asset_data['status']}")
-                        
-                        # Check for duplicate asset_id
-                        if Asset.objects.filter(asset_id=asset_data['asset_id']).exists():
-                            raise ValueError(f"Asset ID '{asset_data['asset_id']}' already exists")
-                        
-                        # Create asset
-                        serializer = AssetCreateUpdateSerializer(data=asset_data)
-                        if serializer.is_valid():
-                            asset = serializer.save()
-                            created_assets.append(asset)
-                            success_count += 1
-                        else:
-                            raise ValueError(str(serializer.errors))
-                        
-                    except Exception as e:
-                        error_rows.append({
-                            'row': row_num,
-                            'asset_id': row.get('asset_id', 'N/A'),
-                            'error': str(e)
-                        })
-            
-            # Prepare response
-            response_data = {
-                'success_count': success_count,
-                'error_count': len(error_rows),
-                'total_rows': success_count + len(error_rows),
-            }
-            
-            if error_rows:
-                response_data['errors'] = error_rows
-                
-            # If all failed, return error status
-            if success_count == 0 and error_rows:
-                return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
-            
-            return Response(response_data, status=status.HTTP_201_CREATED)
-            
-        except Exception as e:
+        set_audit_resource(request, 'assets', resource_name=f'Bulk import: {csv_file.name}')
+        if should_run_in_background(request, csv_file):
+            job = enqueue('asset_import', user=request.user, upload=csv_file)
+            return Response(BackgroundJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        
+        return Response(*import_assets_csv(csv_file))
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every asset matching the list filters as CSV (default), NDJSON
+        (export_format=ndjson) or Parquet (export_format=parquet), optionally
+        with current location, driver and last fuel fill (include=...).
+        """
+        export_format = request.query_params.get('export_format', 'csv').lower()
+        if export_format not in EXPORT_CONTENT_TYPES:
             return Response(
-                {'error': f'Failed to process CSV file: {str(e)}'},
+                {'error': f'export_format must be one of: {", ".join(EXPORT_CONTENT_TYPES)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if export_format == 'parquet' and not parquet_available():
+            return Response(
+                {'error': 'Parquet export requires pyarrow to be installed'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            includes = parse_includes(request.query_params.get('include'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        columns, rows = export_rows(self.filter_queryset(self.get_queryset()), includes)
+        if export_format == 'parquet':
+            chunks = export_parquet(Asset, columns, rows, includes)
+        elif export_format == 'ndjson':
+            chunks = export_ndjson(columns, rows)
+        else:
+            chunks = export_csv(columns, rows)
+        
+        filename = f'assets_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
+        response = StreamingHttpResponse(chunks, content_type=EXPORT_CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
     
     @action(detail=False, methods=['get'])
     def download_template(self, request):
@@ -361,4 +324,34 @@ class AssetDocumentViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['document_type', 'asset']
-    search_fields = ['title', 'description', 'asset__asset_id']
\ No newline at end of file
+    search_fields = ['title', 'description', 'asset__asset_id']
+    
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        if self.action in ['update', 'partial_update']:
+            request.upload_handlers = [DocumentUploadHandler(request)]
+        return drf_request
+    
+    def perform_update(self, serializer):
+        """A replaced file goes through the document store like upload_document"""
+        upload = serializer.validated_data.pop('file', None)
+        if upload is None:
+            serializer.save()
+            return
+        error = inspect_upload(upload)
+        if error:
+            raise ValidationError({'file': [error]})
+        
+        storage = AssetDocument._meta.get_field('file').storage
+        previous = serializer.instance.file.name
+        with transaction.atomic():
+            serializer.save(**document_fields(upload, storage))
+            if previous != serializer.instance.file.name:
+                release_blob(previous, storage)
+
+
+def serve_image_derivative(request, path):
+    """Development server for content-addressed image derivatives, cached as immutable"""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
+
+    def ready(self):
+        # Invalidate cached permission sets and tokens when roles, assignments, users or tokens change,
+        # and restore the audit search triggers after migrations
+        from . import signals
+        signals.connect()
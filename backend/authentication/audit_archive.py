@@ -0,0 +1,261 @@
+"""
+Archival of old audit logs into compressed, append-only segment files
+
+archive_audit_logs() moves audit logs older than a cutoff out of the database
+into one gzip'd NDJSON segment per day under AUDIT_ARCHIVE_DIR, newest record
+first, and indexes each segment (time range, record count, actors, actions,
+resource types) in AuditArchiveSegment. Rows are deleted only once their
+segment is on disk and indexed. Hourly rollups are kept, so statistics still
+cover archived periods.
+
+AuditArchive answers the list/export filters over the archive: the index
+rules out segments whose time range or actors cannot match, whole segments
+are counted or skipped from the index when it shows every record matches,
+and only the remaining segments are opened and scanned. Paginated lists use
+estimated_count(), which never opens a segment. find() looks a single record
+up by id, narrowed to the segments covering its timestamp when known.
+"""
+from datetime import datetime, time, timedelta
+import gzip
+import json
+import os
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .audit_search import SEARCH_FIELDS, matches_terms, search_terms
+from .models import AuditLog, AuditArchiveSegment
+
+
+ARCHIVE_FIELDS = [
+    'id', 'timestamp', 'actor_id', 'actor_email', 'actor_role', 'action',
+    'resource_type', 'resource_id', 'resource_name', 'before_state', 'after_state',
+    'changes', 'ip_address', 'user_agent', 'request_id', 'session_id', 'reason',
+    'approval_id', 'risk_score',
+]
+DELETE_BATCH_SIZE = 500
+
+
+def archive_root():
+    return str(settings.AUDIT_ARCHIVE_DIR)
+
+
+def _encode(record):
+    record = dict(record)
+    for field in ['id', 'request_id', 'approval_id']:
+        if record[field] is not None:
+            record[field] = str(record[field])
+    record['timestamp'] = record['timestamp'].isoformat()
+    return json.dumps(record) + '\n'
+
+
+def _write_segment(day, rows):
+    """Write one day's rows to a new segment file; returns (relative path, index fields, ids)"""
+    relative = os.path.join(f'{day:%Y}', f'{day:%m}', f'audit-{day:%Y%m%d}-{uuid.uuid4().hex[:8]}.ndjson.gz')
+    path = os.path.join(archive_root(), relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    ids = []
+    index = {'record_count': 0, 'start_time': None, 'end_time': None,
+             'actors': set(), 'actions': set(), 'resource_types': set()}
+    partial = f'{path}.partial'
+    with open(partial, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as segment:
+            for record in rows:
+                segment.write(_encode(record).encode('utf-8'))
+                ids.append(record['id'])
+                index['record_count'] += 1
+                # Rows arrive newest first
+                index['end_time'] = index['end_time'] or record['timestamp']
+                index['start_time'] = record['timestamp']
+                index['actors'].add(record['actor_email'])
+                index['actions'].add(record['action'])
+                index['resource_types'].add(record['resource_type'])
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+
+    for key in ['actors', 'actions', 'resource_types']:
+        index[key] = sorted(index[key])
+    return relative, index, ids
+
+
+def archive_audit_logs(older_than_days):
+    """
+    Move audit logs from days that ended more than older_than_days ago into
+    per-day segments. Returns (segments written, records archived).
+    """
+    cutoff = timezone.localtime(timezone.now() - timedelta(days=older_than_days))
+    cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    segments = records = 0
+    while True:
+        oldest = AuditLog.objects.filter(timestamp__lt=cutoff).order_by('timestamp').values_list(
+            'timestamp', flat=True).first()
+        if oldest is None:
+            break
+        day_start = timezone.localtime(oldest).replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = min(day_start + timedelta(days=1), cutoff)
+        in_day = AuditLog.objects.filter(timestamp__gte=day_start, timestamp__lt=day_end)
+
+        rows = in_day.order_by('-timestamp').values(*ARCHIVE_FIELDS).iterator(chunk_size=2000)
+        relative, index, ids = _write_segment(day_start.date(), rows)
+        with transaction.atomic():
+            AuditArchiveSegment.objects.create(path=relative, **index)
+            # Only what was written: late inserts for the day wait for the next run
+            for offset in range(0, len(ids), DELETE_BATCH_SIZE):
+                AuditLog.objects.filter(id__in=ids[offset:offset + DELETE_BATCH_SIZE]).delete()
+
+        segments += 1
+        records += index['record_count']
+    return segments, records
+
+
+def _parse_bound(value):
+    """Mirror how the database interprets start_date/end_date strings"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class AuditArchive:
+    """The archived audit logs matching a set of list filters"""
+
+    def __init__(self, params):
+        self.start = _parse_bound(params.get('start_date'))
+        self.end = _parse_bound(params.get('end_date'))
+        self.actor = (params.get('actor') or '').lower()
+        self.action = params.get('action') or ''
+        self.resource_type = params.get('resource_type') or ''
+        self.min_risk = int(params['min_risk']) if params.get('min_risk') else None
+        self.search = search_terms(params.get('search'))
+
+    def segments(self):
+        """Candidate segments, newest first, ruled in or out by the index"""
+        queryset = AuditArchiveSegment.objects.order_by('-end_time')
+        if self.start:
+            queryset = queryset.filter(end_time__gte=self.start)
+        if self.end:
+            queryset = queryset.filter(start_time__lte=self.end)
+
+        for segment in queryset:
+            if self.actor and not any(self.actor in actor.lower() for actor in segment.actors):
+                continue
+            if self.action and self.action not in segment.actions:
+                continue
+            if self.resource_type and self.resource_type not in segment.resource_types:
+                continue
+            yield segment
+
+    def covers(self, segment):
+        """Whether every record in the segment matches, so the index count is exact"""
+        return (
+            self.min_risk is None and not self.search
+            and (not self.actor or all(self.actor in actor.lower() for actor in segment.actors))
+            and (not self.action or segment.actions == [self.action])
+            and (not self.resource_type or segment.resource_types == [self.resource_type])
+            and (self.start is None or segment.start_time >= self.start)
+            and (self.end is None or segment.end_time <= self.end)
+        )
+
+    def matches(self, record):
+        timestamp = record['timestamp']
+        if self.start and timestamp < self.start:
+            return False
+        if self.end and timestamp > self.end:
+            return False
+        if self.actor and self.actor not in record['actor_email'].lower():
+            return False
+        if self.action and record['action'] != self.action:
+            return False
+        if self.resource_type and record['resource_type'] != self.resource_type:
+            return False
+        if self.min_risk is not None and record['risk_score'] < self.min_risk:
+            return False
+        if self.search and not matches_terms(self.search, [record[field] for field in SEARCH_FIELDS]):
+            return False
+        return True
+
+    def read(self, segment):
+        """Matching records of one segment, newest first"""
+        with gzip.open(os.path.join(archive_root(), segment.path), 'rt', encoding='utf-8') as lines:
+            for line in lines:
+                record = json.loads(line)
+                record['timestamp'] = parse_datetime(record['timestamp'])
+                if self.matches(record):
+                    yield record
+
+    def estimated_count(self):
+        """
+        (count, exact) from the index alone, without opening any segment. The
+        count is an upper bound unless exact, i.e. unless every candidate
+        segment is covered.
+        """
+        total = 0
+        exact = True
+        for segment in self.segments():
+            total += segment.record_count
+            exact = exact and self.covers(segment)
+        return total, exact
+
+    def count(self):
+        """Exact count; scans every candidate segment that is not covered"""
+        total = 0
+        for segment in self.segments():
+            if self.covers(segment):
+                total += segment.record_count
+            else:
+                total += sum(1 for _ in self.read(segment))
+        return total
+
+    def records(self, offset=0, limit=None):
+        """Matching records newest first, skipping whole segments where possible"""
+        for segment in self.segments():
+            if limit is not None and limit <= 0:
+                return
+            if offset and self.covers(segment) and offset >= segment.record_count:
+                offset -= segment.record_count
+                continue
+            for record in self.read(segment):
+                if offset:
+                    offset -= 1
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield record
+
+    @staticmethod
+    def find(record_id, timestamp=None):
+        """
+        The archived record with this id, or None. With its timestamp only the
+        segments whose time range covers it are read; otherwise every segment
+        is, newest first.
+        """
+        segments = AuditArchiveSegment.objects.order_by('-end_time')
+        moment = _parse_bound(timestamp)
+        if moment:
+            segments = segments.filter(start_time__lte=moment, end_time__gte=moment)
+        archive = AuditArchive({})
+        for segment in segments:
+            for record in archive.read(segment):
+                if record['id'] == record_id:
+                    return record
+        return None
+
+    @staticmethod
+    def to_log(record):
+        """An unsaved AuditLog for serializing an archived record"""
+        return AuditLog(**record)
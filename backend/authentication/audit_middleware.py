@@ -3,11 +3,66 @@ Middleware for automatic audit logging
 """
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
-from .models import AuditLog
+from django.utils import timezone
+from .audit_writer import write_audit_record
 import json
 import uuid
 
 
+# Request attribute holding (resource_type, resource_id, resource_name) set by views
+AUDIT_RESOURCE_ATTRIBUTE = 'audit_resource'
+
+
+def set_audit_resource(request, resource_type, resource_id='', resource_name=''):
+    """Record which resource a view acted on, for the audit middleware"""
+    # DRF wraps the Django request; the middleware only sees the original
+    request = getattr(request, '_request', request)
+    setattr(request, AUDIT_RESOURCE_ATTRIBUTE, (resource_type, str(resource_id or ''), str(resource_name or '')))
+
+
+class AuditedViewSetMixin:
+    """
+    Attributes audited requests to the object a viewset loads, creates,
+    updates or deletes, so the middleware never sniffs paths or responses.
+    The resource type defaults to the model's app label.
+    """
+    audit_resource_type = None
+    audit_name_fields = ['name', 'username', 'email', 'asset_id', 'driver_id', 'title']
+    
+    def get_audit_resource_type(self):
+        if self.audit_resource_type:
+            return self.audit_resource_type
+        queryset = self.queryset if self.queryset is not None else self.get_queryset()
+        return queryset.model._meta.app_label
+    
+    def get_audit_resource_name(self, obj):
+        for field in self.audit_name_fields:
+            value = getattr(obj, field, None)
+            if value:
+                return value
+        return str(obj)
+    
+    def audit_resource(self, obj):
+        set_audit_resource(self.request, self.get_audit_resource_type(), obj.pk, self.get_audit_resource_name(obj))
+    
+    def get_object(self):
+        obj = super().get_object()
+        self.audit_resource(obj)
+        return obj
+    
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.audit_resource(serializer.instance)
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.audit_resource(serializer.instance)
+    
+    def perform_destroy(self, instance):
+        self.audit_resource(instance)
+        super().perform_destroy(instance)
+
+
 class AuditLoggingMiddleware(MiddlewareMixin):
     """Middleware to automatically log all significant actions"""
     
@@ -22,6 +77,9 @@ class AuditLoggingMiddleware(MiddlewareMixin):
         '/api/drivers/',
     ]
     
+    # Responses larger than this are never parsed for a resource name
+    MAX_NAME_PARSE_BYTES = 64 * 1024
+    
     def process_request(self, request):
         """Add request ID for tracking"""
         request.request_id = str(uuid.uuid4())
@@ -55,33 +113,30 @@ class AuditLoggingMiddleware(MiddlewareMixin):
         return False
     
     def create_audit_log(self, request, response):
-        """Create an audit log entry"""
+        """Queue an audit log entry for the batched writer"""
         try:
             # Determine action type
             action = self.get_action_type(request, response)
             
             # Extract resource information
-            resource_type, resource_id = self.extract_resource_info(request)
-            
-            # Get user role
-            user_roles = list(request.user.groups.values_list('name', flat=True))
-            user_role = user_roles[0] if user_roles else 'No Role'
+            resource_type, resource_id, resource_name = self.get_resource(request, response)
             
-            # Create audit log
-            AuditLog.objects.create(
-                actor=request.user,
-                actor_email=request.user.email,
-                actor_role=user_role,
-                action=action,
-                resource_type=resource_type,
-                resource_id=resource_id or '',
-                resource_name=self.get_resource_name(request, response),
-                ip_address=self.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                request_id=getattr(request, 'request_id', None),
-                session_id=request.session.session_key if hasattr(request, 'session') and request.session else None,
-                risk_score=self.calculate_risk_score(request, response)
-            )
+            # The writer resolves the actor's role when the batch is inserted
+            write_audit_record({
+                'id': str(uuid.uuid4()),
+                'timestamp': timezone.now().isoformat(),
+                'actor_id': request.user.pk,
+                'actor_email': request.user.email,
+                'action': action,
+                'resource_type': resource_type,
+                'resource_id': resource_id,
+                'resource_name': resource_name,
+                'ip_address': self.get_client_ip(request),
+                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+                'request_id': getattr(request, 'request_id', None),
+                'session_id': request.session.session_key if hasattr(request, 'session') and request.session else None,
+                'risk_score': self.calculate_risk_score(request, response),
+            })
         except Exception as e:
             # Log error but don't break the response
             print(f"Audit logging error: {e}")
@@ -117,6 +172,15 @@ class AuditLoggingMiddleware(MiddlewareMixin):
         
         return method_map.get(request.method, 'unknown')
     
+    def get_resource(self, request, response):
+        """Resource type, id and name, as attributed by the view when it did so"""
+        resource = getattr(request, AUDIT_RESOURCE_ATTRIBUTE, None)
+        if resource:
+            return resource
+        
+        resource_type, resource_id = self.extract_resource_info(request)
+        return resource_type, resource_id or '', self.get_resource_name(request, response)
+    
     def extract_resource_info(self, request):
         """Extract resource type and ID from request path"""
         path_parts = request.path.strip('/').split('/')
@@ -131,7 +195,12 @@ class AuditLoggingMiddleware(MiddlewareMixin):
     
     def get_resource_name(self, request, response):
         """Try to get a human-readable resource name"""
-        if response.status_code == 200 or response.status_code == 201:
+        # Only small JSON bodies are worth decoding for a name
+        if (
+            response.status_code in (200, 201)
+            and not response.streaming
+            and len(response.content) <= self.MAX_NAME_PARSE_BYTES
+        ):
             try:
                 data = json.loads(response.content)
                 # Try common fields
@@ -0,0 +1,144 @@
+"""
+Hourly audit rollups and constant-query audit statistics
+
+Every batch of audit logs written increments the matching AuditRollup rows
+(hour, action, resource type, actor). Statistics for any window then read
+whole hours from the rollup table and only the partial hours at either end
+from the raw log table - two grouped queries whatever the window length.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncHour
+
+from .models import AuditLog, AuditRollup
+
+
+GROUP_FIELDS = ['action', 'resource_type', 'actor_email']
+
+# (rollup column, condition on AuditLog.risk_score)
+RISK_BUCKETS = [
+    ('low_risk_count', Q(risk_score__lt=30)),
+    ('medium_risk_count', Q(risk_score__gte=30, risk_score__lt=60)),
+    ('high_risk_count', Q(risk_score__gte=60)),
+    ('critical_risk_count', Q(risk_score__gte=80)),
+]
+
+
+def hour_floor(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def hour_ceil(moment):
+    floor = hour_floor(moment)
+    return floor if floor == moment else floor + timedelta(hours=1)
+
+
+def risk_counts(risk_score):
+    return {
+        'low_risk_count': int(risk_score < 30),
+        'medium_risk_count': int(30 <= risk_score < 60),
+        'high_risk_count': int(risk_score >= 60),
+        'critical_risk_count': int(risk_score >= 80),
+    }
+
+
+def record_rollups(logs):
+    """Add newly inserted audit logs to their hourly rollups"""
+    totals = defaultdict(Counter)
+    for log in logs:
+        key = (hour_floor(log.timestamp), log.action, log.resource_type, log.actor_email)
+        totals[key]['event_count'] += 1
+        totals[key].update(risk_counts(log.risk_score))
+
+    for (bucket, action, resource_type, actor_email), counts in totals.items():
+        lookup = {'bucket': bucket, 'action': action, 'resource_type': resource_type, 'actor_email': actor_email}
+        increments = {field: F(field) + value for field, value in counts.items()}
+        if AuditRollup.objects.filter(**lookup).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                AuditRollup.objects.create(**lookup, **counts)
+        except IntegrityError:
+            # Another writer created the row first
+            AuditRollup.objects.filter(**lookup).update(**increments)
+
+
+def rebuild_rollups():
+    """
+    Recompute rollups from the raw log table; returns the number of rows.
+    Hours before the oldest row still in the table (archived periods) are kept.
+    """
+    oldest = AuditLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return 0
+    since = hour_floor(oldest)
+
+    aggregates = {'event_count': Count('id')}
+    aggregates.update({field: Count('id', filter=condition) for field, condition in RISK_BUCKETS})
+    rows = (
+        AuditLog.objects.filter(timestamp__gte=since).order_by()
+        .annotate(bucket=TruncHour('timestamp'))
+        .values('bucket', *GROUP_FIELDS)
+        .annotate(**aggregates)
+    )
+    with transaction.atomic():
+        AuditRollup.objects.filter(bucket__gte=since).delete()
+        created = AuditRollup.objects.bulk_create([AuditRollup(**row) for row in rows.iterator()], batch_size=1000)
+    return len(created)
+
+
+def audit_stats(start, end):
+    """Grouped audit counts for [start, end) from rollups plus partial-hour raw rows"""
+    rolled_start, rolled_end = hour_ceil(start), hour_floor(end)
+
+    rollup_aggregates = {'event_count': Sum('event_count')}
+    rollup_aggregates.update({field: Sum(field) for field, _ in RISK_BUCKETS})
+    raw_aggregates = {'event_count': Count('id')}
+    raw_aggregates.update({field: Count('id', filter=condition) for field, condition in RISK_BUCKETS})
+
+    if rolled_start < rolled_end:
+        rolled = (
+            AuditRollup.objects.filter(bucket__gte=rolled_start, bucket__lt=rolled_end)
+            .order_by().values(*GROUP_FIELDS).annotate(**rollup_aggregates)
+        )
+        raw_window = (
+            Q(timestamp__gte=start, timestamp__lt=rolled_start) |
+            Q(timestamp__gte=rolled_end, timestamp__lt=end)
+        )
+    else:
+        rolled = []
+        raw_window = Q(timestamp__gte=start, timestamp__lt=end)
+
+    raw = AuditLog.objects.filter(raw_window).order_by().values(*GROUP_FIELDS).annotate(**raw_aggregates)
+
+    totals = Counter()
+    actions = Counter()
+    actors = Counter()
+    resources = Counter()
+    for row in list(rolled) + list(raw):
+        count = row['event_count'] or 0
+        if not count:
+            continue
+        actions[row['action']] += count
+        actors[row['actor_email']] += count
+        resources[row['resource_type']] += count
+        totals['events'] += count
+        for field, _ in RISK_BUCKETS:
+            totals[field] += row[field] or 0
+
+    return {
+        'total_events': totals['events'],
+        'action_counts': dict(actions),
+        'top_actors': [{'email': email, 'count': count} for email, count in actors.most_common(5)],
+        'risk_distribution': {
+            'low': totals['low_risk_count'],
+            'medium': totals['medium_risk_count'],
+            'high': totals['high_risk_count'],
+        },
+        'resource_counts': dict(resources),
+        'high_risk_events': totals['critical_risk_count'],
+        'failed_permissions': actions.get('permission_denied', 0),
+    }
@@ -0,0 +1,140 @@
+"""
+Indexed full-text search over audit logs
+
+The audit list `search` parameter matches actor email, resource name,
+resource type and action. Each word of the query must prefix a word of one
+of those fields ("jan exam" finds jane@example.com), and results are ranked
+by relevance before recency.
+
+On SQLite the words live in an FTS5 table kept in step with the audit log
+table by triggers, so every insert path (inline, batched writer, spool
+replay) indexes its rows and archiving removes them. A migration that
+remakes the audit log table drops its triggers, so after every migrate
+restore_search_index() re-creates any that are missing and re-reads the
+table. The index is keyed on the table's implicit rowid, which a VACUUM may
+renumber: run rebuild_audit_search after one. On PostgreSQL a GIN index
+over the same fields' tsvector serves the search. Other databases fall back
+to substring matching.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+from .models import AuditLog
+
+
+SEARCH_FIELDS = ['actor_email', 'resource_name', 'resource_type', 'action']
+
+AUDIT_TABLE = AuditLog._meta.db_table
+FTS_TABLE = f'{AUDIT_TABLE}_fts'
+
+# Word characters as FTS5's unicode61 tokenizer sees them (underscore separates words)
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+_columns = ', '.join(SEARCH_FIELDS)
+_new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+_old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+# Punctuation replaced by spaces so emails split into words as they do in FTS5
+TSVECTOR_SQL = "to_tsvector('simple', regexp_replace({}, '[^[:alnum:]]+', ' ', 'g'))".format(
+    " || ' ' || ".join(f"coalesce({field}, '')" for field in SEARCH_FIELDS)
+)
+
+SQLITE_TRIGGERS = [f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au']
+# Same statements as migration 0007, which created the index
+SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_columns}, content='{AUDIT_TABLE}', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {AUDIT_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.rowid, {_new_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {AUDIT_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.rowid, {_old_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {AUDIT_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.rowid, {_old_values}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.rowid, {_new_values}); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def _execute(db_connection, statements):
+    with db_connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def restore_search_index(db_connection):
+    """
+    Re-create the SQLite triggers if a table remake dropped them, and re-read
+    the table into the index. Does nothing before migration 0007 created the
+    index (or after it was unapplied). Returns whether anything was missing.
+    """
+    if db_connection.vendor != 'sqlite':
+        return False
+    with db_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)", [FTS_TABLE, *SQLITE_TRIGGERS]
+        )
+        existing = {name for name, in cursor.fetchall()}
+    if FTS_TABLE not in existing or existing.issuperset(SQLITE_TRIGGERS):
+        return False
+    _execute(db_connection, SQLITE_INSTALL)
+    return True
+
+
+def rebuild_search_index():
+    """
+    Re-read every audit log into the SQLite index. Needed after a VACUUM,
+    which may renumber the rowids the index refers to.
+    """
+    if connection.vendor == 'sqlite':
+        _execute(connection, [f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"])
+
+
+def search_terms(text):
+    return WORD_PATTERN.findall((text or '').lower())
+
+
+def matches_terms(terms, values):
+    """Whether every term prefixes a word of the values (the index's rule, for archived records)"""
+    words = set()
+    for value in values:
+        words.update(search_terms(value))
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+def search_audit_logs(queryset, text):
+    """Restrict an AuditLog queryset to logs matching text, best matches first"""
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+
+    if connection.vendor == 'sqlite':
+        # Prefix query per word, implicitly ANDed; quoting keeps words literal.
+        # One join on the index: it both filters and ranks (bm25: lower is better)
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {AUDIT_TABLE}.rowid', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+        ).order_by('search_rank', '-timestamp')
+
+    if connection.vendor == 'postgresql':
+        query = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.annotate(
+            search_rank=RawSQL(f"ts_rank({TSVECTOR_SQL}, to_tsquery('simple', %s))", [query])
+        ).filter(
+            id__in=RawSQL(
+                f"SELECT id FROM {AUDIT_TABLE} WHERE {TSVECTOR_SQL} @@ to_tsquery('simple', %s)",
+                [query]
+            )
+        ).order_by(F('search_rank').desc(), '-timestamp')
+
+    condition = Q()
+    for term in terms:
+        term_condition = Q()
+        for field in SEARCH_FIELDS:
+            term_condition |= Q(**{f'{field}__icontains': term})
+        condition &= term_condition
+    return queryset.filter(condition)
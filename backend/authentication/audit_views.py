@@ -5,11 +5,19 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from config.streaming import LineBuffer, buffered, gzip_chunks
 from .models import AuditLog
+from .audit_archive import AuditArchive
+from .audit_rollup import audit_stats
+from .audit_search import search_audit_logs
 from .permissions import IsAdmin
 import csv
+import itertools
+import json
+import uuid
 from datetime import datetime, timedelta
 from django.utils import timezone
 
@@ -36,14 +44,59 @@ class AuditLogSerializer:
         }
 
 
+EXPORT_FIELDS = [
+    'timestamp', 'actor_email', 'actor_role', 'action',
+    'resource_type', 'resource_id', 'resource_name',
+    'ip_address', 'risk_score'
+]
+EXPORT_HEADERS = [
+    'Timestamp', 'Actor Email', 'Actor Role', 'Action',
+    'Resource Type', 'Resource ID', 'Resource Name',
+    'IP Address', 'Risk Score'
+]
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+# Rows fetched per database round-trip, and bytes buffered per streamed chunk
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+
+def export_csv(rows):
+    action_labels = dict(AuditLog.ACTION_CHOICES)
+    buffer = LineBuffer()
+    writer = csv.writer(buffer)
+    
+    def lines():
+        writer.writerow(EXPORT_HEADERS)
+        yield buffer.drain()
+        for timestamp, email, role, action, resource_type, resource_id, name, ip, risk in rows:
+            writer.writerow([
+                timestamp.isoformat(), email, role, action_labels.get(action, action),
+                resource_type, resource_id, name, ip, risk
+            ])
+            yield buffer.drain()
+    
+    return buffered(lines(), EXPORT_BUFFER_BYTES)
+
+
+def export_ndjson(rows):
+    def lines():
+        for row in rows:
+            record = dict(zip(EXPORT_FIELDS, row))
+            record['timestamp'] = record['timestamp'].isoformat()
+            yield json.dumps(record) + '\n'
+    
+    return buffered(lines(), EXPORT_BUFFER_BYTES)
+
+
 class AuditLogViewSet(viewsets.ViewSet):
     """ViewSet for audit log management"""
     permission_classes = [IsAuthenticated, IsAdmin]
     
-    def list(self, request):
-        """List audit logs with filtering"""
-        queryset = AuditLog.objects.all()
-        
+    def filter_queryset(self, request, queryset):
+        """Apply the list filters (also used by export)"""
         # Filter by date range
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
@@ -72,15 +125,22 @@ class AuditLogViewSet(viewsets.ViewSet):
         if min_risk:
             queryset = queryset.filter(risk_score__gte=int(min_risk))
         
-        # Search across multiple fields
+        # Ranked prefix search across multiple fields
         search = request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(actor_email__icontains=search) |
-                Q(resource_name__icontains=search) |
-                Q(resource_type__icontains=search) |
-                Q(action__icontains=search)
-            )
+            queryset = search_audit_logs(queryset, search)
+        
+        return queryset
+    
+    def get_archive(self, request):
+        """The archived logs matching the request's filters, unless include_archive=false"""
+        if request.query_params.get('include_archive', 'true').lower() == 'false':
+            return None
+        return AuditArchive(request.query_params)
+    
+    def list(self, request):
+        """List audit logs with filtering"""
+        queryset = self.filter_queryset(request, AuditLog.objects.all())
         
         # Pagination
         page = int(request.query_params.get('page', 1))
@@ -88,69 +148,85 @@ class AuditLogViewSet(viewsets.ViewSet):
         start = (page - 1) * page_size
         end = start + page_size
         
-        total = queryset.count()
-        logs = queryset[start:end]
+        db_total = queryset.count()
+        logs = list(queryset[start:end])
+        total = db_total
+        count_exact = True
+        
+        # Archived logs are older than anything left in the database, so they follow it.
+        # Their count comes from the segment index only: an upper bound when
+        # content filters apply, flagged by count_exact.
+        archive = self.get_archive(request)
+        if archive is not None:
+            archive_total, count_exact = archive.estimated_count()
+            total += archive_total
+            if len(logs) < page_size:
+                archived = archive.records(offset=max(0, start - db_total), limit=page_size - len(logs))
+                logs += [AuditArchive.to_log(record) for record in archived]
         
         return Response({
             'results': [AuditLogSerializer.serialize(log) for log in logs],
             'count': total,
+            'count_exact': count_exact,
             'page': page,
             'page_size': page_size,
             'total_pages': (total + page_size - 1) // page_size
         })
     
     def retrieve(self, request, pk=None):
-        """Get single audit log"""
+        """
+        Get single audit log, from the database or else the archive (pass the
+        log's timestamp to only read the archive segments covering it)
+        """
         try:
-            log = AuditLog.objects.get(id=pk)
-            return Response(AuditLogSerializer.serialize(log))
-        except AuditLog.DoesNotExist:
+            record_id = str(uuid.UUID(pk))
+        except ValueError:
+            record_id = None
+        log = AuditLog.objects.filter(id=record_id).first() if record_id else None
+        if log is None and record_id:
+            record = AuditArchive.find(record_id, request.query_params.get('timestamp'))
+            log = AuditArchive.to_log(record) if record else None
+        if log is None:
             return Response(
                 {'error': 'Audit log not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(AuditLogSerializer.serialize(log))
     
     @action(detail=False, methods=['get'])
     def export(self, request):
-        """Export audit logs to CSV"""
-        queryset = AuditLog.objects.all()
-        
-        # Apply same filters as list
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        if start_date:
-            queryset = queryset.filter(timestamp__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(timestamp__lte=end_date)
-        
-        actor_email = request.query_params.get('actor')
-        if actor_email:
-            queryset = queryset.filter(actor_email__icontains=actor_email)
-        
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="audit_logs_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+        """
+        Stream every matching audit log as CSV (default) or NDJSON
+        (export_format=ndjson), optionally gzip-compressed (compress=gzip).
+        Archived logs follow unless include_archive=false.
+        """
+        export_format = request.query_params.get('export_format', 'csv').lower()
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response(
+                {'error': f'export_format must be one of: {", ".join(EXPORT_CONTENT_TYPES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        compress = request.query_params.get('compress', '').lower() == 'gzip'
         
-        writer = csv.writer(response)
-        writer.writerow([
-            'Timestamp', 'Actor Email', 'Actor Role', 'Action', 
-            'Resource Type', 'Resource ID', 'Resource Name',
-            'IP Address', 'Risk Score'
-        ])
-        
-        for log in queryset[:10000]:  # Limit to 10k records
-            writer.writerow([
-                log.timestamp.isoformat(),
-                log.actor_email,
-                log.actor_role,
-                log.get_action_display(),
-                log.resource_type,
-                log.resource_id,
-                log.resource_name,
-                log.ip_address,
-                log.risk_score
-            ])
+        rows = (
+            self.filter_queryset(request, AuditLog.objects.all())
+            .values_list(*EXPORT_FIELDS)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        archive = self.get_archive(request)
+        if archive is not None:
+            archived = (tuple(record[field] for field in EXPORT_FIELDS) for record in archive.records())
+            rows = itertools.chain(rows, archived)
+        chunks = export_csv(rows) if export_format == 'csv' else export_ndjson(rows)
+        if compress:
+            chunks = gzip_chunks(chunks)
         
+        filename = f'audit_logs_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
+        response = StreamingHttpResponse(
+            chunks,
+            content_type='application/gzip' if compress else EXPORT_CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}{".gz" if compress else ""}"'
         return response
     
     @action(detail=False, methods=['get'])
@@ -158,53 +234,21 @@ class AuditLogViewSet(viewsets.ViewSet):
         """Get audit log statistics"""
         # Time range (last 30 days by default)
         days = int(request.query_params.get('days', 30))
-        start_date = timezone.now() - timedelta(days=days)
-        
-        queryset = AuditLog.objects.filter(timestamp__gte=start_date)
+        cache_key = f'audit:stats:{days}'
+        stats = cache.get(cache_key)
         
-        # Get action counts
-        action_counts = {}
-        for log in queryset.values('action').distinct():
-            action = log['action']
-            count = queryset.filter(action=action).count()
-            action_counts[action] = count
-        
-        # Get top actors
-        top_actors = []
-        for actor in queryset.values('actor_email').distinct()[:10]:
-            email = actor['actor_email']
-            count = queryset.filter(actor_email=email).count()
-            top_actors.append({'email': email, 'count': count})
-        top_actors.sort(key=lambda x: x['count'], reverse=True)
-        
-        # Get risk distribution
-        risk_distribution = {
-            'low': queryset.filter(risk_score__lt=30).count(),
-            'medium': queryset.filter(risk_score__gte=30, risk_score__lt=60).count(),
-            'high': queryset.filter(risk_score__gte=60).count(),
-        }
-        
-        # Get resource type counts
-        resource_counts = {}
-        for resource in queryset.values('resource_type').distinct():
-            resource_type = resource['resource_type']
-            count = queryset.filter(resource_type=resource_type).count()
-            resource_counts[resource_type] = count
-        
-        return Response({
-            'total_events': queryset.count(),
-            'date_range': {
+        if stats is None:
+            end_date = timezone.now()
+            start_date = end_date - timedelta(days=days)
+            stats = audit_stats(start_date, end_date)
+            stats['date_range'] = {
                 'start': start_date.isoformat(),
-                'end': timezone.now().isoformat(),
+                'end': end_date.isoformat(),
                 'days': days
-            },
-            'action_counts': action_counts,
-            'top_actors': top_actors[:5],
-            'risk_distribution': risk_distribution,
-            'resource_counts': resource_counts,
-            'high_risk_events': queryset.filter(risk_score__gte=80).count(),
-            'failed_permissions': queryset.filter(action='permission_denied').count(),
-        })
+            }
+            cache.set(cache_key, stats, getattr(settings, 'AUDIT_STATS_CACHE_TIMEOUT', 60))
+        
+        return Response(stats)
     
     @action(detail=False, methods=['get'])
     def action_types(self, request):
@@ -0,0 +1,257 @@
+"""
+Buffered audit log writer
+
+The audit middleware hands each event to write_audit_record() as a plain dict.
+With AUDIT_ASYNC enabled the record is appended to a spool file of its own
+writer (so a crash cannot lose it) and buffered in memory; a background
+thread batch-inserts the buffer with bulk_create once AUDIT_BATCH_SIZE
+records are waiting or every AUDIT_FLUSH_INTERVAL seconds, then discards the
+spooled copy. Spool files are named after the writer (pid plus a random
+suffix, as PIDs are reused across container and worker restarts), and each
+writer holds an flock on its lock file for as long as it lives. When a
+writer starts it replays the spools of every writer whose lock it can take:
+their owner is gone. Records carry their own UUID, so a replay after a
+partial flush never duplicates a row.
+
+With AUDIT_ASYNC disabled (and under tests) records are inserted inline.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from .audit_rollup import record_rollups
+from .models import AuditLog
+
+
+logger = logging.getLogger(__name__)
+
+SPOOL_PATTERN = 'audit-{writer_id}.spool'
+LOCK_PATTERN = 'audit-{writer_id}.lock'
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def insert_records(records, skip_existing=False):
+    """
+    Bulk-insert audit records, resolving actor roles in a single query, and
+    add them to the hourly rollups. Replays pass skip_existing so records a
+    crashed writer had already inserted are not counted twice.
+    """
+    if skip_existing:
+        existing = {
+            str(pk) for pk in
+            AuditLog.objects.filter(id__in=[record['id'] for record in records]).values_list('id', flat=True)
+        }
+        records = [record for record in records if str(uuid.UUID(record['id'])) not in existing]
+        if not records:
+            return
+
+    actor_ids = {record['actor_id'] for record in records if record.get('actor_id')}
+    roles = {}
+    for user_id, group_name in User.objects.filter(id__in=actor_ids).order_by('id').values_list('id', 'groups__name'):
+        if roles.get(user_id) is None:
+            roles[user_id] = group_name
+
+    logs = [
+        AuditLog(
+            id=record['id'],
+            timestamp=parse_datetime(record['timestamp']),
+            actor_id=record['actor_id'] if record.get('actor_id') in roles else None,
+            actor_email=record['actor_email'],
+            actor_role=roles.get(record.get('actor_id')) or 'No Role',
+            action=record['action'],
+            resource_type=record['resource_type'],
+            resource_id=record['resource_id'],
+            resource_name=record['resource_name'],
+            ip_address=record.get('ip_address'),
+            user_agent=record.get('user_agent', ''),
+            request_id=record.get('request_id'),
+            session_id=record.get('session_id'),
+            risk_score=record.get('risk_score', 0),
+        )
+        for record in records
+    ]
+    with transaction.atomic():
+        AuditLog.objects.bulk_create(logs, ignore_conflicts=True)
+        record_rollups(logs)
+
+
+def read_spool(path):
+    """Records from a spool file, skipping a torn final line"""
+    records = []
+    with open(path, encoding='utf-8') as spool:
+        for line in spool:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def _writer_id(file_name):
+    """Writer a spool or lock file belongs to: audit-<id>.spool[.N] or audit-<id>.lock"""
+    stem = file_name[len('audit-'):]
+    for suffix in ['.spool', '.lock']:
+        if suffix in stem:
+            return stem[:stem.index(suffix)]
+    return None
+
+
+def _try_lock(path):
+    """An open file holding an exclusive flock on path, or None if another writer holds it"""
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class AuditWriter:
+    """Spools audit records to disk and batch-inserts them from a background thread"""
+
+    def __init__(self, spool_dir, batch_size=200, flush_interval=2.0):
+        self.spool_dir = str(spool_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self.writer_id = f'{self.pid}-{uuid.uuid4().hex[:12]}'
+        self.spool_path = os.path.join(self.spool_dir, SPOOL_PATTERN.format(writer_id=self.writer_id))
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._buffer = []
+        self._pending = []  # (records, spool segment) batches awaiting a successful insert
+        self._segments = 0
+        self._spool = None
+        self._thread = None
+        os.makedirs(self.spool_dir, exist_ok=True)
+        # Held until the process exits; recover() in other writers skips our spools while it is
+        self._lock_file = _try_lock(os.path.join(self.spool_dir, LOCK_PATTERN.format(writer_id=self.writer_id)))
+
+    def write(self, record):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            if self._spool is None:
+                self._spool = open(self.spool_path, 'a', encoding='utf-8')
+            self._spool.write(line)
+            self._spool.flush()
+            self._buffer.append(record)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def start(self):
+        """Replay orphaned spools, then start the flusher thread"""
+        if self._thread is not None:
+            return
+        self.recover()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Insert everything buffered so far; returns the number of records written"""
+        with self._flush_lock:
+            with self._lock:
+                if self._buffer:
+                    # Seal the current spool so new writes go to a fresh file
+                    self._spool.close()
+                    self._spool = None
+                    self._segments += 1
+                    segment = f'{self.spool_path}.{self._segments}'
+                    os.replace(self.spool_path, segment)
+                    self._pending.append((self._buffer, segment))
+                    self._buffer = []
+                pending = self._pending
+                self._pending = []
+
+            written = 0
+            for index, (records, segment) in enumerate(pending):
+                try:
+                    insert_records(records)
+                except Exception:
+                    logger.exception('Audit flush failed; %d records kept in %s', len(records), segment)
+                    with self._lock:
+                        self._pending = pending[index:] + self._pending
+                    break
+                os.remove(segment)
+                written += len(records)
+            return written
+
+    def recover(self):
+        """Insert records spooled by writers that exited before flushing"""
+        owners = {}
+        for path in glob.glob(os.path.join(self.spool_dir, 'audit-*')):
+            writer_id = _writer_id(os.path.basename(path))
+            if writer_id and writer_id != self.writer_id:
+                owners.setdefault(writer_id, []).append(path)
+
+        recovered = 0
+        for writer_id, paths in sorted(owners.items()):
+            lock_path = os.path.join(self.spool_dir, LOCK_PATTERN.format(writer_id=writer_id))
+            lock_file = _try_lock(lock_path)
+            if lock_file is None:
+                continue  # the owner is alive
+            try:
+                for path in sorted(path for path in paths if path != lock_path):
+                    try:
+                        records = read_spool(path)
+                    except FileNotFoundError:
+                        continue  # replayed meanwhile by another writer
+                    if records:
+                        insert_records(records, skip_existing=True)
+                    os.remove(path)
+                    recovered += len(records)
+                if os.path.exists(lock_path):
+                    os.remove(lock_path)
+            finally:
+                lock_file.close()
+        if recovered:
+            logger.info('Recovered %d spooled audit records', recovered)
+        return recovered
+
+
+def get_writer():
+    """The process-wide writer, recreated after a fork"""
+    global _writer
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                writer = AuditWriter(
+                    settings.AUDIT_SPOOL_DIR,
+                    batch_size=settings.AUDIT_BATCH_SIZE,
+                    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+                )
+                writer.start()
+                _writer = writer
+    return _writer
+
+
+def write_audit_record(record):
+    """Queue an audit record for insertion (or insert it now when not async)"""
+    if getattr(settings, 'AUDIT_ASYNC', False):
+        get_writer().write(record)
+    else:
+        insert_records([record])
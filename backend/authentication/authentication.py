@@ -1,6 +1,29 @@
+import hashlib
+
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+
+from .permission_cache import cache_is_shared
+
+
+TOKEN_CACHE_KEY = 'auth:token:{}'
+
+
+def token_cache_key(key):
+    """Cache key for a token; the raw key never appears in the cache"""
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+
+def invalidate_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    cache.delete_many([token_cache_key(key) for key in keys])
 
 
 class CookieTokenAuthentication(TokenAuthentication):
@@ -25,7 +48,19 @@ class CookieTokenAuthentication(TokenAuthentication):
     def authenticate_credentials(self, key):
         """
         Authenticate the given credentials.
+        
+        With a SHARED_CACHE the (user, token) pair is cached for
+        TOKEN_CACHE_TIMEOUT seconds under a hash of the key; deleting the token
+        (logout, rotation) or saving the user (deactivation) drops the entry (see
+        signals.py). A per-process cache would not see those deletions from other
+        workers, so without one every request reads the token and user.
         """
+        shared = cache_is_shared()
+        cache_key = token_cache_key(key)
+        principal = cache.get(cache_key) if shared else None
+        if principal is not None:
+            return principal
+        
         model = self.get_model()
         try:
             token = model.objects.select_related('user').get(key=key)
@@ -35,4 +70,7 @@ class CookieTokenAuthentication(TokenAuthentication):
         if not token.user.is_active:
             return None
         
-        return (token.user, token)
\ No newline at end of file
+        principal = (token.user, token)
+        if shared:
+            cache.set(cache_key, principal, getattr(settings, 'TOKEN_CACHE_TIMEOUT', 60))
+        return principal
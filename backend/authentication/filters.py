@@ -0,0 +1,85 @@
+"""
+Filter backends enforcing permission scopes at the queryset level
+"""
+from django.db.models import Q
+from rest_framework.filters import BaseFilterBackend
+
+from .models import UserProfile
+from .permissions import check_permission, get_user_scopes
+
+
+# Scope types that cover every record
+UNRESTRICTED_SCOPE_TYPES = ['global', 'organization']
+
+PROFILE_DEPARTMENT_ATTRIBUTE = '_profile_department'
+
+
+def get_profile_department(request):
+    """The requesting user's profile department, looked up once per request"""
+    if not hasattr(request, PROFILE_DEPARTMENT_ATTRIBUTE):
+        department = UserProfile.objects.filter(user=request.user).values_list('department', flat=True).first()
+        setattr(request, PROFILE_DEPARTMENT_ATTRIBUTE, department or None)
+    return getattr(request, PROFILE_DEPARTMENT_ATTRIBUTE)
+
+
+class ScopeFilterBackend(BaseFilterBackend):
+    """
+    Restrict a queryset to the records the user's scopes and department cover,
+    as a single WHERE clause, so list pages and detail lookups agree.
+
+    Views opt in by declaring:
+    - scope_fields: maps scope criteria keys (e.g. 'department') to lookups
+      on the view's model (e.g. 'asset__department')
+    - scope_view_all_permission: permission key that lifts the department
+      restriction (e.g. 'assets.view_all')
+
+    A user with a profile department sees only that department unless they
+    hold the view-all permission. A user with scopes sees records matching
+    any of them; a scope matches records whose fields equal (or are in) each
+    of its criteria values. Criteria keys the view does not map are ignored,
+    so a scope with no applicable criteria covers the whole resource.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        user = request.user
+        if not user or not user.is_authenticated or user.is_superuser:
+            return queryset
+
+        scope_fields = getattr(view, 'scope_fields', {})
+        condition = Q()
+
+        department_field = scope_fields.get('department')
+        view_all_permission = getattr(view, 'scope_view_all_permission', None)
+        if department_field:
+            department = get_profile_department(request)
+            if department and not (view_all_permission and check_permission(user, view_all_permission, request)):
+                condition &= Q(**{department_field: department})
+
+        scope_condition = self.get_scope_condition(get_user_scopes(user, request), scope_fields)
+        if scope_condition is not None:
+            condition &= scope_condition
+
+        return queryset.filter(condition) if condition else queryset
+
+    def get_scope_condition(self, scopes, scope_fields):
+        """OR of the user's scopes, or None when the scopes do not restrict this resource"""
+        condition = Q()
+        for scope in scopes:
+            if scope['type'] in UNRESTRICTED_SCOPE_TYPES:
+                return None
+
+            scope_condition = Q()
+            for key, value in scope['criteria'].items():
+                field = scope_fields.get(key)
+                if not field:
+                    continue
+                if isinstance(value, (list, tuple)):
+                    scope_condition &= Q(**{f'{field}__in': value})
+                else:
+                    scope_condition &= Q(**{field: value})
+
+            if not scope_condition:
+                return None
+            condition |= scope_condition
+
+        return condition or None
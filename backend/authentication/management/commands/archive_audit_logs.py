@@ -0,0 +1,19 @@
+"""
+Management command to move old audit logs into compressed archive segments
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from authentication.audit_archive import archive_audit_logs
+
+
+class Command(BaseCommand):
+    help = 'Archives audit logs older than N days into gzip NDJSON segment files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.AUDIT_ARCHIVE_AFTER_DAYS)
+
+    def handle(self, *args, **options):
+        days = options['older_than_days']
+        self.stdout.write(f'Archiving audit logs older than {days} days...')
+        segments, records = archive_audit_logs(days)
+        self.stdout.write(self.style.SUCCESS(f"Archived {records} audit logs into {segments} segments"))
@@ -0,0 +1,54 @@
+"""
+Management command to microbenchmark compiled permission checks
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from authentication.permissions import check_permission
+from authentication.permission_cache import get_resolved_permissions
+
+
+class Command(BaseCommand):
+    help = 'Measures the per-check cost of granular permission checks for a user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--permission', default='assets.view')
+        parser.add_argument('--iterations', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        permission = options['permission']
+        iterations = options['iterations']
+
+        # Warm the shared cache and the request memo
+        request = RequestFactory().get('/')
+        allowed = check_permission(user, permission, request)
+        resolved = get_resolved_permissions(user, request)
+
+        self.stdout.write(f"{user.username} {'has' if allowed else 'lacks'} {permission}")
+        self.report('Bitmask test', iterations, lambda: permission in resolved)
+        self.report('check_permission (request memo)', iterations,
+                    lambda: check_permission(user, permission, request))
+        self.report('check_permission (shared cache)', max(1, iterations // 10),
+                    lambda: check_permission(user, permission))
+
+    def report(self, label, iterations, check):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter_ns()
+            for _ in range(iterations):
+                check()
+            elapsed = time.perf_counter_ns() - start
+
+        self.stdout.write(
+            f"  {label}: {elapsed / iterations:.0f} ns/check, "
+            f"{len(queries.captured_queries)} queries over {iterations} checks"
+        )
@@ -16,6 +16,7 @@ class Command(BaseCommand):
         permissions_data = [
             # Asset Management
             {'key': 'assets.view', 'name': 'View Assets', 'category': 'Assets', 'risk_level': 1},
+            {'key': 'assets.view_all', 'name': 'View Assets in All Departments', 'category': 'Assets', 'risk_level': 2},
             {'key': 'assets.create', 'name': 'Create Assets', 'category': 'Assets', 'risk_level': 2},
             {'key': 'assets.edit', 'name': 'Edit Assets', 'category': 'Assets', 'risk_level': 2},
             {'key': 'assets.delete', 'name': 'Delete Assets', 'category': 'Assets', 'risk_level': 3},
@@ -25,6 +26,7 @@ class Command(BaseCommand):
             
             # Driver Management
             {'key': 'drivers.view', 'name': 'View Drivers', 'category': 'Drivers', 'risk_level': 1},
+            {'key': 'drivers.view_all', 'name': 'View Drivers in All Departments', 'category': 'Drivers', 'risk_level': 2},
             {'key': 'drivers.create', 'name': 'Create Drivers', 'category': 'Drivers', 'risk_level': 2},
             {'key': 'drivers.edit', 'name': 'Edit Drivers', 'category': 'Drivers', 'risk_level': 2},
             {'key': 'drivers.delete', 'name': 'Delete Drivers', 'category': 'Drivers', 'risk_level': 3},
@@ -33,6 +35,7 @@ class Command(BaseCommand):
             
             # Fuel Management
             {'key': 'fuel.view', 'name': 'View Fuel Transactions', 'category': 'Fuel', 'risk_level': 1},
+            {'key': 'fuel.view_all', 'name': 'View Fuel Transactions in All Departments', 'category': 'Fuel', 'risk_level': 2},
             {'key': 'fuel.create', 'name': 'Create Fuel Transactions', 'category': 'Fuel', 'risk_level': 2},
             {'key': 'fuel.edit', 'name': 'Edit Fuel Transactions', 'category': 'Fuel', 'risk_level': 2},
             {'key': 'fuel.delete', 'name': 'Delete Fuel Transactions', 'category': 'Fuel', 'risk_level': 3},
@@ -41,6 +44,7 @@ class Command(BaseCommand):
             
             # Location Management
             {'key': 'locations.view', 'name': 'View Locations', 'category': 'Locations', 'risk_level': 1},
+            {'key': 'locations.view_all', 'name': 'View Locations in All Departments', 'category': 'Locations', 'risk_level': 2},
             {'key': 'locations.create', 'name': 'Create Locations', 'category': 'Locations', 'risk_level': 2},
             {'key': 'locations.edit', 'name': 'Edit Locations', 'category': 'Locations', 'risk_level': 2},
             {'key': 'locations.delete', 'name': 'Delete Locations', 'category': 'Locations', 'risk_level': 3},
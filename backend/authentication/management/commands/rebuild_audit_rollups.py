@@ -0,0 +1,14 @@
+"""
+Management command to recompute hourly audit rollups from the audit log
+"""
+from django.core.management.base import BaseCommand
+from authentication.audit_rollup import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the hourly audit rollups used by the audit stats endpoint'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding audit rollups...')
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rollup rows"))
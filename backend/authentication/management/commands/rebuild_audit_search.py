@@ -0,0 +1,14 @@
+"""
+Management command to rebuild the audit log full-text search index
+"""
+from django.core.management.base import BaseCommand
+from authentication.audit_search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the audit log search index (run after a SQLite VACUUM)'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding audit search index...')
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Audit search index rebuilt'))
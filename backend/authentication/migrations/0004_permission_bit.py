@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+def assign_bits(apps, schema_editor):
+    Permission = apps.get_model('authentication', 'Permission')
+    for bit, permission in enumerate(Permission.objects.order_by('key')):
+        permission.bit = bit
+        permission.save(update_fields=['bit'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_allow_null_session_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='permission',
+            name='bit',
+            field=models.PositiveIntegerField(editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(assign_bits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:41
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncHour
+
+
+def backfill_rollups(apps, schema_editor):
+    AuditLog = apps.get_model('authentication', 'AuditLog')
+    AuditRollup = apps.get_model('authentication', 'AuditRollup')
+    rows = (
+        AuditLog.objects.order_by()
+        .annotate(bucket=TruncHour('timestamp'))
+        .values('bucket', 'action', 'resource_type', 'actor_email')
+        .annotate(
+            event_count=Count('id'),
+            low_risk_count=Count('id', filter=Q(risk_score__lt=30)),
+            medium_risk_count=Count('id', filter=Q(risk_score__gte=30, risk_score__lt=60)),
+            high_risk_count=Count('id', filter=Q(risk_score__gte=60)),
+            critical_risk_count=Count('id', filter=Q(risk_score__gte=80)),
+        )
+    )
+    AuditRollup.objects.bulk_create([AuditRollup(**row) for row in rows.iterator()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_permission_bit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour the events fall in')),
+                ('action', models.CharField(max_length=50)),
+                ('resource_type', models.CharField(max_length=100)),
+                ('actor_email', models.EmailField(max_length=254)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('low_risk_count', models.PositiveIntegerField(default=0)),
+                ('medium_risk_count', models.PositiveIntegerField(default=0)),
+                ('high_risk_count', models.PositiveIntegerField(default=0)),
+                ('critical_risk_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'unique_together': {('bucket', 'action', 'resource_type', 'actor_email')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
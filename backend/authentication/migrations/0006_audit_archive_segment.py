@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:47
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_audit_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditArchiveSegment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('path', models.CharField(help_text='Relative to AUDIT_ARCHIVE_DIR', max_length=255, unique=True)),
+                ('start_time', models.DateTimeField(help_text='Oldest record in the segment')),
+                ('end_time', models.DateTimeField(help_text='Newest record in the segment')),
+                ('record_count', models.PositiveIntegerField()),
+                ('actors', models.JSONField(default=list)),
+                ('actions', models.JSONField(default=list)),
+                ('resource_types', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-end_time'],
+                'indexes': [models.Index(fields=['end_time', 'start_time'], name='authenticat_end_tim_73fa84_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+
+# Frozen copies of the index DDL: later changes to authentication.audit_search
+# must not change what this migration did
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS authentication_auditlog_fts USING fts5("
+    "actor_email, resource_name, resource_type, action, content='authentication_auditlog', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS authentication_auditlog_fts_ai AFTER INSERT ON authentication_auditlog BEGIN "
+    "INSERT INTO authentication_auditlog_fts(rowid, actor_email, resource_name, resource_type, action) "
+    "VALUES (new.rowid, new.actor_email, new.resource_name, new.resource_type, new.action); END",
+    "CREATE TRIGGER IF NOT EXISTS authentication_auditlog_fts_ad AFTER DELETE ON authentication_auditlog BEGIN "
+    "INSERT INTO authentication_auditlog_fts(authentication_auditlog_fts, rowid, actor_email, resource_name, "
+    "resource_type, action) "
+    "VALUES ('delete', old.rowid, old.actor_email, old.resource_name, old.resource_type, old.action); END",
+    "CREATE TRIGGER IF NOT EXISTS authentication_auditlog_fts_au AFTER UPDATE ON authentication_auditlog BEGIN "
+    "INSERT INTO authentication_auditlog_fts(authentication_auditlog_fts, rowid, actor_email, resource_name, "
+    "resource_type, action) "
+    "VALUES ('delete', old.rowid, old.actor_email, old.resource_name, old.resource_type, old.action); "
+    "INSERT INTO authentication_auditlog_fts(rowid, actor_email, resource_name, resource_type, action) "
+    "VALUES (new.rowid, new.actor_email, new.resource_name, new.resource_type, new.action); END",
+    "INSERT INTO authentication_auditlog_fts(authentication_auditlog_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS authentication_auditlog_fts_ai',
+    'DROP TRIGGER IF EXISTS authentication_auditlog_fts_ad',
+    'DROP TRIGGER IF EXISTS authentication_auditlog_fts_au',
+    'DROP TABLE IF EXISTS authentication_auditlog_fts',
+]
+POSTGRES_INSTALL = [
+    "CREATE INDEX IF NOT EXISTS authentication_auditlog_search_idx ON authentication_auditlog USING gin (("
+    "to_tsvector('simple', regexp_replace(coalesce(actor_email, '') || ' ' || coalesce(resource_name, '') "
+    "|| ' ' || coalesce(resource_type, '') || ' ' || coalesce(action, ''), '[^[:alnum:]]+', ' ', 'g'))))",
+]
+POSTGRES_DROP = ['DROP INDEX IF EXISTS authentication_auditlog_search_idx']
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_INSTALL)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_INSTALL)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_audit_archive_segment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -141,6 +141,49 @@ class AuditLog(models.Model):
         super().save(*args, **kwargs)
 
 
+class AuditArchiveSegment(models.Model):
+    """Index entry for a compressed file of archived audit logs"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    path = models.CharField(max_length=255, unique=True, help_text="Relative to AUDIT_ARCHIVE_DIR")
+    start_time = models.DateTimeField(help_text="Oldest record in the segment")
+    end_time = models.DateTimeField(help_text="Newest record in the segment")
+    record_count = models.PositiveIntegerField()
+    actors = models.JSONField(default=list)
+    actions = models.JSONField(default=list)
+    resource_types = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-end_time']
+        indexes = [
+            models.Index(fields=['end_time', 'start_time']),
+        ]
+    
+    def __str__(self):
+        return f"{self.path} ({self.record_count} records)"
+
+
+class AuditRollup(models.Model):
+    """Hourly audit event counts, maintained as audit logs are written"""
+    bucket = models.DateTimeField(help_text="Start of the hour the events fall in")
+    action = models.CharField(max_length=50)
+    resource_type = models.CharField(max_length=100)
+    actor_email = models.EmailField()
+    
+    event_count = models.PositiveIntegerField(default=0)
+    low_risk_count = models.PositiveIntegerField(default=0)
+    medium_risk_count = models.PositiveIntegerField(default=0)
+    high_risk_count = models.PositiveIntegerField(default=0)
+    critical_risk_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-bucket']
+        unique_together = [['bucket', 'action', 'resource_type', 'actor_email']]
+    
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:00} {self.action} {self.resource_type}: {self.event_count}"
+
+
 class Organization(models.Model):
     """Organization settings and configuration"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -208,12 +251,20 @@ class Permission(models.Model):
     risk_level = models.IntegerField(default=1)
     requires_mfa = models.BooleanField(default=False)
     requires_approval = models.BooleanField(default=False)
+    # Stable position of this permission in compiled role/user bitmasks
+    bit = models.PositiveIntegerField(unique=True, null=True, editable=False)
     
     class Meta:
         ordering = ['category', 'key']
     
     def __str__(self):
         return f"{self.key} - {self.name}"
+    
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            last = Permission.objects.aggregate(last=models.Max('bit'))['last']
+            self.bit = 0 if last is None else last + 1
+        super().save(*args, **kwargs)
 
 
 class CustomRole(models.Model):
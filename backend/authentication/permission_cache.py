@@ -0,0 +1,234 @@
+"""
+Compiled, cached resolution of granular (custom role) permissions
+
+Every Permission owns a stable bit position (Permission.bit). Each CustomRole
+is compiled into a pair of integer masks - the bits it allows and the bits it
+denies - and a user's effective permissions are the OR of the allow masks of
+their active role assignments with every denied bit cleared, plus the scopes
+those assignments carry. Permission checks are then a dict lookup for the
+bit and a shift-and-mask on the user's integer.
+
+Role masks, the key->bit table and user masks are stored in the shared cache
+together with the permission version they were computed under. Any change to
+roles, role permissions, permissions, scopes or assignments bumps the version
+(see signals.py), which invalidates everything compiled before it at once.
+
+Within a request the resolved permissions are also memoized on the request
+object, so has_permission and has_object_permission for every object on the
+page cost a single cache round-trip in total.
+
+The cache is only used across requests when settings.SHARED_CACHE says every
+worker sees it. With a per-process cache a version bump would only reach the
+worker that made the change, so permissions are resolved from the database
+once per request instead.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Permission, UserRoleAssignment, RolePermission
+
+
+PERMISSION_VERSION_KEY = 'authz:permission-version'
+PERMISSION_BITS_KEY = 'authz:permission-bits'
+ROLE_MASKS_KEY = 'authz:role-masks:{}'
+USER_PERMISSIONS_KEY = 'authz:user-permissions:{}'
+REQUEST_ATTRIBUTE = '_resolved_permissions'
+
+# Process-local copy of the key->bit table for the current version
+_compiled_bits = (None, {})
+
+
+class ResolvedPermissions:
+    """A user's compiled permissions: a bitmask over Permission.bit plus scopes"""
+    __slots__ = ('mask', 'scopes', 'bits')
+
+    def __init__(self, mask=0, scopes=(), bits=None):
+        self.mask = mask
+        self.scopes = scopes
+        self.bits = bits if bits is not None else {}
+
+    def __contains__(self, key):
+        bit = self.bits.get(key)
+        return bit is not None and self.mask >> bit & 1 == 1
+
+    has = __contains__
+
+    @property
+    def permissions(self):
+        """The permission keys set in the mask"""
+        return frozenset(key for key, bit in self.bits.items() if self.mask >> bit & 1)
+
+
+EMPTY = ResolvedPermissions()
+
+
+def _timeout():
+    return getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300)
+
+
+def cache_is_shared():
+    """Whether cached entries (and their invalidation) are seen by every worker"""
+    return getattr(settings, 'SHARED_CACHE', False)
+
+
+def _initial_version():
+    # Seeded from the clock so a version lost to eviction never repeats
+    return int(time.time() * 1000)
+
+
+def get_permission_version():
+    version = cache.get(PERMISSION_VERSION_KEY)
+    if version is None:
+        cache.add(PERMISSION_VERSION_KEY, _initial_version(), timeout=None)
+        version = cache.get(PERMISSION_VERSION_KEY)
+    return version
+
+
+def bump_permission_version():
+    """Invalidate every cached permission set"""
+    try:
+        return cache.incr(PERMISSION_VERSION_KEY)
+    except ValueError:
+        version = _initial_version()
+        cache.set(PERMISSION_VERSION_KEY, version, timeout=None)
+        return version
+
+
+def _load_permission_bits():
+    return dict(Permission.objects.filter(bit__isnull=False).values_list('key', 'bit'))
+
+
+def get_permission_bits(version):
+    """The key->bit table, compiled once per permission version (version None: uncached)"""
+    global _compiled_bits
+    if version is None:
+        return _load_permission_bits()
+    if _compiled_bits[0] == version:
+        return _compiled_bits[1]
+
+    entry = cache.get(PERMISSION_BITS_KEY)
+    if entry is not None and entry[0] == version:
+        bits = entry[1]
+    else:
+        bits = _load_permission_bits()
+        cache.set(PERMISSION_BITS_KEY, (version, bits), _timeout())
+
+    _compiled_bits = (version, bits)
+    return bits
+
+
+def compile_roles(role_ids, version):
+    """
+    (allow_mask, deny_mask) for each role, from the cache where compiled under
+    this version and otherwise from the database in a single query. A version
+    of None bypasses the cache.
+    """
+    keys = {ROLE_MASKS_KEY.format(role_id): role_id for role_id in role_ids}
+    masks = {}
+    if version is not None:
+        for key, entry in cache.get_many(list(keys)).items():
+            if entry[0] == version:
+                masks[keys[key]] = entry[1]
+
+    missing = [role_id for role_id in role_ids if role_id not in masks]
+    if missing:
+        compiled = {role_id: (0, 0) for role_id in missing}
+        grants = (
+            RolePermission.objects.filter(role_id__in=missing, permission__bit__isnull=False)
+            .values_list('role_id', 'permission__bit', 'effect')
+        )
+        for role_id, bit, effect in grants:
+            allow, deny = compiled[role_id]
+            if effect == 'deny':
+                deny |= 1 << bit
+            else:
+                allow |= 1 << bit
+            compiled[role_id] = (allow, deny)
+        if version is not None:
+            cache.set_many(
+                {ROLE_MASKS_KEY.format(role_id): (version, mask) for role_id, mask in compiled.items()},
+                _timeout()
+            )
+        masks.update(compiled)
+
+    return masks
+
+
+def resolve_permissions(user, version):
+    """
+    Resolve a user's permission mask and scopes. Returns ((mask, scopes),
+    seconds until an assignment starts or expires) so the cache entry never
+    outlives a time-bounded assignment.
+    """
+    now = timezone.now()
+    assignments = list(
+        UserRoleAssignment.objects.filter(user=user)
+        .filter(Q(valid_until__isnull=True) | Q(valid_until__gt=now))
+        .values_list('role_id', 'valid_from', 'valid_until',
+                     'scope__scope_type', 'scope__name', 'scope__criteria')
+    )
+
+    role_ids = []
+    scopes = []
+    boundaries = []
+    for role_id, valid_from, valid_until, scope_type, scope_name, criteria in assignments:
+        if valid_until:
+            boundaries.append(valid_until)
+        if valid_from > now:
+            boundaries.append(valid_from)
+            continue
+        if role_id not in role_ids:
+            role_ids.append(role_id)
+        if scope_type:
+            scope = {'type': scope_type, 'name': scope_name, 'criteria': criteria or {}}
+            if scope not in scopes:
+                scopes.append(scope)
+
+    allowed = denied = 0
+    if role_ids:
+        for allow, deny in compile_roles(role_ids, version).values():
+            allowed |= allow
+            denied |= deny
+
+    timeout = _timeout()
+    if boundaries:
+        timeout = max(1, min(timeout, int((min(boundaries) - now).total_seconds()) + 1))
+
+    return (allowed & ~denied, tuple(scopes)), timeout
+
+
+def get_resolved_permissions(user, request=None):
+    """Resolved permissions for a user, memoized on the request when given"""
+    if not user or not user.is_authenticated:
+        return EMPTY
+
+    if request is not None:
+        memo = getattr(request, REQUEST_ATTRIBUTE, None)
+        if memo is not None and memo[0] == user.pk:
+            return memo[1]
+
+    if not cache_is_shared():
+        version = None
+        (mask, scopes), _ = resolve_permissions(user, version)
+    else:
+        user_key = USER_PERMISSIONS_KEY.format(user.pk)
+        cached = cache.get_many([PERMISSION_VERSION_KEY, user_key])
+        version = cached.get(PERMISSION_VERSION_KEY)
+        if version is None:
+            version = get_permission_version()
+
+        entry = cached.get(user_key)
+        if entry is not None and entry[0] == version:
+            mask, scopes = entry[1]
+        else:
+            (mask, scopes), timeout = resolve_permissions(user, version)
+            cache.set(user_key, (version, (mask, scopes)), timeout)
+
+    resolved = ResolvedPermissions(mask, scopes, get_permission_bits(version))
+    if request is not None:
+        setattr(request, REQUEST_ATTRIBUTE, (user.pk, resolved))
+    return resolved
@@ -3,12 +3,7 @@ Custom permission classes for role-based access control
 """
 from rest_framework import permissions
 from django.contrib.auth.models import User
-try:
-    from .models import Permission as CustomPermission, RoleAssignment
-except ImportError:
-    # Fallback if models aren't available yet
-    CustomPermission = None
-    RoleAssignment = None
+from .permission_cache import get_resolved_permissions
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -263,34 +258,23 @@ class GranularPermission(permissions.BasePermission):
         """Override in subclasses"""
         return False
     
-    def get_user_permissions(self, user):
-        """Get all permissions for a user through their roles"""
-        permissions = set()
-        
-        # Check if models are available
-        if RoleAssignment and CustomPermission:
-            # Get role assignments for the user
-            role_assignments = RoleAssignment.objects.filter(
-                user=user,
-                is_active=True
-            ).select_related('role')
-            
-            # Collect permissions from all roles
-            for assignment in role_assignments:
-                role_permissions = CustomPermission.objects.filter(
-                    permissionassignment__role=assignment.role,
-                    permissionassignment__is_active=True
-                ).values_list('name', flat=True)
-                permissions.update(role_permissions)
-        
-        return permissions
+    def get_user_permissions(self, user, request=None):
+        """
+        Get the user's compiled permissions through their roles.
+        Membership tests (`'assets.view' in perms`) are bitwise checks;
+        resolved once per request and cached across requests.
+        """
+        return get_resolved_permissions(user, request)
 
 
 class GranularAssetPermission(GranularPermission):
     """Granular permission class for Asset operations"""
     
     def check_custom_permission(self, request, view):
-        user_permissions = self.get_user_permissions(request.user)
+        user_permissions = self.get_user_permissions(request.user, request)
+        
+        if getattr(view, 'action', None) == 'export':
+            return 'assets.export' in user_permissions
         
         # Map HTTP methods to permission names
         if request.method == 'GET':
@@ -309,7 +293,7 @@ class GranularAssetPermission(GranularPermission):
         if request.user.is_superuser:
             return True
             
-        user_permissions = self.get_user_permissions(request.user)
+        user_permissions = self.get_user_permissions(request.user, request)
         
         # Check department-based scoping
         if hasattr(obj, 'department') and hasattr(request.user, 'profile'):
@@ -335,7 +319,7 @@ class GranularLocationPermission(GranularPermission):
     """Granular permission class for Location operations"""
     
     def check_custom_permission(self, request, view):
-        user_permissions = self.get_user_permissions(request.user)
+        user_permissions = self.get_user_permissions(request.user, request)
         
         # Location updates require special permission
         if view.action == 'create' and request.path.endswith('/updates/'):
@@ -357,7 +341,7 @@ class GranularZonePermission(GranularPermission):
     """Granular permission class for Zone operations"""
     
     def check_custom_permission(self, request, view):
-        user_permissions = self.get_user_permissions(request.user)
+        user_permissions = self.get_user_permissions(request.user, request)
         
         if request.method == 'GET':
             return 'zones.view' in user_permissions
@@ -371,7 +355,7 @@ class GranularZonePermission(GranularPermission):
         return False
 
 
-def check_permission(user, permission_name):
+def check_permission(user, permission_name, request=None):
     """Utility function to check if a user has a specific permission"""
     if not user.is_authenticated:
         return False
@@ -379,20 +363,10 @@ def check_permission(user, permission_name):
     if user.is_superuser:
         return True
     
-    # Check if models are available
-    if CustomPermission:
-        # Check through role assignments
-        return CustomPermission.objects.filter(
-            permissionassignment__role__roleassignment__user=user,
-            permissionassignment__is_active=True,
-            permissionassignment__role__roleassignment__is_active=True,
-            name=permission_name
-        ).exists()
-    
-    return False
+    return permission_name in get_resolved_permissions(user, request)
 
 
-def get_user_scopes(user):
+def get_user_scopes(user, request=None):
     """Get all scopes assigned to a user"""
     if not user.is_authenticated:
         return []
@@ -400,22 +374,4 @@ def get_user_scopes(user):
     if user.is_superuser:
         return ['global']  # Superusers have global scope
     
-    scopes = []
-    
-    # Check if models are available
-    if RoleAssignment:
-        # Get scopes through role assignments
-        role_assignments = RoleAssignment.objects.filter(
-            user=user,
-            is_active=True
-        ).select_related('scope')
-        
-        for assignment in role_assignments:
-            if assignment.scope:
-                scopes.append({
-                    'type': assignment.scope.scope_type,
-                    'value': assignment.scope.scope_value,
-                    'name': assignment.scope.name
-                })
-    
-    return scopes
\ No newline at end of file
+    return list(get_resolved_permissions(user, request).scopes)
@@ -0,0 +1,58 @@
+"""
+Signal handlers keeping cached permission sets, authenticated tokens and the
+audit search index in step with the database
+"""
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models.signals import post_save, post_delete, m2m_changed, post_migrate
+from rest_framework.authtoken.models import Token
+
+from .audit_search import restore_search_index
+from .authentication import invalidate_token, invalidate_user_tokens
+from .models import Permission, CustomRole, RolePermission, UserRoleAssignment, Scope
+from .permission_cache import bump_permission_version
+
+
+def invalidate_permissions(sender, **kwargs):
+    """Any role, grant, permission, scope or assignment change invalidates all cached sets"""
+    if kwargs.get('raw'):
+        return
+    if 'action' in kwargs and not kwargs['action'].startswith('post_'):
+        return
+    bump_permission_version()
+
+
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Logout and token rotation delete the old token"""
+    invalidate_token(instance.key)
+
+
+def invalidate_saved_user(sender, instance, **kwargs):
+    """Deactivation (or any other user change) re-reads the user on the next request"""
+    if kwargs.get('raw') or kwargs.get('created'):
+        return
+    invalidate_user_tokens(instance.pk)
+
+
+def restore_audit_search(sender, using, **kwargs):
+    """A migration that remade the audit log table dropped the search triggers"""
+    restore_search_index(connections[using])
+
+
+def connect():
+    for model in [Permission, CustomRole, RolePermission, UserRoleAssignment, Scope]:
+        post_save.connect(invalidate_permissions, sender=model,
+                          dispatch_uid=f'invalidate_permissions_save_{model.__name__}')
+        post_delete.connect(invalidate_permissions, sender=model,
+                            dispatch_uid=f'invalidate_permissions_delete_{model.__name__}')
+
+    # role.permissions.add()/remove() write the through table without saving models
+    m2m_changed.connect(invalidate_permissions, sender=CustomRole.permissions.through,
+                        dispatch_uid='invalidate_permissions_m2m')
+
+    post_delete.connect(invalidate_deleted_token, sender=Token, dispatch_uid='invalidate_token_delete')
+    post_save.connect(invalidate_saved_user, sender=User, dispatch_uid='invalidate_token_user_save')
+
+    post_migrate.connect(restore_audit_search, sender=apps.get_app_config('authentication'),
+                         dispatch_uid='restore_audit_search')
@@ -1,3 +1,746 @@
-from django.test import TestCase
+from django.test import TestCase, RequestFactory, override_settings
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from assets.models import Asset
+from fuel.models import FuelTransaction
+from .models import Organization, Permission, CustomRole, RolePermission, UserRoleAssignment, Scope, UserProfile
+from .authentication import CookieTokenAuthentication, token_cache_key
+from .audit_archive import AuditArchive, archive_audit_logs
+from .audit_rollup import audit_stats, rebuild_rollups
+from .audit_search import SQLITE_TRIGGERS, search_audit_logs
+from .audit_writer import AuditWriter, insert_records, read_spool
+from .models import AuditLog, AuditRollup, AuditArchiveSegment
+from .permission_cache import USER_PERMISSIONS_KEY, get_resolved_permissions
+from .permissions import check_permission, get_user_scopes
+
+
+@override_settings(SHARED_CACHE=True)
+class PermissionCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Fleet Co')
+        self.perms = {
+            key: Permission.objects.create(key=key, name=key, description=key, category='Assets')
+            for key in ['assets.view', 'assets.edit', 'assets.delete']
+        }
+        self.role = CustomRole.objects.create(organization=self.org, name='Asset Editor')
+        RolePermission.objects.create(role=self.role, permission=self.perms['assets.view'])
+        RolePermission.objects.create(role=self.role, permission=self.perms['assets.edit'])
+        self.user = User.objects.create_user(username='editor', password='testpass123')
+        UserRoleAssignment.objects.create(user=self.user, role=self.role)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_resolves_allowed_minus_denied(self):
+        restricted = CustomRole.objects.create(organization=self.org, name='No Edits')
+        RolePermission.objects.create(role=restricted, permission=self.perms['assets.edit'], effect='deny')
+        UserRoleAssignment.objects.create(user=self.user, role=restricted)
+
+        self.assertEqual(get_resolved_permissions(self.user).permissions, {'assets.view'})
+
+    def test_cached_until_roles_change(self):
+        # Assignments, role masks and the bit table
+        with self.assertNumQueries(3):
+            get_resolved_permissions(self.user)
+        with self.assertNumQueries(0):
+            self.assertFalse(check_permission(self.user, 'assets.delete'))
+
+        # Granting a permission bumps the version and invalidates the cache
+        self.role.permissions.add(self.perms['assets.delete'])
+        self.assertTrue(check_permission(self.user, 'assets.delete'))
+
+    def test_assignment_changes_invalidate(self):
+        self.assertTrue(check_permission(self.user, 'assets.view'))
+        UserRoleAssignment.objects.filter(user=self.user).delete()
+        self.assertFalse(check_permission(self.user, 'assets.view'))
+
+    def test_expired_and_future_assignments_ignored(self):
+        other = User.objects.create_user(username='temp', password='testpass123')
+        now = timezone.now()
+        UserRoleAssignment.objects.create(
+            user=other, role=self.role, valid_from=now - timedelta(days=2), valid_until=now - timedelta(days=1)
+        )
+        UserRoleAssignment.objects.create(user=other, role=self.role, valid_from=now + timedelta(days=1))
+
+        self.assertEqual(get_resolved_permissions(other).permissions, frozenset())
+
+    def test_scopes_come_from_assignments(self):
+        scope = Scope.objects.create(organization=self.org, name='North Depot', scope_type='depot',
+                                     criteria={'department': 'North'})
+        UserRoleAssignment.objects.create(user=self.user, role=self.role, scope=scope)
+
+        self.assertEqual(get_user_scopes(self.user), [
+            {'type': 'depot', 'name': 'North Depot', 'criteria': {'department': 'North'}}
+        ])
+
+    def test_memoized_on_request(self):
+        request = RequestFactory().get('/')
+        get_resolved_permissions(self.user, request)
+        cache.clear()
+
+        with self.assertNumQueries(0):
+            self.assertIn('assets.view', get_resolved_permissions(self.user, request).permissions)
+
+    def test_list_request_resolves_once(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        client.get('/api/assets/')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/assets/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        role_queries = [
+            q for q in queries.captured_queries
+            if 'authentication_userroleassignment' in q['sql'] or 'authentication_rolepermission' in q['sql']
+        ]
+        self.assertEqual(role_queries, [])
+
+    @override_settings(SHARED_CACHE=False)
+    def test_per_process_cache_not_used_across_requests(self):
+        # Resolved from the database on every request, so a revocation made
+        # by another worker takes effect at once
+        for _ in range(2):
+            with self.assertNumQueries(3):
+                self.assertIn('assets.view', get_resolved_permissions(self.user))
+        self.assertIsNone(cache.get(USER_PERMISSIONS_KEY.format(self.user.pk)))
+
+        request = RequestFactory().get('/')
+        get_resolved_permissions(self.user, request)
+        with self.assertNumQueries(0):
+            self.assertIn('assets.view', get_resolved_permissions(self.user, request))
+
+    def test_permissions_compile_to_stable_bits(self):
+        bits = {key: perm.bit for key, perm in self.perms.items()}
+        self.assertEqual(sorted(bits.values()), [0, 1, 2])
+
+        resolved = get_resolved_permissions(self.user)
+        self.assertEqual(resolved.mask, 1 << bits['assets.view'] | 1 << bits['assets.edit'])
+        self.assertNotIn('assets.unknown', resolved)
+
+        # Deleting a permission never moves the others
+        self.perms['assets.view'].delete()
+        perm = Permission.objects.create(key='assets.export', name='Export', description='', category='Assets')
+        self.assertEqual(perm.bit, 3)
+        self.assertEqual(Permission.objects.get(key='assets.edit').bit, bits['assets.edit'])
+
+    def test_roles_compiled_once_for_all_users(self):
+        other = User.objects.create_user(username='editor2', password='testpass123')
+        UserRoleAssignment.objects.create(user=other, role=self.role)
+        get_resolved_permissions(self.user)
+
+        # The role mask and bit table are already compiled for this version
+        with self.assertNumQueries(1):
+            self.assertIn('assets.edit', get_resolved_permissions(other))
+
+    def test_benchmark_hot_path_has_no_queries(self):
+        out = StringIO()
+        call_command('benchmark_permissions', 'editor', '--iterations', '1000', stdout=out)
+
+        self.assertIn('editor has assets.view', out.getvalue())
+        self.assertIn('check_permission (request memo)', out.getvalue())
+        self.assertNotRegex(out.getvalue(), r'[1-9]\d* queries')
+
+
+class ScopeFilterTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Fleet Co')
+        self.view = Permission.objects.create(key='assets.view', name='View', description='', category='Assets')
+        self.view_all = Permission.objects.create(key='assets.view_all', name='View all', description='',
+                                                  category='Assets')
+        self.role = CustomRole.objects.create(organization=self.org, name='Viewer')
+        RolePermission.objects.create(role=self.role, permission=self.view)
+
+        self.user = User.objects.create_user(username='north', password='testpass123')
+        UserProfile.objects.create(user=self.user, department='North')
+        UserRoleAssignment.objects.create(user=self.user, role=self.role)
+
+        self.north_truck = Asset.objects.create(asset_id='N-1', vehicle_type='truck', make='Ford', model='F-150',
+                                                year=2020, department='North')
+        self.north_van = Asset.objects.create(asset_id='N-2', vehicle_type='van', make='Ford', model='Transit',
+                                              year=2021, department='North')
+        self.south_truck = Asset.objects.create(asset_id='S-1', vehicle_type='truck', make='Ram', model='1500',
+                                                year=2019, department='South')
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def listed(self, url='/api/assets/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(item['asset_id'] for item in response.data['results'])
+
+    def test_department_restricts_list_and_detail(self):
+        self.assertEqual(self.listed(), ['N-1', 'N-2'])
+
+        response = self.client.get(f'/api/assets/{self.south_truck.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_view_all_lifts_department(self):
+        RolePermission.objects.create(role=self.role, permission=self.view_all)
+        self.assertEqual(self.listed(), ['N-1', 'N-2', 'S-1'])
+
+    def test_scope_criteria_filter_in_sql(self):
+        RolePermission.objects.create(role=self.role, permission=self.view_all)
+        trucks = Scope.objects.create(organization=self.org, name='Trucks', scope_type='vehicle_group',
+                                      criteria={'vehicle_type': ['truck'], 'depot': 'ignored'})
+        UserRoleAssignment.objects.create(user=self.user, role=self.role, scope=trucks)
+        self.assertEqual(self.listed(), ['N-1', 'S-1'])
+
+        # A second scope widens access
+        vans = Scope.objects.create(organization=self.org, name='North vans', scope_type='custom',
+                                    criteria={'vehicle_type': 'van', 'department': 'North'})
+        UserRoleAssignment.objects.create(user=self.user, role=self.role, scope=vans)
+        self.assertEqual(self.listed(), ['N-1', 'N-2', 'S-1'])
+
+    def test_global_scope_unrestricted(self):
+        RolePermission.objects.create(role=self.role, permission=self.view_all)
+        scope = Scope.objects.create(organization=self.org, name='Everything', scope_type='global')
+        UserRoleAssignment.objects.create(user=self.user, role=self.role, scope=scope)
+        self.assertEqual(self.listed(), ['N-1', 'N-2', 'S-1'])
+
+    def test_fuel_transactions_follow_asset_department(self):
+        self.user.groups.add(Group.objects.create(name='Admin'))
+        for asset in [self.north_truck, self.south_truck]:
+            FuelTransaction.objects.create(asset=asset, timestamp=timezone.now(), product_type='diesel',
+                                           volume=Decimal('10'), unit='gal', total_cost=Decimal('40'))
+
+        response = self.client.get('/api/fuel/transactions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+
+class AuditWriterTestCase(TestCase):
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username='auditor', email='auditor@example.com', password='testpass123')
+        self.user.groups.add(Group.objects.create(name='Fleet Manager'))
+
+    def tearDown(self):
+        for name in os.listdir(self.spool_dir):
+            os.remove(os.path.join(self.spool_dir, name))
+        os.rmdir(self.spool_dir)
+
+    def record(self, **overrides):
+        record = {
+            'id': str(uuid.uuid4()), 'timestamp': timezone.now().isoformat(), 'actor_id': self.user.pk,
+            'actor_email': self.user.email, 'action': 'create', 'resource_type': 'assets',
+            'resource_id': '', 'resource_name': '/api/assets/', 'risk_score': 20,
+        }
+        record.update(overrides)
+        return record
+
+    def test_records_spooled_until_flush(self):
+        writer = AuditWriter(self.spool_dir, batch_size=10)
+        for _ in range(3):
+            writer.write(self.record())
+
+        self.assertEqual(AuditLog.objects.count(), 0)
+        self.assertEqual(len(read_spool(writer.spool_path)), 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(writer.flush(), 3)
+
+        # All three rows go in with a single INSERT
+        inserts = [q for q in queries.captured_queries if 'INTO "authentication_auditlog"' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+
+        # Only the writer's lock file remains
+        self.assertEqual([name for name in os.listdir(self.spool_dir) if '.spool' in name], [])
+        self.assertEqual(set(AuditLog.objects.values_list('actor_role', flat=True)), {'Fleet Manager'})
+
+    def test_orphaned_spool_recovered_once(self):
+        record = self.record()
+        orphan = os.path.join(self.spool_dir, 'audit-999999999.spool.1')
+        with open(orphan, 'w') as spool:
+            spool.write(json.dumps(record) + '\n')
+            spool.write('{"torn": ')
+
+        # A row inserted before the crash is not duplicated by the replay
+        insert_records([record])
+
+        self.assertEqual(AuditWriter(self.spool_dir).recover(), 1)
+        self.assertEqual(AuditLog.objects.filter(id=record['id']).count(), 1)
+        self.assertFalse(os.path.exists(orphan))
+
+    def test_spool_of_dead_process_with_reused_pid_recovered(self):
+        # A previous process with this PID died with a sealed segment and an open spool
+        records = [self.record(), self.record()]
+        for record, suffix in zip(records, ['.spool', '.spool.1']):
+            with open(os.path.join(self.spool_dir, f'audit-{os.getpid()}{suffix}'), 'w') as spool:
+                spool.write(json.dumps(record) + '\n')
+
+        writer = AuditWriter(self.spool_dir, batch_size=10)
+        with mock.patch('threading.Thread'):
+            writer.start()
+        self.assertEqual(set(map(str, AuditLog.objects.values_list('id', flat=True))),
+                         {record['id'] for record in records})
+
+        writer.write(self.record())
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual([name for name in os.listdir(self.spool_dir) if '.spool' in name], [])
+
+    def test_live_writer_spool_not_recovered(self):
+        live = AuditWriter(self.spool_dir, batch_size=10)
+        live.write(self.record())
+        self.assertEqual(AuditWriter(self.spool_dir).recover(), 0)
+        self.assertEqual(len(read_spool(live.spool_path)), 1)
+
+    def test_middleware_writes_audit_entry(self):
+        self.user.is_superuser = True
+        self.user.save()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        client.post('/api/assets/', {'asset_id': 'A-1'})
+
+        entry = AuditLog.objects.get()
+        self.assertEqual(entry.actor, self.user)
+        self.assertEqual(entry.actor_role, 'Fleet Manager')
+        self.assertEqual(entry.action, 'create')
+
+    @override_settings(AUDIT_ASYNC=True)
+    def test_middleware_spools_when_async(self):
+        self.user.is_superuser = True
+        self.user.save()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        writer = AuditWriter(self.spool_dir, batch_size=10)
+        with mock.patch('authentication.audit_writer.get_writer', return_value=writer):
+            client.post('/api/assets/', {'asset_id': 'A-1'})
+
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(len(read_spool(writer.spool_path)), 1)
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(AuditLog.objects.get().action, 'create')
+
+
+class AuditResourceAttributionTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_and_update_attributed_to_object(self):
+        response = self.client.post('/api/assets/', {
+            'asset_id': 'TRK-9', 'vehicle_type': 'truck', 'make': 'Volvo', 'model': 'VNL', 'year': 2022
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        asset = Asset.objects.get(asset_id='TRK-9')
+
+        self.client.patch(f'/api/assets/{asset.id}/', {'make': 'Mack'})
+
+        entries = list(AuditLog.objects.order_by('timestamp').values_list(
+            'action', 'resource_type', 'resource_id', 'resource_name'))
+        self.assertEqual(entries, [
+            ('create', 'assets', str(asset.id), 'TRK-9'),
+            ('update', 'assets', str(asset.id), 'TRK-9'),
+        ])
+
+    def test_bulk_import_named_without_parsing_response(self):
+        upload = SimpleUploadedFile('fleet.csv', b'asset_id,vehicle_type,make,model,year\nA-1,truck,Ford,F-150,2020\n')
+        self.client.post('/api/assets/bulk_import/', {'file': upload}, format='multipart')
+
+        entry = AuditLog.objects.get()
+        self.assertEqual((entry.resource_type, entry.resource_name), ('assets', 'Bulk import: fleet.csv'))
+
+
+class AuditStatsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        records = []
+        # Twelve actors; the busiest is the last one seen
+        for n in range(12):
+            for _ in range(n + 1):
+                records.append(self.record(f'user{n}@example.com', self.now - timedelta(days=3), risk=20))
+        records.append(self.record('user0@example.com', self.now - timedelta(minutes=5), risk=85,
+                                   action='permission_denied'))
+        records.append(self.record('user1@example.com', self.now - timedelta(days=29, hours=23), risk=45,
+                                   action='delete'))
+        records.append(self.record('user1@example.com', self.now - timedelta(days=45), risk=65))
+        insert_records(records)
+
+    def tearDown(self):
+        cache.clear()
+
+    def record(self, email, when, risk, action='create'):
+        return {
+            'id': str(uuid.uuid4()), 'timestamp': when.isoformat(), 'actor_id': None, 'actor_email': email,
+            'action': action, 'resource_type': 'assets', 'resource_id': '', 'resource_name': '', 'risk_score': risk,
+        }
+
+    def test_stats_in_constant_queries(self):
+        with self.assertNumQueries(2):
+            stats = audit_stats(self.now - timedelta(days=30), self.now)
+
+        self.assertEqual(stats['total_events'], 78 + 2)
+        self.assertEqual(stats['action_counts'], {'create': 78, 'permission_denied': 1, 'delete': 1})
+        self.assertEqual(stats['top_actors'][0], {'email': 'user11@example.com', 'count': 12})
+        self.assertEqual(len(stats['top_actors']), 5)
+        self.assertEqual(stats['risk_distribution'], {'low': 78, 'medium': 1, 'high': 1})
+        self.assertEqual(stats['high_risk_events'], 1)
+        self.assertEqual(stats['failed_permissions'], 1)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        incremental = audit_stats(self.now - timedelta(days=60), self.now)
+        self.assertEqual(rebuild_rollups(), AuditRollup.objects.count())
+        self.assertEqual(audit_stats(self.now - timedelta(days=60), self.now), incremental)
+        self.assertEqual(incremental['total_events'], 81)
+
+    def test_stats_endpoint(self):
+        admin = User.objects.create_user(username='admin', password='testpass123')
+        admin.groups.add(Group.objects.create(name='Admin'))
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        response = client.get('/api/auth/manage/audit/stats/', {'days': 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_events'], 79)
+        self.assertEqual(response.data['date_range']['days'], 7)
+
+
+class AuditExportTestCase(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user(username='admin', password='testpass123')
+        admin.groups.add(Group.objects.create(name='Admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=admin)
+        now = timezone.now()
+        AuditLog.objects.bulk_create([
+            AuditLog(actor_email=f'user{n % 3}@example.com', actor_role='Admin',
+                     action='delete' if n % 1000 == 0 else 'create', resource_type='assets',
+                     resource_id=str(n), resource_name=f'A-{n}', timestamp=now - timedelta(seconds=n))
+            for n in range(10050)
+        ], batch_size=500)
+
+    def export(self, **params):
+        response = self.client.get('/api/auth/manage/audit/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export_is_not_truncated(self):
+        # The export request itself is audited under 'auth', so filter it out
+        lines = self.export(resource_type='assets').decode().splitlines()
+        self.assertEqual(lines[0], 'Timestamp,Actor Email,Actor Role,Action,Resource Type,Resource ID,Resource Name,'
+                                   'IP Address,Risk Score')
+        self.assertEqual(len(lines), 10051)
+
+    def test_export_applies_list_filters(self):
+        lines = self.export(action='delete', search='user0').decode().splitlines()
+        # n % 1000 == 0 and n % 3 == 0 for n in 0, 3000, 6000, 9000
+        self.assertEqual(len(lines), 5)
+        self.assertIn(',Delete,', lines[1])
+
+    def test_gzip_ndjson_export(self):
+        response = self.client.get('/api/auth/manage/audit/export/', {
+            'export_format': 'ndjson', 'compress': 'gzip', 'resource_type': 'assets'
+        })
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+
+        records = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual(len(records), 10050)
+        self.assertEqual(records[0]['resource_name'], 'A-0')
+
+    def test_unknown_format_rejected(self):
+        response = self.client.get('/api/auth/manage/audit/export/', {'export_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AuditArchiveTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.archive_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(AUDIT_ARCHIVE_DIR=self.archive_dir)
+        self.settings_override.enable()
+
+        now = timezone.now()
+        records = []
+        for n, (days, action) in enumerate([(200, 'create'), (200, 'update'), (201, 'delete'),
+                                            (201, 'create'), (202, 'create'), (1, 'create'),
+                                            (0, 'update'), (0, 'create')]):
+            records.append({
+                'id': str(uuid.uuid4()), 'timestamp': (now - timedelta(days=days, minutes=n)).isoformat(),
+                'actor_id': None, 'actor_email': f'user{n % 2}@example.com', 'action': action,
+                'resource_type': 'assets', 'resource_id': str(n), 'resource_name': f'A-{n}', 'risk_score': 10,
+            })
+        insert_records(records)
+
+        admin = User.objects.create_user(username='admin', password='testpass123')
+        admin.groups.add(Group.objects.create(name='Admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=admin)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.archive_dir)
+        cache.clear()
+
+    def list(self, **params):
+        params.setdefault('resource_type', 'assets')
+        response = self.client.get('/api/auth/manage/audit/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_archive_moves_old_days_into_segments(self):
+        self.assertEqual(archive_audit_logs(180), (3, 5))
+
+        self.assertEqual(AuditLog.objects.count(), 3)
+        segments = list(AuditArchiveSegment.objects.all())
+        self.assertEqual(sum(segment.record_count for segment in segments), 5)
+        for segment in segments:
+            self.assertTrue(os.path.exists(os.path.join(self.archive_dir, segment.path)))
+        self.assertEqual([segment.record_count for segment in segments], [2, 2, 1])
+        self.assertEqual(segments[1].actions, ['create', 'delete'])
+
+        # Rollups survive, so stats still cover the archived days
+        self.assertEqual(audit_stats(timezone.now() - timedelta(days=365), timezone.now())['total_events'], 8)
+
+    def test_list_pages_through_database_then_archive(self):
+        archive_audit_logs(180)
+
+        first = self.list(page_size=4)
+        self.assertEqual(first['count'], 8)
+        self.assertTrue(first['count_exact'])
+        self.assertEqual([log['resource_name'] for log in first['results']], ['A-6', 'A-7', 'A-5', 'A-0'])
+
+        second = self.list(page_size=4, page=2)
+        self.assertEqual([log['resource_name'] for log in second['results']], ['A-1', 'A-2', 'A-3', 'A-4'])
+
+        # Content filters make the archive count an index-only upper bound
+        filtered = self.list(action='delete')
+        self.assertEqual(filtered['count'], 2)
+        self.assertFalse(filtered['count_exact'])
+        self.assertEqual([log['resource_name'] for log in filtered['results']], ['A-2'])
+
+    def test_archive_included_by_default(self):
+        archive_audit_logs(180)
+        data = self.list()
+        self.assertEqual(data['count'], 8)
+        self.assertTrue(data['count_exact'])
+
+        opted_out = self.list(include_archive='false')
+        self.assertEqual(opted_out['count'], 3)
+        self.assertTrue(opted_out['count_exact'])
+
+    def test_retrieve_falls_back_to_archive(self):
+        archive_audit_logs(180)
+        archived = self.list(page_size=8)['results'][-1]
+        url = f'/api/auth/manage/audit/{archived["id"]}/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['resource_name'], 'A-4')
+
+        # The timestamp narrows the lookup to the segment covering it
+        with mock.patch.object(AuditArchive, 'read', autospec=True, side_effect=AuditArchive.read) as read:
+            response = self.client.get(url, {'timestamp': archived['timestamp']})
+        self.assertEqual(response.data['id'], archived['id'])
+        self.assertEqual(read.call_count, 1)
+
+        self.assertEqual(self.client.get(f'/api/auth/manage/audit/{uuid.uuid4()}/').status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/auth/manage/audit/not-a-uuid/').status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_list_does_not_scan_segments_for_count(self):
+        archive_audit_logs(180)
+        with mock.patch.object(AuditArchive, 'read', autospec=True, side_effect=AuditArchive.read) as read:
+            self.list(page_size=2, action='create')
+        # The page is filled from the database; no segment is opened
+        read.assert_not_called()
+
+    def test_unfiltered_archive_count_uses_index(self):
+        archive_audit_logs(180)
+        with self.assertNumQueries(1):
+            self.assertEqual(AuditArchive({}).count(), 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(AuditArchive({'action': 'delete'}).estimated_count(), (2, False))
+
+    def test_export_includes_archive(self):
+        archive_audit_logs(180)
+        response = self.client.get('/api/auth/manage/audit/export/', {'resource_type': 'assets'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 9)
+        self.assertTrue(lines[-1].endswith(',A-4,,10'))
+
+        response = self.client.get('/api/auth/manage/audit/export/',
+                                   {'resource_type': 'assets', 'include_archive': 'false'})
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 4)
+
+
+class AuditSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        entries = [
+            ('jane.doe@example.com', 'create', 'assets', 'Forklift FL-12'),
+            ('john@example.com', 'update', 'assets', 'Jane Street depot van'),
+            ('ops@fleet.io', 'permission_denied', 'drivers', 'Driver D-7'),
+            ('jane.doe@example.com', 'delete', 'fuel', 'Receipt 4411'),
+        ]
+        insert_records([
+            {
+                'id': str(uuid.uuid4()), 'timestamp': (now - timedelta(minutes=n)).isoformat(),
+                'actor_id': None, 'actor_email': email, 'action': action, 'resource_type': resource_type,
+                'resource_id': str(n), 'resource_name': name,
+            }
+            for n, (email, action, resource_type, name) in enumerate(entries)
+        ])
+
+    def tearDown(self):
+        cache.clear()
+
+    def search(self, text):
+        return list(search_audit_logs(AuditLog.objects.all(), text).values_list('resource_name', flat=True))
+
+    def test_prefix_terms_must_all_match(self):
+        self.assertEqual(set(self.search('jan')), {'Forklift FL-12', 'Jane Street depot van', 'Receipt 4411'})
+        self.assertEqual(set(self.search('jane.doe@exam')), {'Forklift FL-12', 'Receipt 4411'})
+        self.assertEqual(self.search('permission_den'), ['Driver D-7'])
+        self.assertEqual(self.search('fork ass'), ['Forklift FL-12'])
+        self.assertEqual(self.search('xyz'), [])
+        self.assertEqual(self.search('@@'), [])
+
+    def test_results_ranked_by_relevance(self):
+        insert_records([{
+            'id': str(uuid.uuid4()), 'timestamp': (timezone.now() - timedelta(days=1)).isoformat(),
+            'actor_id': None, 'actor_email': 'van@example.com', 'action': 'update',
+            'resource_type': 'assets', 'resource_id': '9', 'resource_name': 'Van VAN-1',
+        }])
+        # The older row mentions "van" three times, so it outranks the newer single mention
+        self.assertEqual(self.search('van'), ['Van VAN-1', 'Jane Street depot van'])
+
+    def test_index_follows_deletes(self):
+        AuditLog.objects.filter(resource_name='Driver D-7').delete()
+        self.assertEqual(self.search('ops'), [])
+
+    def test_search_matches_index_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.search('receipt'), ['Receipt 4411'])
+        self.assertEqual(queries.captured_queries[0]['sql'].count('MATCH'), 1)
+
+    def test_triggers_restored_after_migrate(self):
+        # Stand-in for a table remake (e.g. AlterField), which drops the table's triggers
+        with connection.cursor() as cursor:
+            for trigger in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {trigger}')
+        insert_records([{
+            'id': str(uuid.uuid4()), 'timestamp': timezone.now().isoformat(), 'actor_id': None,
+            'actor_email': 'late@example.com', 'action': 'create', 'resource_type': 'assets',
+            'resource_id': '8', 'resource_name': 'Tanker TK-3',
+        }])
+        self.assertEqual(self.search('tanker'), [])
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        self.assertEqual(self.search('tanker'), ['Tanker TK-3'])
+        AuditLog.objects.filter(resource_name='Receipt 4411').delete()
+        self.assertEqual(self.search('receipt'), [])
+
+    def test_list_endpoint_uses_index(self):
+        admin = User.objects.create_user(username='admin', password='testpass123')
+        admin.groups.add(Group.objects.create(name='Admin'))
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        response = client.get('/api/auth/manage/audit/', {'search': 'recei', 'include_archive': 'false'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([log['resource_name'] for log in response.data['results']], ['Receipt 4411'])
+
+
+@override_settings(SHARED_CACHE=True)
+class TokenCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='poller', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.backend = CookieTokenAuthentication()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_repeat_authentication_skips_database(self):
+        user, token = self.backend.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+        with self.assertNumQueries(0):
+            user, token = self.backend.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+        self.assertIsNone(cache.get(self.token.key))
+        self.assertIsNotNone(cache.get(token_cache_key(self.token.key)))
+
+    def test_cookie_and_header_share_cache(self):
+        client = APIClient()
+        client.cookies['auth_token'] = self.token.key
+        self.assertEqual(client.get('/api/auth/user/').status_code, status.HTTP_200_OK)
+
+        header_client = APIClient()
+        header_client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(header_client.get('/api/auth/user/').status_code, status.HTTP_200_OK)
+        self.assertFalse(any('authtoken_token' in query['sql'] for query in queries.captured_queries))
+
+    def test_logout_invalidates(self):
+        self.backend.authenticate_credentials(self.token.key)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(client.post('/api/auth/logout/').status_code, status.HTTP_200_OK)
+
+        self.assertIsNone(self.backend.authenticate_credentials(self.token.key))
+
+    def test_deactivation_invalidates(self):
+        self.backend.authenticate_credentials(self.token.key)
+        admin = User.objects.create_superuser(username='admin', password='testpass123')
+        admin.groups.add(Group.objects.create(name='Admin'))
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        response = client.post(f'/api/auth/manage/users/{self.user.id}/deactivate/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertIsNone(self.backend.authenticate_credentials(self.token.key))
+
+    def test_rotation_invalidates_old_key(self):
+        self.backend.authenticate_credentials(self.token.key)
+        old_key = self.token.key
+        self.token.delete()
+        new_token = Token.objects.create(user=self.user)
+
+        self.assertIsNone(self.backend.authenticate_credentials(old_key))
+        self.assertEqual(self.backend.authenticate_credentials(new_token.key)[0], self.user)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_per_process_cache_not_used(self):
+        self.backend.authenticate_credentials(self.token.key)
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
+
+        # Deactivated by another worker: no signal reaches this process's cache
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(self.backend.authenticate_credentials(self.token.key))
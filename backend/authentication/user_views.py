@@ -15,13 +15,15 @@ import uuid
 from .models import UserInvitation, UserProfile
 from .serializers import UserSerializer
 from .permissions import IsAdmin
+from .audit_middleware import AuditedViewSetMixin
 
 
-class UserManagementViewSet(viewsets.ModelViewSet):
+class UserManagementViewSet(AuditedViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing users - Admin only"""
     queryset = User.objects.all().prefetch_related('groups')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
+    audit_resource_type = 'users'
     
     def get_queryset(self):
         """Get all users with their groups and profiles"""
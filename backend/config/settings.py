@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'drivers',
     'fuel',
     'capital_planning',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -156,14 +157,33 @@ FILE_UPLOAD_MAGIC_NUMBERS = {
     'png': [b'\x89PNG\r\n\x1a\n'],
     'docx': [b'PK\x03\x04'],
     'xlsx': [b'PK\x03\x04'],
+    'doc': [b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'],
+    'xls': [b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'],
     'csv': [b''],  # CSV files don't have magic numbers
 }
 
+# Background jobs: imports larger than this (bytes) are queued for the run_jobs worker
+JOBS_BACKGROUND_THRESHOLD = int(os.environ.get('JOBS_BACKGROUND_THRESHOLD', '1048576'))  # 1MB
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', '2'))
+# Running jobs not heard from for this long are requeued (up to JOBS_MAX_ATTEMPTS runs)
+JOBS_LEASE_SECONDS = int(os.environ.get('JOBS_LEASE_SECONDS', '600'))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', '3'))
+
+# Uploaded images are resized by run_jobs workers (inline when disabled; config.test_runner disables it under tests)
+IMAGE_PROCESSING_ASYNC = os.environ.get('IMAGE_PROCESSING_ASYNC', 'True').lower() == 'true'
+# Responsive derivative encodings (add 'avif' where Pillow supports it). Derivatives live under
+# MEDIA_URL + 'assets/images/derivatives/' and never change: serve them with
+# Cache-Control: public, max-age=31536000, immutable
+IMAGE_DERIVATIVE_FORMATS = os.environ.get('IMAGE_DERIVATIVE_FORMATS', 'webp,jpeg').split(',')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Runs background work inline under `manage.py test` (see config/test_runner.py)
+TEST_RUNNER = 'config.test_runner.FleetTestRunner'
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -220,6 +240,48 @@ CSRF_COOKIE_SECURE = os.environ.get('DJANGO_CSRF_COOKIE_SECURE', 'False').lower(
 CSRF_COOKIE_HTTPONLY = True
 CSRF_COOKIE_SAMESITE = 'Lax'
 
+# Cache (shared across workers when REDIS_URL is set; per-process otherwise)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Whether every worker shares the cache. Permission sets and authenticated tokens
+# are only cached across requests when it does: in a per-process cache, a role
+# or token revocation would not reach the other workers.
+SHARED_CACHE = os.environ.get('SHARED_CACHE', str(bool(os.environ.get('REDIS_URL')))).lower() == 'true'
+
+# Seconds a resolved permission set stays cached (role changes invalidate immediately; SHARED_CACHE only)
+PERMISSION_CACHE_TIMEOUT = int(os.environ.get('PERMISSION_CACHE_TIMEOUT', '300'))
+
+# Seconds an authenticated token stays cached (logout and deactivation invalidate immediately; SHARED_CACHE only)
+TOKEN_CACHE_TIMEOUT = int(os.environ.get('TOKEN_CACHE_TIMEOUT', '60'))
+
+# Seconds the asset dashboard stats stay cached (asset saves and deletes invalidate immediately; SHARED_CACHE only)
+ASSET_STATS_CACHE_TIMEOUT = int(os.environ.get('ASSET_STATS_CACHE_TIMEOUT', '300'))
+
+# Seconds the stats stay cached in a per-process cache, which other workers' writes cannot invalidate
+ASSET_STATS_LOCAL_CACHE_TIMEOUT = int(os.environ.get('ASSET_STATS_LOCAL_CACHE_TIMEOUT', '5'))
+
+# Audit logging: events are spooled to disk and batch-inserted by a background thread
+# (inline inserts when disabled; config.test_runner disables it under tests)
+AUDIT_ASYNC = os.environ.get('AUDIT_ASYNC', 'True').lower() == 'true'
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', '2.0'))  # seconds
+AUDIT_SPOOL_DIR = Path(os.environ.get('AUDIT_SPOOL_DIR', BASE_DIR / 'audit_spool'))
+AUDIT_STATS_CACHE_TIMEOUT = int(os.environ.get('AUDIT_STATS_CACHE_TIMEOUT', '60'))  # seconds
+AUDIT_ARCHIVE_DIR = Path(os.environ.get('AUDIT_ARCHIVE_DIR', BASE_DIR / 'audit_archive'))
+AUDIT_ARCHIVE_AFTER_DAYS = int(os.environ.get('AUDIT_ARCHIVE_AFTER_DAYS', '180'))
+
 # Rate limiting configuration (to be implemented with django-ratelimit)
 RATELIMIT_ENABLE = os.environ.get('DJANGO_RATELIMIT_ENABLE', 'True').lower() == 'true'
 RATELIMIT_USE_CACHE = 'default'
@@ -0,0 +1,46 @@
+"""
+Helpers for streamed (StreamingHttpResponse) exports
+
+Exports write rows one at a time; buffered() joins those small strings into
+chunks of a given size so a response is not sent as thousands of tiny
+writes, and gzip_chunks() compresses a chunk stream on the fly.
+"""
+import zlib
+
+
+class LineBuffer:
+    """File-like target for csv.writer that keeps what was written"""
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self):
+        data = ''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def buffered(lines, buffer_bytes):
+    """Join small strings into UTF-8 chunks of roughly buffer_bytes"""
+    parts = []
+    size = 0
+    for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= buffer_bytes:
+            yield ''.join(parts).encode('utf-8')
+            parts = []
+            size = 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,27 @@
+"""
+Test runner for `manage.py test`
+
+Work the app normally hands to background threads and worker processes runs
+inline under test, so assertions see its results. Tests exercising the async
+paths turn them back on with override_settings. Other runners (pytest-django)
+should apply TEST_SETTINGS the same way.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+TEST_SETTINGS = {
+    'AUDIT_ASYNC': False,
+    'IMAGE_PROCESSING_ASYNC': False,
+}
+
+
+class FleetTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**TEST_SETTINGS)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
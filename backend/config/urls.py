@@ -2,9 +2,11 @@
 URL configuration for backend project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from assets.images import DERIVATIVE_PREFIX
+from assets.views import serve_image_derivative
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,9 +16,13 @@ urlpatterns = [
     path('api/drivers/', include('drivers.urls')),
     path('api/fuel/', include('fuel.urls')),
     path('api/cap-planning/v1/', include('capital_planning.urls')),
+    path('api/jobs/', include('jobs.urls')),
     path('api-auth/', include('rest_framework.urls')),
 ]
 
-# Serve media files in development
+# Serve media files in development (content-addressed image derivatives as immutable)
 if settings.DEBUG:
+    urlpatterns += [
+        re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>{DERIVATIVE_PREFIX}.*)$', serve_image_derivative),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
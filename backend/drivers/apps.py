@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class DriversConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'drivers'
+
+    def ready(self):
+        # Restore the driver search triggers after migrations
+        from . import signals
+        signals.connect()
@@ -0,0 +1,44 @@
+"""
+Off-request resizing of driver profile photos (see assets.images)
+"""
+import logging
+
+from PIL import Image
+
+from assets.images import encode_jpeg, open_rgb
+from .models import Driver
+
+
+logger = logging.getLogger(__name__)
+
+PHOTO_SIZE = (300, 300)
+
+
+def process_driver_photo(driver_pk, source_hash):
+    """
+    Resize a driver's stored source photo to at most 300x300.
+    Returns the resulting status ('ready', 'failed' or 'stale').
+    """
+    driver = Driver.objects.filter(pk=driver_pk, photo_hash=source_hash).first()
+    if driver is None or not driver.profile_photo:
+        return 'stale'
+    current = Driver.objects.filter(pk=driver_pk, photo_hash=source_hash)
+    current.update(photo_status='processing')
+
+    source_name = driver.profile_photo.name
+    storage = driver.profile_photo.storage
+    try:
+        image = open_rgb(driver.profile_photo)
+        image.thumbnail(PHOTO_SIZE, Image.Resampling.LANCZOS)
+        driver.profile_photo.save(f"{driver.driver_id}_photo.jpg", encode_jpeg(image), save=False)
+    except Exception:
+        logger.exception('Photo processing failed for driver %s', driver_pk)
+        current.update(photo_status='failed')
+        return 'failed'
+
+    if current.update(profile_photo=driver.profile_photo.name, photo_status='ready'):
+        storage.delete(source_name)
+        return 'ready'
+    # A newer upload replaced the source while this one was processing
+    storage.delete(driver.profile_photo.name)
+    return 'stale'
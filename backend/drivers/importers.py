@@ -0,0 +1,128 @@
+"""
+CSV import for drivers
+"""
+from rest_framework import status
+from django.db import transaction
+import csv
+import io
+from datetime import datetime
+from .models import Driver
+
+
+PROGRESS_EVERY_ROWS = 100
+
+
+def import_drivers_csv(csv_file, progress_callback=None):
+    """
+    Import (or update) drivers from an uploaded CSV file.
+    Returns (response_data, http_status) so the same code can serve the
+    API request directly or run inside a background job.
+    """
+    try:
+        decoded_file = csv_file.read().decode('utf-8')
+        io_string = io.StringIO(decoded_file)
+        reader = csv.DictReader(io_string)
+
+        # Validate required columns
+        required_columns = ['driver_id', 'first_name', 'last_name', 'email']
+        if reader.fieldnames:
+            missing_columns = set(required_columns) - set(reader.fieldnames)
+            if missing_columns:
+                return (
+                    {'error': f'Missing required columns: {", ".join(missing_columns)}'},
+                    status.HTTP_400_BAD_REQUEST
+                )
+
+        # Process each row
+        success_count = 0
+        error_count = 0
+        errors = []
+
+        with transaction.atomic():
+            for row_num, row in enumerate(reader, start=2):
+                try:
+                    # Map CSV fields to model fields
+                    driver_data = {
+                        'driver_id': row.get('driver_id', '').strip(),
+                        'first_name': row.get('first_name', '').strip(),
+                        'last_name': row.get('last_name', '').strip(),
+                        'email': row.get('email', '').strip(),
+                        'phone': row.get('phone', '').strip() if row.get('phone') else None,
+                        'license_number': row.get('license_number', '').strip() if row.get('license_number') else None,
+                        'license_type': row.get('license_type', 'regular').strip().lower(),
+                        'license_expiration': row.get('license_expiration', '').strip() if row.get('license_expiration') else None,
+                        'employment_status': row.get('employment_status', 'active').strip().lower(),
+                        'department': row.get('department', '').strip() if row.get('department') else None,
+                        'position': row.get('position', '').strip() if row.get('position') else None,
+                        'date_of_birth': row.get('date_of_birth', '').strip() if row.get('date_of_birth') else None,
+                        'hire_date': row.get('hire_date', '').strip() if row.get('hire_date') else None,
+                        'address': row.get('address', '').strip() if row.get('address') else None,
+                        'city': row.get('city', '').strip() if row.get('city') else None,
+                        'state': row.get('state', '').strip() if row.get('state') else None,
+                        'zip_code': row.get('zip_code', '').strip() if row.get('zip_code') else None,
+                        'notes': row.get('notes', '').strip() if row.get('notes') else None,
+                    }
+
+                    # Remove empty values
+                    driver_data = {k: v for k, v in driver_data.items() if v}
+
+                    # Convert date fields
+                    for date_field in ['license_expiration', 'date_of_birth', 'hire_date']:
+                        if date_field in driver_data and driver_data[date_field]:
+                            try:
+                                driver_data[date_field] = datetime.strptime(driver_data[date_field], '%Y-%m-%d').date()
+                            except ValueError:
+                                try:
+                                    driver_data[date_field] = datetime.strptime(driver_data[date_field], '%m/%d/%Y').date()
+                                except ValueError:
+                                    del driver_data[date_field]
+
+                    # Check if driver already exists
+                    if Driver.objects.filter(driver_id=driver_data['driver_id']).exists():
+                        # Update existing driver
+                        Driver.objects.filter(driver_id=driver_data['driver_id']).update(**driver_data)
+                    else:
+                        # Create new driver
+                        Driver.objects.create(**driver_data)
+
+                    success_count += 1
+
+                except Exception as e:
+                    error_count += 1
+                    errors.append(f"Row {row_num}: {str(e)}")
+
+                    # If too many errors, abort
+                    if error_count > 10:
+                        transaction.set_rollback(True)
+                        return (
+                            {
+                                'error': 'Too many errors encountered',
+                                'errors': errors[:10],
+                                'processed': row_num - 1
+                            },
+                            status.HTTP_400_BAD_REQUEST
+                        )
+
+                processed = row_num - 1
+                if progress_callback and processed % PROGRESS_EVERY_ROWS == 0:
+                    progress_callback({
+                        'processed_rows': processed,
+                        'success_count': success_count,
+                        'error_count': error_count
+                    })
+
+        return (
+            {
+                'message': f'Import completed: {success_count} drivers imported/updated successfully',
+                'success_count': success_count,
+                'error_count': error_count,
+                'errors': errors[:10] if errors else []
+            },
+            status.HTTP_200_OK
+        )
+
+    except Exception as e:
+        return (
+            {'error': f'Failed to process CSV file: {str(e)}'},
+            status.HTTP_400_BAD_REQUEST
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0002_alter_driverassetassignment_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='driver',
+            index=models.Index(fields=['department', 'driver_id'], name='drivers_dri_departm_bd024c_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:00
+
+from django.db import migrations, models
+
+
+def mark_existing_photos_ready(apps, schema_editor):
+    # Files uploaded before off-request processing were resized on save
+    Driver = apps.get_model('drivers', 'Driver')
+    Driver.objects.exclude(profile_photo='').exclude(profile_photo__isnull=True).update(photo_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0003_department_scope_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driver',
+            name='photo_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the uploaded source photo', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='driver',
+            name='photo_status',
+            field=models.CharField(choices=[('none', 'No Photo'), ('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', help_text='State of the resized profile photo', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_photos_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations
+
+
+# Frozen copies of the index DDL: later changes to drivers.search must not change
+# what this migration did
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS drivers_driver_search USING fts5(driver_id, first_name, "
+    "last_name, email, license_number, department, position, content='drivers_driver', "
+    "tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS drivers_driver_search_ai AFTER INSERT ON drivers_driver BEGIN '
+    'INSERT INTO drivers_driver_search(rowid, driver_id, first_name, last_name, email, '
+    'license_number, department, position) VALUES (new.rowid, new.driver_id, new.first_name, '
+    'new.last_name, new.email, new.license_number, new.department, new.position); END',
+    "CREATE TRIGGER IF NOT EXISTS drivers_driver_search_ad AFTER DELETE ON drivers_driver BEGIN "
+    "INSERT INTO drivers_driver_search(drivers_driver_search, rowid, driver_id, first_name, "
+    "last_name, email, license_number, department, position) VALUES ('delete', old.rowid, "
+    "old.driver_id, old.first_name, old.last_name, old.email, old.license_number, old.department, "
+    "old.position); END",
+    "CREATE TRIGGER IF NOT EXISTS drivers_driver_search_au AFTER UPDATE ON drivers_driver BEGIN "
+    "INSERT INTO drivers_driver_search(drivers_driver_search, rowid, driver_id, first_name, "
+    "last_name, email, license_number, department, position) VALUES ('delete', old.rowid, "
+    "old.driver_id, old.first_name, old.last_name, old.email, old.license_number, old.department, "
+    "old.position); INSERT INTO drivers_driver_search(rowid, driver_id, first_name, last_name, email, "
+    "license_number, department, position) VALUES (new.rowid, new.driver_id, new.first_name, "
+    "new.last_name, new.email, new.license_number, new.department, new.position); END",
+    "INSERT INTO drivers_driver_search(drivers_driver_search) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS drivers_driver_search_ai',
+    'DROP TRIGGER IF EXISTS drivers_driver_search_ad',
+    'DROP TRIGGER IF EXISTS drivers_driver_search_au',
+    'DROP TABLE IF EXISTS drivers_driver_search',
+]
+POSTGRES_INSTALL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX IF NOT EXISTS drivers_driver_search_trgm ON drivers_driver USING gin "
+    "((lower(coalesce(driver_id, '') || ' ' || coalesce(first_name, '') || ' ' || coalesce(last_name, "
+    "'') || ' ' || coalesce(email, '') || ' ' || coalesce(license_number, '') || ' ' || "
+    "coalesce(department, '') || ' ' || coalesce(position, ''))) gin_trgm_ops)",
+]
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS drivers_driver_search_trgm',
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_INSTALL)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_INSTALL)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0004_driver_photo_hash_driver_photo_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -1,7 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator, RegexValidator
 from django.utils import timezone
-from PIL import Image
 import uuid
 import os
 from datetime import date, timedelta
@@ -31,6 +30,14 @@ class Driver(models.Model):
         ('motorcycle', 'Motorcycle License'),
     ]
     
+    PHOTO_STATUS_CHOICES = [
+        ('none', 'No Photo'),
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
     # Unique identifiers
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     driver_id = models.CharField(max_length=50, unique=True, help_text="Unique driver identifier")
@@ -86,6 +93,9 @@ class Driver(models.Model):
         null=True,
         help_text="Driver profile photo (recommended: 300x300px, max 2MB)"
     )
+    photo_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the uploaded source photo")
+    photo_status = models.CharField(max_length=20, choices=PHOTO_STATUS_CHOICES, default='none',
+                                    help_text="State of the resized profile photo")
     
     # Additional information
     notes = models.TextField(blank=True, null=True, help_text="Additional notes or comments")
@@ -98,6 +108,10 @@ class Driver(models.Model):
         ordering = ['driver_id']
         verbose_name = 'Driver'
         verbose_name_plural = 'Drivers'
+        indexes = [
+            # Department-scoped listings (authentication.filters.ScopeFilterBackend)
+            models.Index(fields=['department', 'driver_id']),
+        ]
     
     def __str__(self):
         return f"{self.driver_id} - {self.first_name} {self.last_name}"
@@ -125,46 +139,38 @@ class Driver(models.Model):
     def save(self, *args, **kwargs):
         # Auto-generate driver_id if not provided
         if not self.driver_id:
-            # Generate driver ID based on last name and current count
-            name_prefix = self.last_name[:3].upper()
-            count = Driver.objects.count() + 1
-            self.driver_id = f"DRV-{name_prefix}-{count:04d}"
+            # Last name prefix and the next number in the driver series
+            from assets.sequences import generate_driver_id
+            self.driver_id = generate_driver_id(self.last_name)
         
-        # Process profile photo if provided
-        if self.profile_photo:
-            self._process_photo()
+        # A new upload is stored as-is and resized off-request
+        process_photo = False
+        replaced_photo = None
+        if self.profile_photo and not self.profile_photo._committed:
+            from assets.images import file_digest
+            digest = file_digest(self.profile_photo)
+            previous = Driver.objects.filter(pk=self.pk).values_list('profile_photo', 'photo_hash').first()
+            if previous and previous[0] and previous[1] == digest:
+                # Same source as before: keep the existing photo
+                self.profile_photo = previous[0]
+            else:
+                self.photo_hash = digest
+                self.photo_status = 'pending'
+                process_photo = True
+                replaced_photo = previous[0] if previous else None
+        elif not self.profile_photo:
+            self.photo_hash = ''
+            self.photo_status = 'none'
         
         super().save(*args, **kwargs)
-    
-    def _process_photo(self):
-        """Process and resize the uploaded photo"""
-        if not self.profile_photo:
-            return
-            
-        # Open the image
-        image = Image.open(self.profile_photo)
-        
-        # Convert to RGB if necessary
-        if image.mode in ('RGBA', 'P'):
-            image = image.convert('RGB')
-        
-        # Resize to max 300x300 while maintaining aspect ratio
-        max_size = (300, 300)
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Save the resized image
-        from django.core.files.base import ContentFile
-        from io import BytesIO
-        
-        photo_io = BytesIO()
-        image.save(photo_io, format='JPEG', quality=85, optimize=True)
-        photo_content = ContentFile(photo_io.getvalue())
-        
-        # Generate filename
-        filename = f"{self.driver_id}_photo.jpg"
         
-        # Save photo
-        self.profile_photo.save(filename, photo_content, save=False)
+        if replaced_photo and replaced_photo != self.profile_photo.name:
+            self.profile_photo.storage.delete(replaced_photo)
+        if process_photo:
+            from assets.images import schedule
+            from .images import process_driver_photo
+            if schedule('driver_photo', process_driver_photo, self.pk, self.photo_hash):
+                self.refresh_from_db(fields=['profile_photo', 'photo_status'])
     
     def delete(self, *args, **kwargs):
         """Delete associated photo when driver is deleted"""
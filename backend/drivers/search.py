@@ -0,0 +1,11 @@
+"""
+Indexed driver search (see assets.search)
+"""
+from assets.search import FleetSearchIndex
+
+from .models import Driver
+
+
+DRIVER_SEARCH_INDEX = FleetSearchIndex(
+    Driver, ['driver_id', 'first_name', 'last_name', 'email', 'license_number', 'department', 'position']
+)
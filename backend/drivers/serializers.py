@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Driver, DriverCertification, DriverAssetAssignment, DriverViolation
+from assets.fieldsets import SparseFieldsetMixin
 from assets.serializers import AssetListSerializer
 from datetime import date, timedelta
 
@@ -55,7 +56,7 @@ class DriverViolationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class DriverSerializer(serializers.ModelSerializer):
+class DriverSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
     age = serializers.ReadOnlyField()
     license_expires_soon = serializers.ReadOnlyField()
@@ -83,26 +84,33 @@ class DriverSerializer(serializers.ModelSerializer):
             'license_type_display', 'license_expiration', 'license_state', 'license_expires_soon',
             'license_is_expired', 'address_line1', 'address_line2', 'city', 'state', 'zip_code',
             'emergency_contact_name', 'emergency_contact_phone', 'emergency_contact_relationship',
-            'profile_photo', 'notes', 'certifications', 'asset_assignments', 'violations',
+            'profile_photo', 'photo_status', 'notes', 'certifications', 'asset_assignments', 'violations',
             'certifications_count', 'active_assignments_count', 'violations_count',
             'expiring_items_count', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'photo_status', 'created_at', 'updated_at']
+        expandable_fields = ['certifications', 'asset_assignments', 'violations']
+    
+    def _active_assignments(self, obj):
+        # Prefetched by the viewset when asset_assignments is expanded
+        assignments = getattr(obj, 'active_assignments', None)
+        if assignments is None:
+            assignments = obj.asset_assignments.filter(
+                status='active',
+                unassigned_date__isnull=True
+            ).select_related('asset').order_by('priority', '-assigned_date')
+        return assignments
     
     def get_certifications_count(self, obj):
         return obj.certifications.count()
     
     def get_asset_assignments(self, obj):
         # Get active asset assignments for this driver
-        assignments = obj.asset_assignments.filter(
-            status='active',
-            unassigned_date__isnull=True
-        ).select_related('asset').order_by('priority', '-assigned_date')
-        
-        return DriverAssetAssignmentSerializer(assignments, many=True).data
+        return DriverAssetAssignmentSerializer(self._active_assignments(obj), many=True).data
     
     def get_active_assignments_count(self, obj):
-        return obj.asset_assignments.filter(status='active', unassigned_date__isnull=True).count()
+        assignments = self._active_assignments(obj)
+        return len(assignments) if isinstance(assignments, list) else assignments.count()
     
     def get_violations_count(self, obj):
         return obj.violations.count()
@@ -149,7 +157,7 @@ class DriverSerializer(serializers.ModelSerializer):
     
 
 
-class DriverListSerializer(serializers.ModelSerializer):
+class DriverListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Simplified serializer for list views"""
     full_name = serializers.ReadOnlyField()
     age = serializers.ReadOnlyField()
@@ -172,19 +180,36 @@ class DriverListSerializer(serializers.ModelSerializer):
             'id', 'driver_id', 'first_name', 'last_name', 'full_name', 'email', 'phone',
             'employment_status', 'employment_status_display', 'department', 'position',
             'license_number', 'license_type', 'license_type_display', 'license_expiration', 
-            'license_expires_soon', 'license_is_expired', 'age', 'profile_photo', 'certifications_count',
+            'license_expires_soon', 'license_is_expired', 'age', 'profile_photo', 'photo_status',
+            'certifications_count',
             'active_assignments_count', 'violations_count', 'expiring_items_count', 'alert_details',
             'has_critical_alert', 'created_at'
         ]
     
+    def _annotated(self, obj, name, queryset):
+        # The list queryset annotates the counts; count directly otherwise
+        count = getattr(obj, name, None)
+        return queryset.count() if count is None else count
+    
+    def _active_assignments(self, obj):
+        assignments = getattr(obj, 'active_assignments', None)
+        if assignments is None:
+            assignments = list(obj.asset_assignments.filter(
+                status='active', unassigned_date__isnull=True
+            ).select_related('asset'))
+        return assignments
+    
     def get_certifications_count(self, obj):
-        return obj.certifications.count()
+        return self._annotated(obj, 'certifications_count', obj.certifications.all())
     
     def get_active_assignments_count(self, obj):
-        return obj.asset_assignments.filter(status='active', unassigned_date__isnull=True).count()
+        return self._annotated(
+            obj, 'active_assignments_count',
+            obj.asset_assignments.filter(status='active', unassigned_date__isnull=True)
+        )
     
     def get_violations_count(self, obj):
-        return obj.violations.count()
+        return self._annotated(obj, 'violations_count', obj.violations.all())
     
     def get_expiring_items_count(self, obj):
         count = 0
@@ -193,27 +218,27 @@ class DriverListSerializer(serializers.ModelSerializer):
             count += 1
         # Check certification expirations
         thirty_days_from_now = date.today() + timedelta(days=30)
-        expiring_certs = obj.certifications.filter(
+        count += self._annotated(obj, 'expiring_certifications_count', obj.certifications.filter(
             expiration_date__lte=thirty_days_from_now,
             expiration_date__gte=date.today()
-        ).count()
-        count += expiring_certs
+        ))
         return count
     
     def get_alert_details(self, obj):
         """Get alert details only if driver has assignments but can't drive"""
         alerts = []
-        active_assignments = obj.asset_assignments.filter(status='active', unassigned_date__isnull=True)
+        active_assignments = self._active_assignments(obj)
         
         # Only generate alerts if driver has active assignments
-        if active_assignments.exists():
+        if active_assignments:
+            affected_vehicles = [assignment.asset.asset_id for assignment in active_assignments]
             # Check if driver is suspended or terminated
             if obj.employment_status in ['suspended', 'terminated']:
                 alerts.append({
                     'type': 'employment_status',
                     'severity': 'critical',
-                    'message': f'Driver is {obj.get_employment_status_display()} but has {active_assignments.count()} active vehicle assignment(s)',
-                    'affected_vehicles': list(active_assignments.values_list('asset__asset_id', flat=True))
+                    'message': f'Driver is {obj.get_employment_status_display()} but has {len(active_assignments)} active vehicle assignment(s)',
+                    'affected_vehicles': affected_vehicles
                 })
             
             # Check if license is expired
@@ -221,17 +246,15 @@ class DriverListSerializer(serializers.ModelSerializer):
                 alerts.append({
                     'type': 'license_expired',
                     'severity': 'critical',
-                    'message': f'License expired on {obj.license_expiration} but driver has {active_assignments.count()} active vehicle assignment(s)',
-                    'affected_vehicles': list(active_assignments.values_list('asset__asset_id', flat=True))
+                    'message': f'License expired on {obj.license_expiration} but driver has {len(active_assignments)} active vehicle assignment(s)',
+                    'affected_vehicles': affected_vehicles
                 })
         
         return alerts
     
     def get_has_critical_alert(self, obj):
         """Check if driver has any critical alerts"""
-        active_assignments = obj.asset_assignments.filter(status='active', unassigned_date__isnull=True)
-        
-        if active_assignments.exists():
+        if self._active_assignments(obj):
             # Has critical alert if driver can't drive but has assignments
             return (obj.employment_status in ['suspended', 'terminated']) or obj.license_is_expired
         
@@ -0,0 +1,18 @@
+"""
+Signal handlers keeping the driver search index in step with the database
+"""
+from django.apps import apps
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+from .search import DRIVER_SEARCH_INDEX
+
+
+def restore_search_index(sender, using, **kwargs):
+    """A migration that remade the driver table dropped the search triggers"""
+    DRIVER_SEARCH_INDEX.restore(connections[using])
+
+
+def connect():
+    post_migrate.connect(restore_search_index, sender=apps.get_app_config('drivers'),
+                         dispatch_uid='restore_driver_search')
@@ -1,3 +1,186 @@
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from datetime import date, timedelta
 
-# Create your tests here.
+from assets.models import Asset
+from .models import Driver, DriverCertification, DriverAssetAssignment, DriverViolation
+
+User = get_user_model()
+
+
+class DriverListQueryTestCase(TestCase):
+    """The driver list reads its counts from annotations"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='listadmin', password='testpass123')
+        self.user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.asset = Asset.objects.create(asset_id='TRK-1', vehicle_type='truck', make='Ford',
+                                          model='F-150', year=2021)
+    
+    def create_driver(self, number, **extra):
+        driver = Driver.objects.create(
+            first_name='Driver',
+            last_name=str(number),
+            email=f'driver{number}@example.com',
+            phone='+1234567890',
+            date_of_birth='1990-01-01',
+            hire_date='2020-01-01',
+            license_number=f'D{number:09d}',
+            license_type='regular',
+            license_expiration=date.today() + timedelta(days=365),
+            license_state='CA',
+            address_line1='123 Main St',
+            city='Anytown',
+            state='CA',
+            zip_code='12345',
+            emergency_contact_name='Contact',
+            emergency_contact_phone='+0987654321',
+            emergency_contact_relationship='Spouse',
+            **extra
+        )
+        DriverCertification.objects.create(
+            driver=driver, certification_type='other', certification_name='Forklift',
+            issued_date='2020-01-01', expiration_date=date.today() + timedelta(days=10),
+            issuing_authority='OSHA'
+        )
+        DriverCertification.objects.create(
+            driver=driver, certification_type='other', certification_name='First aid',
+            issued_date='2020-01-01', expiration_date=date.today() + timedelta(days=400),
+            issuing_authority='Red Cross'
+        )
+        DriverAssetAssignment.objects.create(
+            driver=driver, asset=self.asset, assigned_date=timezone.now(), assigned_by='Dispatcher'
+        )
+        DriverAssetAssignment.objects.create(
+            driver=driver, asset=self.asset, assignment_type='backup', status='completed',
+            assigned_date=timezone.now(), unassigned_date=timezone.now(), assigned_by='Dispatcher'
+        )
+        return driver
+    
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('driver-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, queries
+    
+    def test_counts_and_alerts(self):
+        self.create_driver(1)
+        self.create_driver(2, employment_status='suspended')
+        response, _ = self.list_queries()
+        rows = {row['email']: row for row in response.data['results']}
+        
+        active = rows['driver1@example.com']
+        self.assertEqual(active['certifications_count'], 2)
+        self.assertEqual(active['active_assignments_count'], 1)
+        self.assertEqual(active['violations_count'], 0)
+        self.assertEqual(active['expiring_items_count'], 1)
+        self.assertFalse(active['has_critical_alert'])
+        
+        suspended = rows['driver2@example.com']
+        self.assertTrue(suspended['has_critical_alert'])
+        self.assertEqual(suspended['alert_details'][0]['affected_vehicles'], ['TRK-1'])
+        self.assertIn('1 active vehicle assignment(s)', suspended['alert_details'][0]['message'])
+    
+    def test_counts_without_joining_relations(self):
+        driver = self.create_driver(1)
+        for day in [1, 2, 3]:
+            DriverViolation.objects.create(
+                driver=driver, violation_type='traffic', severity='minor', description='Speeding',
+                violation_date=date.today() - timedelta(days=day)
+            )
+        response, queries = self.list_queries()
+        row = response.data['results'][0]
+        self.assertEqual(row['certifications_count'], 2)
+        self.assertEqual(row['active_assignments_count'], 1)
+        self.assertEqual(row['violations_count'], 3)
+        self.assertEqual(row['expiring_items_count'], 1)
+        
+        # Each count is its own subquery: the driver rows are never multiplied by a join
+        list_sql = next(q['sql'] for q in queries if 'certifications_count' in q['sql'])
+        self.assertNotIn('JOIN', list_sql)
+        self.assertNotIn('DISTINCT', list_sql)
+    
+    def test_detail_expansions(self):
+        driver = self.create_driver(1)
+        url = reverse('driver-detail', args=[driver.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'expand': 'asset_assignments'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['asset_assignments']), 1)
+        self.assertEqual(response.data['active_assignments_count'], 1)
+        self.assertNotIn('certifications', response.data)
+        self.assertNotIn('violations', response.data)
+        assignment_queries = [q for q in queries if 'FROM "drivers_driverassetassignment"' in q['sql']]
+        self.assertEqual(len(assignment_queries), 1)
+        
+        response = self.client.get(url, {'fields': 'driver_id,certifications_count'})
+        self.assertEqual(set(response.data), {'driver_id', 'certifications_count'})
+        self.assertEqual(response.data['certifications_count'], 2)
+    
+    def test_constant_queries(self):
+        for number in range(1, 3):
+            self.create_driver(number)
+        self.list_queries()  # per-process lookups happen on the first request
+        _, few = self.list_queries()
+        for number in range(3, 9):
+            self.create_driver(number, employment_status='terminated')
+        _, many = self.list_queries()
+        self.assertEqual(len(few), len(many))
+
+
+class DriverSearchTestCase(TestCase):
+    """Indexed driver search"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='searchadmin', password='testpass123')
+        self.user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for number, (first_name, last_name, position) in enumerate(
+                [('Maria', 'Lopez', 'Bus Driver'), ('Mario', 'Rossi', 'Mechanic')], start=1):
+            Driver.objects.create(
+                first_name=first_name, last_name=last_name, position=position,
+                email=f'{first_name.lower()}@example.com', phone='+1234567890',
+                date_of_birth='1990-01-01', hire_date='2020-01-01',
+                license_number=f'D{number:09d}', license_type='regular',
+                license_expiration='2030-01-01', license_state='CA',
+                address_line1='123 Main St', city='Anytown', state='CA', zip_code='12345',
+                emergency_contact_name='Contact', emergency_contact_phone='+0987654321',
+                emergency_contact_relationship='Spouse'
+            )
+    
+    def search(self, text):
+        response = self.client.get(reverse('driver-list'), {'search': text})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['last_name'] for row in response.data['results']]
+    
+    def test_search(self):
+        self.assertEqual(sorted(self.search('mari')), ['Lopez', 'Rossi'])
+        self.assertEqual(self.search('maria lopez'), ['Lopez'])
+        self.assertEqual(self.search('mechanic'), ['Rossi'])
+        self.assertEqual(self.search('D000000002'), ['Rossi'])
+        self.assertEqual(self.search('Rosi'), ['Rossi'])
+    
+    def test_generated_driver_ids(self):
+        self.assertEqual(
+            sorted(Driver.objects.values_list('driver_id', flat=True)),
+            ['DRV-LOP-0001', 'DRV-ROS-0002']
+        )
+        Driver.objects.get(driver_id='DRV-ROS-0002').delete()
+        driver = Driver.objects.get(driver_id='DRV-LOP-0001')
+        driver.pk = None
+        driver.driver_id = ''
+        driver.last_name = 'Smith'
+        driver.email = 'smith@example.com'
+        driver.license_number = 'D000000003'
+        driver.save()
+        self.assertEqual(driver.driver_id, 'DRV-SMI-0003')
@@ -4,13 +4,14 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from authentication.permissions import DriverPermission
-from django.db.models import Q, Count
-from django.db import transaction
+from authentication.filters import ScopeFilterBackend
+from authentication.audit_middleware import AuditedViewSetMixin, set_audit_resource
+from django.db.models import Q, Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.http import HttpResponse
 from django.utils import timezone
 import csv
-import io
-from datetime import datetime, date, timedelta
+from datetime import date, timedelta
 from .models import Driver, DriverCertification, DriverAssetAssignment, DriverViolation
 from .serializers import (
     DriverSerializer,
@@ -22,18 +23,44 @@ from .serializers import (
     DriverAssetAssignmentCreateUpdateSerializer,
     DriverViolationSerializer
 )
+from .importers import import_drivers_csv
+from .search import DRIVER_SEARCH_INDEX
+from assets.fieldsets import ExpandableQueryMixin
+from assets.search import IndexedSearchFilter
+from jobs.runner import enqueue, should_run_in_background
+from jobs.serializers import BackgroundJobSerializer
 
 
-class DriverViewSet(viewsets.ModelViewSet):
-    queryset = Driver.objects.all().prefetch_related(
-        'certifications', 'asset_assignments__asset', 'violations'
-    )
+def related_count(model, **filters):
+    """Correlated count of a driver's related rows, 0 when there are none"""
+    rows = model.objects.filter(driver=OuterRef('pk'), **filters).order_by().values('driver')
+    return Coalesce(Subquery(rows.annotate(c=Count('pk')).values('c')), 0)
+
+
+class DriverViewSet(AuditedViewSetMixin, ExpandableQueryMixin, viewsets.ModelViewSet):
+    queryset = Driver.objects.all()
     permission_classes = [DriverPermission]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [ScopeFilterBackend, DjangoFilterBackend, filters.OrderingFilter, IndexedSearchFilter]
+    scope_fields = {'department': 'department', 'driver_id': 'driver_id'}
+    scope_view_all_permission = 'drivers.view_all'
     filterset_fields = ['employment_status', 'license_type', 'department', 'position']
-    search_fields = ['driver_id', 'first_name', 'last_name', 'email', 'license_number']
+    search_fields = DRIVER_SEARCH_INDEX.fields
+    search_index = DRIVER_SEARCH_INDEX
     ordering_fields = ['driver_id', 'first_name', 'last_name', 'hire_date', 'license_expiration', 'created_at']
     ordering = ['driver_id']
+    expansion_prefetch_related = {
+        'certifications': ['certifications'],
+        'asset_assignments': [
+            Prefetch(
+                'asset_assignments',
+                queryset=DriverAssetAssignment.objects.filter(
+                    status='active', unassigned_date__isnull=True
+                ).select_related('asset').order_by('priority', '-assigned_date'),
+                to_attr='active_assignments'
+            )
+        ],
+        'violations': ['violations'],
+    }
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -43,22 +70,32 @@ class DriverViewSet(viewsets.ModelViewSet):
         return DriverSerializer
     
     def get_queryset(self):
-        queryset = Driver.objects.all().prefetch_related(
-            'certifications', 'asset_assignments__asset', 'violations'
-        )
-        
-        # Custom filtering for advanced search
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(driver_id__icontains=search) |
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(license_number__icontains=search) |
-                Q(department__icontains=search) |
-                Q(position__icontains=search)
+        if self.action == 'list':
+            # One correlated count per relation: joining all three relations and
+            # counting distinct rows would multiply them per driver first
+            thirty_days_from_now = date.today() + timedelta(days=30)
+            queryset = Driver.objects.annotate(
+                certifications_count=related_count(DriverCertification),
+                expiring_certifications_count=related_count(
+                    DriverCertification,
+                    expiration_date__lte=thirty_days_from_now,
+                    expiration_date__gte=date.today()
+                ),
+                active_assignments_count=related_count(
+                    DriverAssetAssignment, status='active', unassigned_date__isnull=True
+                ),
+                violations_count=related_count(DriverViolation),
+            ).prefetch_related(
+                Prefetch(
+                    'asset_assignments',
+                    queryset=DriverAssetAssignment.objects.filter(
+                        status='active', unassigned_date__isnull=True
+                    ).select_related('asset'),
+                    to_attr='active_assignments'
+                )
             )
+        else:
+            queryset = self.expand_queryset(Driver.objects.all())
         
         # Filter by license expiration status
         license_status = self.request.query_params.get('license_status', None)
@@ -208,18 +245,16 @@ class DriverViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Delete old photo if it exists
-        if driver.profile_photo:
-            driver.profile_photo.delete(save=False)
-        
-        # Set new photo and save (this will trigger photo processing)
+        # Store the new photo; it is resized off-request (re-uploading the
+        # same photo is a no-op)
         driver.profile_photo = photo_file
         driver.save()
         
         # Return success response with photo URL
         return Response({
             'message': 'Photo uploaded successfully',
-            'photo': request.build_absolute_uri(driver.profile_photo.url) if driver.profile_photo else None
+            'photo': request.build_absolute_uri(driver.profile_photo.url) if driver.profile_photo else None,
+            'photo_status': driver.photo_status
         }, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['delete'])
@@ -270,104 +305,12 @@ class DriverViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Parse CSV
-        try:
-            decoded_file = csv_file.read().decode('utf-8')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            
-            # Validate required columns
-            required_columns = ['driver_id', 'first_name', 'last_name', 'email']
-            if reader.fieldnames:
-                missing_columns = set(required_columns) - set(reader.fieldnames)
-                if missing_columns:
-                    return Response(
-                        {'error': f'Missing required columns: {", ".join(missing_columns)}'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # Process each row
-            success_count = 0
-            error_count = 0
-            errors = []
-            
-            with transaction.atomic():
-                for row_num, row in enumerate(reader, start=2):
-                    try:
-                        # Map CSV fields to model fields
-                        driver_data = {
-                            'driver_id': row.get('driver_id', '').strip(),
-                            'first_name': row.get('first_name', '').strip(),
-                            'last_name': row.get('last_name', '').strip(),
-                            'email': row.get('email', '').strip(),
-                            'phone': row.get('phone', '').strip() if row.get('phone') else None,
-                            'license_number': row.get('license_number', '').strip() if row.get('license_number') else None,
-                            'license_type': row.get('license_type', 'regular').strip().lower(),
-                            'license_expiration': row.get('license_expiration', '').strip() if row.get('license_expiration') else None,
-                            'employment_status': row.get('employment_status', 'active').strip().lower(),
-                            'department': row.get('department', '').strip() if row.get('department') else None,
-                            'position': row.get('position', '').strip() if row.get('position') else None,
-                            'date_of_birth': row.get('date_of_birth', '').strip() if row.get('date_of_birth') else None,
-                            'hire_date': row.get('hire_date', '').strip() if row.get('hire_date') else None,
-                            'address': row.get('address', '').strip() if row.get('address') else None,
-                            'city': row.get('city', '').strip() if row.get('city') else None,
-                            'state': row.get('state', '').strip() if row.get('state') else None,
-                            'zip_code': row.get('zip_code', '').strip() if row.get('zip_code') else None,
-                            'notes': row.get('notes', '').strip() if row.get('notes') else None,
-                        }
-                        
-                        # Remove empty values
-                        driver_data = {k: v for k, v in driver_data.items() if v}
-                        
-                        # Convert date fields
-                        for date_field in ['license_expiration', 'date_of_birth', 'hire_date']:
-                            if date_field in driver_data and driver_data[date_field]:
-                                try:
-                                    driver_data[date_field] = datetime.strptime(driver_data[date_field], '%Y-%m-%d').date()
-                                except ValueError:
-                                    try:
-                                        driver_data[date_field] = datetime.strptime(driver_data[date_field], '%m/%d/%Y').date()
-                                    except ValueError:
-                                        del driver_data[date_field]
-                        
-                        # Check if driver already exists
-                        if Driver.objects.filter(driver_id=driver_data['driver_id']).exists():
-                            # Update existing driver
-                            Driver.objects.filter(driver_id=driver_data['driver_id']).update(**driver_data)
-                        else:
-                            # Create new driver
-                            Driver.objects.create(**driver_data)
-                        
-                        success_count += 1
-                        
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Row {row_num}: {str(e)}")
-                        
-                        # If too many errors, abort
-                        if error_count > 10:
-                            transaction.set_rollback(True)
-                            return Response(
-                                {
-                                    'error': 'Too many errors encountered',
-                                    'errors': errors[:10],
-                                    'processed': row_num - 1
-                                },
-                                status=status.HTTP_400_BAD_REQUEST
-                            )
-            
-            return Response({
-                'message': f'Import completed: {success_count} drivers imported/updated successfully',
-                'success_count': success_count,
-                'error_count': error_count,
-                'errors': errors[:10] if errors else []
-            })
-            
-        except Exception as e:
-            return Response(
-                {'error': f'Failed to process CSV file: {str(e)}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        set_audit_resource(request, 'drivers', resource_name=f'Bulk import: {csv_file.name}')
+        if should_run_in_background(request, csv_file):
+            job = enqueue('driver_import', user=request.user, upload=csv_file)
+            return Response(BackgroundJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        
+        return Response(*import_drivers_csv(csv_file))
     
     @action(detail=False, methods=['get'])
     def download_template(self, request):
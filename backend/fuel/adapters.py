@@ -0,0 +1,507 @@
+"""
+Provider file adapters for fuel transaction imports
+
+Each adapter describes one provider export format (column names, date
+formats, unit and product spellings, how rows map to assets) and turns a
+batch of raw CSV rows into unsaved FuelTransaction objects. Normalization
+runs column by column over the whole batch - every value of a column is
+converted in one pass, and lookups such as card -> asset are built once
+per import - instead of building and validating one dict per row.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .models import FuelTransaction, FuelCard, FuelSite
+
+
+class FuelFileAdapter:
+    """
+    Base adapter. Subclasses map provider headers to canonical fields in
+    `columns` and override the class attributes below as needed.
+    """
+
+    name = None
+    label = None
+    entry_source = 'csv_import'
+
+    # Provider header -> canonical field
+    columns = {}
+    required_columns = []
+    # Header whose presence identifies the format during auto-detection
+    signature_columns = []
+
+    date_formats = ['%Y-%m-%d']
+    time_formats = ['%H:%M:%S', '%H:%M']
+    default_unit = 'gal'
+    require_cost = True
+
+    # Lower-cased spellings seen in provider files -> canonical values
+    UNIT_ALIASES = {
+        'gal': 'gal', 'gals': 'gal', 'gallon': 'gal', 'gallons': 'gal', 'g': 'gal', 'gl': 'gal',
+        'l': 'L', 'ltr': 'L', 'liter': 'L', 'liters': 'L', 'litre': 'L', 'litres': 'L',
+        'kwh': 'kWh', 'kw-h': 'kWh', 'kilowatt hours': 'kWh',
+    }
+    PRODUCT_ALIASES = {
+        'unl': 'gasoline', 'unleaded': 'gasoline', 'regular': 'gasoline', 'reg': 'gasoline',
+        'plus': 'gasoline', 'midgrade': 'gasoline', 'premium': 'gasoline', 'prem': 'gasoline',
+        'gas': 'gasoline', 'e85': 'gasoline',
+        'dsl': 'diesel', 'ulsd': 'diesel', 'diesel #2': 'diesel', '#2 diesel': 'diesel',
+        'biodiesel': 'diesel', 'b20': 'diesel', 'clear diesel': 'diesel',
+        'diesel exhaust fluid': 'def',
+        'electric': 'electricity', 'ev': 'electricity', 'ev charging': 'electricity',
+    }
+
+    def __init__(self):
+        self._fields = {
+            name: FuelTransaction._meta.get_field(name)
+            for name in ['volume', 'unit_price', 'total_cost', 'odometer', 'engine_hours',
+                         'vendor', 'location_label', 'payment_ref']
+        }
+        self._units = dict(self.UNIT_ALIASES)
+        self._units.update({unit.lower(): unit for unit in FuelTransaction.UNITS_PER_GALLON})
+        self._products = dict(self.PRODUCT_ALIASES)
+        self._products.update({product: product for product, _ in FuelTransaction.PRODUCT_TYPE_CHOICES})
+
+    @property
+    def optional_columns(self):
+        return [col for col in self.columns if col not in self.required_columns]
+
+    @classmethod
+    def matches(cls, fieldnames):
+        """Whether a header row looks like this provider's export"""
+        fieldnames = set(fieldnames or [])
+        return bool(cls.signature_columns) and set(cls.signature_columns) <= fieldnames
+
+    # Column helpers
+
+    def extract_columns(self, rows):
+        """Transpose a batch of rows into {field: [stripped values]}"""
+        extracted = {}
+        for header, field in self.columns.items():
+            extracted[field] = [(row.get(header) or '').strip() for row in rows]
+        return extracted
+
+    @staticmethod
+    def convert(values, errors, func):
+        """
+        Apply func over a column, skipping rows that already failed.
+        A ValueError marks the row invalid with its message.
+        """
+        converted = [None] * len(values)
+        for i, value in enumerate(values):
+            if errors[i] is not None:
+                continue
+            try:
+                converted[i] = func(value)
+            except ValueError as e:
+                errors[i] = str(e)
+        return converted
+
+    def _clean(self, name, value):
+        """Run the model field's own validators on a value"""
+        try:
+            return self._fields[name].clean(value, None)
+        except ValidationError as e:
+            raise ValueError(f'{name}: {"; ".join(e.messages)}')
+
+    def _decimal_column(self, values, errors, name, label, required=False):
+        def parse(value):
+            if not value:
+                if required:
+                    value = '0'
+                else:
+                    return None
+            try:
+                number = Decimal(value.replace(',', '').replace('$', ''))
+            except InvalidOperation:
+                raise ValueError(f'Invalid {label}: {value!r}')
+            return self._clean(name, number)
+        return self.convert(values, errors, parse)
+
+    def _text_column(self, values, errors, name):
+        return self.convert(values, errors, lambda value: self._clean(name, value))
+
+    @staticmethod
+    def _detect_format(values, formats):
+        """Pick the first format that parses the first non-empty value"""
+        sample = next((value for value in values if value), None)
+        if sample is not None:
+            for fmt in formats:
+                try:
+                    datetime.strptime(sample, fmt)
+                    return fmt
+                except ValueError:
+                    continue
+        return formats[0]
+
+    # Normalization steps, run in the order errors should be reported
+
+    def resolve_assets(self, columns, errors, context):
+        asset_map = context.asset_map
+        asset_codes = columns.get('asset', [''] * len(errors))
+
+        def lookup(code):
+            asset_pk = asset_map.get(code)
+            if asset_pk is None:
+                raise ValueError(f"Asset '{code}' does not exist")
+            return asset_pk
+        return self.convert(asset_codes, errors, lookup)
+
+    def parse_timestamps(self, columns, errors):
+        dates = columns.get('date', [''] * len(errors))
+        times = columns.get('time')
+        if times is not None:
+            time_format = self._detect_format(times, self.time_formats)
+            dates = [f'{d} {t}' if t else d for d, t in zip(dates, times)]
+            formats = [f'{fmt} {time_format}' for fmt in self.date_formats] + self.date_formats
+        else:
+            formats = self.date_formats
+
+        # Detect the format once for the column; only values that don't
+        # match it fall back to trying the others
+        primary = self._detect_format(dates, formats)
+        latest = timezone.now() + timedelta(days=1)
+
+        def parse(value):
+            try:
+                parsed = datetime.strptime(value, primary)
+            except ValueError:
+                for fmt in formats:
+                    try:
+                        parsed = datetime.strptime(value, fmt)
+                        break
+                    except ValueError:
+                        continue
+                else:
+                    raise ValueError(self.date_error(value))
+            parsed = timezone.make_aware(parsed)
+            if parsed > latest:
+                raise ValueError('Transaction timestamp cannot be more than 1 day in the future.')
+            return parsed
+        return self.convert(dates, errors, parse)
+
+    def date_error(self, value):
+        return f'Invalid date: {value!r}'
+
+    def normalize_products(self, columns, errors):
+        def normalize(value):
+            product = self._products.get(value.lower())
+            if product is None:
+                raise ValueError(f'Invalid product type: {value.lower()!r}')
+            return product
+        return self.convert(columns.get('product_type', [''] * len(errors)), errors, normalize)
+
+    def normalize_units(self, columns, errors):
+        def normalize(value):
+            unit = self._units.get((value or self.default_unit).lower())
+            if unit is None:
+                raise ValueError(f'Invalid unit: {value!r}')
+            return unit
+        return self.convert(columns.get('unit', [''] * len(errors)), errors, normalize)
+
+    def parse_volumes(self, columns, errors):
+        volumes = self._decimal_column(columns.get('volume', [''] * len(errors)),
+                                       errors, 'volume', 'volume', required=True)
+        for i, volume in enumerate(volumes):
+            if errors[i] is None and volume <= 0:
+                errors[i] = 'Volume must be greater than zero.'
+        return volumes
+
+    def parse_costs(self, columns, errors, volumes):
+        n = len(errors)
+        totals = self._decimal_column(columns.get('total_cost', [''] * n), errors,
+                                      'total_cost', 'total cost')
+        prices = self._decimal_column(columns.get('unit_price', [''] * n), errors,
+                                      'unit_price', 'unit price')
+
+        for i in range(n):
+            if errors[i] is not None:
+                continue
+            if not totals[i] and prices[i]:
+                totals[i] = (volumes[i] * prices[i]).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if self.require_cost and not totals[i]:
+                errors[i] = 'Either unit_price or total_cost must be provided.'
+        return totals, prices
+
+    def parse_odometers(self, columns, errors):
+        odometers = self._decimal_column(columns.get('odometer', [''] * len(errors)),
+                                         errors, 'odometer', 'odometer')
+        for i, odometer in enumerate(odometers):
+            if errors[i] is not None or odometer is None:
+                continue
+            if odometer < 0:
+                errors[i] = 'Odometer reading cannot be negative.'
+            elif odometer > 1000000:
+                errors[i] = 'Odometer reading seems unreasonably high.'
+        return odometers
+
+    def location_values(self, columns, n):
+        """Location label; adapters with split address columns join them"""
+        return columns.get('location_label', [''] * n)
+
+    def resolve_sites(self, columns, errors, context):
+        return [None] * len(errors)
+
+    def parse_rows(self, rows, context):
+        """
+        Normalize a batch of raw rows. Returns a list aligned with rows of
+        either an unsaved FuelTransaction or an error message string.
+        `context` is the running importer (asset map, user).
+        """
+        n = len(rows)
+        errors = [None] * n
+        columns = self.extract_columns(rows)
+
+        asset_ids = self.resolve_assets(columns, errors, context)
+        timestamps = self.parse_timestamps(columns, errors)
+        products = self.normalize_products(columns, errors)
+        units = self.normalize_units(columns, errors)
+        volumes = self.parse_volumes(columns, errors)
+        totals, prices = self.parse_costs(columns, errors, volumes)
+        odometers = self.parse_odometers(columns, errors)
+        engine_hours = self._decimal_column(columns.get('engine_hours', [''] * n), errors,
+                                            'engine_hours', 'engine hours')
+        vendors = self._text_column(columns.get('vendor', [''] * n), errors, 'vendor')
+        locations = self._text_column(self.location_values(columns, n), errors, 'location_label')
+        payment_refs = self._text_column(columns.get('payment_ref', [''] * n), errors, 'payment_ref')
+        sites = self.resolve_sites(columns, errors, context)
+
+        created_by = context.user if context.user and context.user.is_authenticated else None
+        results = []
+        for i in range(n):
+            if errors[i] is not None:
+                results.append(errors[i])
+                continue
+            results.append(FuelTransaction(
+                asset_id=asset_ids[i],
+                timestamp=timestamps[i],
+                product_type=products[i],
+                volume=volumes[i],
+                unit=units[i],
+                unit_price=prices[i],
+                total_cost=totals[i],
+                odometer=odometers[i],
+                engine_hours=engine_hours[i],
+                vendor=vendors[i],
+                location_label=locations[i],
+                payment_ref=payment_refs[i] or None,
+                fuel_site_id=sites[i],
+                entry_source=self.entry_source,
+                created_by=created_by,
+            ))
+        return results
+
+
+class GenericCSVAdapter(FuelFileAdapter):
+    """The fleet's own fixed-column CSV template"""
+
+    name = 'generic'
+    label = 'Generic CSV'
+    columns = {
+        'Asset ID': 'asset',
+        'Date': 'date',
+        'Product Type': 'product_type',
+        'Volume': 'volume',
+        'Unit': 'unit',
+        'Total Cost': 'total_cost',
+        'Odometer': 'odometer',
+        'Vendor': 'vendor',
+        'Location': 'location_label'
+    }
+    required_columns = ['Asset ID', 'Date', 'Product Type', 'Volume']
+    signature_columns = ['Asset ID', 'Product Type']
+
+    def date_error(self, value):
+        return f'Invalid date: {value!r} (expected YYYY-MM-DD)'
+
+
+class FuelCardAdapter(FuelFileAdapter):
+    """
+    Base for fuel card exports. Rows are matched to assets through the
+    FuelCard table (external id first, then a unique last-4), falling back
+    to the vehicle number column matched against asset_id.
+    """
+
+    entry_source = 'fuel_card'
+    date_formats = ['%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d']
+
+    def __init__(self):
+        super().__init__()
+        self._card_map = None
+
+    @property
+    def card_map(self):
+        """(external_id map, last4 map) for this provider, loaded once"""
+        if self._card_map is None:
+            by_external_id = {}
+            by_last4 = {}
+            cards = FuelCard.objects.filter(
+                provider=self.name, assigned_asset__isnull=False
+            ).values_list('external_id', 'card_last4', 'assigned_asset_id')
+            for external_id, last4, asset_pk in cards:
+                by_external_id[external_id] = asset_pk
+                # A last-4 shared by two cards can't identify a vehicle
+                by_last4[last4] = asset_pk if last4 not in by_last4 else None
+            self._card_map = (by_external_id, by_last4)
+        return self._card_map
+
+    def resolve_assets(self, columns, errors, context):
+        by_external_id, by_last4 = self.card_map
+        asset_map = context.asset_map
+        n = len(errors)
+        cards = columns.get('card', [''] * n)
+        vehicles = columns.get('asset', [''] * n)
+
+        asset_ids = [None] * n
+        for i in range(n):
+            card, vehicle = cards[i], vehicles[i]
+            digits = ''.join(ch for ch in card if ch.isdigit())
+            asset_pk = by_external_id.get(card) or (by_last4.get(digits[-4:]) if len(digits) >= 4 else None)
+            if asset_pk is None and vehicle:
+                asset_pk = asset_map.get(vehicle)
+            if asset_pk is None:
+                errors[i] = (f"Asset '{vehicle}' does not exist" if vehicle
+                             else f"No asset assigned to card '{card}'")
+            asset_ids[i] = asset_pk
+        return asset_ids
+
+
+class WEXAdapter(FuelCardAdapter):
+    """WEX fleet card transaction detail export"""
+
+    name = 'wex'
+    label = 'WEX'
+    columns = {
+        'Transaction Date': 'date',
+        'Transaction Time': 'time',
+        'Card Number': 'card',
+        'Custom Vehicle/Asset ID': 'asset',
+        'Product Description': 'product_type',
+        'Units': 'volume',
+        'Unit of Measure': 'unit',
+        'Unit Cost': 'unit_price',
+        'Total Fuel Cost': 'total_cost',
+        'Current Odometer': 'odometer',
+        'Merchant Name': 'vendor',
+        'Merchant City': 'city',
+        'Merchant State': 'state',
+        'Transaction Number': 'payment_ref',
+    }
+    required_columns = ['Transaction Date', 'Card Number', 'Product Description', 'Units']
+    signature_columns = ['Card Number', 'Product Description', 'Units']
+
+    def location_values(self, columns, n):
+        cities = columns.get('city', [''] * n)
+        states = columns.get('state', [''] * n)
+        return [', '.join(part for part in (city, state) if part) for city, state in zip(cities, states)]
+
+
+class VoyagerAdapter(FuelCardAdapter):
+    """Voyager fleet card transaction export"""
+
+    name = 'voyager'
+    label = 'Voyager'
+    date_formats = ['%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S']
+    columns = {
+        'Transaction Date': 'date',
+        'Card Number': 'card',
+        'Vehicle Number': 'asset',
+        'Product': 'product_type',
+        'Quantity': 'volume',
+        'UOM': 'unit',
+        'Price Per Unit': 'unit_price',
+        'Total Amount': 'total_cost',
+        'Odometer': 'odometer',
+        'Merchant Name': 'vendor',
+        'Merchant Address': 'location_label',
+        'Authorization Number': 'payment_ref',
+    }
+    required_columns = ['Transaction Date', 'Card Number', 'Product', 'Quantity']
+    signature_columns = ['Card Number', 'Vehicle Number', 'Quantity']
+
+
+class FuelMasterAdapter(FuelFileAdapter):
+    """
+    FuelMaster tank controller transaction log for on-site fuel sites.
+    Dispenses carry no price, and rows are tied to the FuelSite whose
+    external_id (or name) matches the Site column.
+    """
+
+    name = 'fuelmaster'
+    label = 'FuelMaster'
+    entry_source = 'tank_controller'
+    require_cost = False
+    date_formats = ['%m/%d/%Y', '%Y-%m-%d']
+    columns = {
+        'Transaction': 'payment_ref',
+        'Date': 'date',
+        'Time': 'time',
+        'Vehicle': 'asset',
+        'Product': 'product_type',
+        'Quantity': 'volume',
+        'Odometer': 'odometer',
+        'Hours': 'engine_hours',
+        'Cost': 'total_cost',
+        'Site': 'site',
+    }
+    required_columns = ['Date', 'Vehicle', 'Product', 'Quantity']
+    signature_columns = ['Vehicle', 'Quantity', 'Site']
+
+    def __init__(self):
+        super().__init__()
+        self._site_map = None
+
+    @property
+    def site_map(self):
+        """On-site FuelSite pks keyed by external_id and name, loaded once"""
+        if self._site_map is None:
+            self._site_map = {}
+            sites = FuelSite.objects.filter(site_type='onsite').values_list('id', 'name', 'external_id')
+            for pk, name, external_id in sites:
+                self._site_map.setdefault(name, pk)
+                if external_id:
+                    self._site_map[external_id] = pk
+        return self._site_map
+
+    def resolve_sites(self, columns, errors, context):
+        """
+        Site codes -> on-site FuelSite pks. An unknown code fails the row:
+        imported without a site, the dispense would never be reconciled
+        against the site's tanks.
+        """
+        codes = columns.get('site', [''] * len(errors))
+        if not any(codes):
+            return [None] * len(errors)
+
+        def lookup(code):
+            if not code:
+                return None
+            if code not in self.site_map:
+                raise ValueError(f"Fuel site '{code}' does not exist")
+            return self.site_map[code]
+        return self.convert(codes, errors, lookup)
+
+
+ADAPTERS = {
+    adapter.name: adapter
+    for adapter in [GenericCSVAdapter, WEXAdapter, VoyagerAdapter, FuelMasterAdapter]
+}
+
+
+def get_adapter(name):
+    """Instantiate the adapter registered under name"""
+    try:
+        return ADAPTERS[name]()
+    except KeyError:
+        raise ValueError(f'Unknown provider format: {name!r}')
+
+
+def detect_adapter(fieldnames):
+    """Pick the adapter whose signature columns appear in the header"""
+    for adapter in ADAPTERS.values():
+        if adapter.matches(fieldnames):
+            return adapter()
+    return GenericCSVAdapter()
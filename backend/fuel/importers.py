@@ -0,0 +1,373 @@
+"""
+Streaming CSV import for fuel transactions
+"""
+from decimal import Decimal
+import codecs
+import csv
+
+from django.db import IntegrityError, transaction
+
+from assets.models import Asset
+from .adapters import detect_adapter
+from .inventory import reconcile_sites
+from .models import FuelTransaction
+
+
+class FuelCSVImporter:
+    """
+    Import fuel transactions from an uploaded CSV file.
+
+    The upload is read as a text stream one line at a time, assets are
+    resolved through a preloaded asset_id -> pk map, and valid rows are
+    inserted with bulk_create in chunks, each inside its own transaction.
+    Memory use stays flat regardless of the size of the provider file.
+
+    Rows matching the unique_fuel_transaction constraint (asset, timestamp,
+    volume, total_cost) - either already in the database or earlier in the
+    same file - are reported as duplicates and skipped, so re-running an
+    import is idempotent.
+
+    Rows are parsed by a provider adapter (see fuel.adapters) one chunk at
+    a time; when none is given it is picked from the file's header row.
+    """
+
+    DEFAULT_CHUNK_SIZE = 500
+    DEFAULT_SAMPLE_SIZE = 1000
+    SAMPLE_ROWS_RETURNED = 5
+    MAX_REPORTED_ERRORS = 100
+
+    def __init__(self, csv_file, user=None, chunk_size=None, sample_size=None,
+                 progress_callback=None, adapter=None):
+        self.csv_file = csv_file
+        self.user = user
+        self.adapter = adapter
+        self.chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        self.sample_size = sample_size or self.DEFAULT_SAMPLE_SIZE
+        self.progress_callback = progress_callback
+
+        self.file_size = getattr(csv_file, 'size', None) or 0
+        self.bytes_read = 0
+        self.header_bytes = 0
+        self.processed_rows = 0
+        self.imported_rows = 0
+        self.invalid_rows = 0
+        self.duplicates = 0
+        self.chunks = 0
+        self.errors = {}
+        self.warnings = {}
+        self.sample_valid = []
+        self.sample_invalid = []
+
+        self.site_ids = set()
+        self.tank_results = []
+
+        self._asset_map = None
+        self._asset_codes = None
+        self._readings = {}
+        self._seen_keys = set()
+
+    def _iter_lines(self):
+        """Yield decoded lines from the upload, tracking bytes consumed"""
+        decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        if hasattr(self.csv_file, 'seek'):
+            self.csv_file.seek(0)
+        for line in self.csv_file:
+            self.bytes_read += len(line)
+            yield decoder.decode(line)
+
+    def iter_rows(self):
+        """Yield (row_number, row) pairs from the CSV stream"""
+        reader = csv.DictReader(self._iter_lines())
+        if reader.fieldnames is None:
+            raise ValueError('CSV file is empty')
+
+        if self.adapter is None:
+            self.adapter = detect_adapter(reader.fieldnames)
+
+        missing = [col for col in self.adapter.required_columns if col not in reader.fieldnames]
+        if missing:
+            raise ValueError(f'Missing required columns: {", ".join(missing)}')
+        self.header_bytes = self.bytes_read
+
+        for row_num, row in enumerate(reader, 1):
+            yield row_num, row
+
+    @property
+    def asset_map(self):
+        """Map of asset_id -> primary key, loaded once per import"""
+        if self._asset_map is None:
+            self._asset_map = dict(Asset.objects.values_list('asset_id', 'id'))
+        return self._asset_map
+
+    @property
+    def asset_codes(self):
+        """Reverse of asset_map, for reporting"""
+        if self._asset_codes is None:
+            self._asset_codes = {pk: code for code, pk in self.asset_map.items()}
+        return self._asset_codes
+
+    def parse_batch(self, batch):
+        """
+        Normalize a batch of (row_number, row) pairs through the adapter.
+        Returns (row_number, row, transaction) for valid rows and records
+        errors for the rest.
+        """
+        parsed = []
+        results = self.adapter.parse_rows([row for _, row in batch], self)
+        for (row_num, row), result in zip(batch, results):
+            if isinstance(result, str):
+                self._record_error(row_num, row, result)
+            else:
+                parsed.append((row_num, row, result))
+        return parsed
+
+    def _record_error(self, row_num, row, message):
+        self.invalid_rows += 1
+        if len(self.errors) < self.MAX_REPORTED_ERRORS:
+            self.errors[row_num] = message
+        if len(self.sample_invalid) < self.SAMPLE_ROWS_RETURNED:
+            self.sample_invalid.append(row)
+
+    def _sample(self, txn):
+        if len(self.sample_valid) < self.SAMPLE_ROWS_RETURNED:
+            self.sample_valid.append({
+                'asset': txn.asset_id,
+                'asset_id': self.asset_codes.get(txn.asset_id),
+                'timestamp': txn.timestamp,
+                'product_type': txn.product_type,
+                'volume': txn.volume,
+                'unit': txn.unit,
+                'total_cost': txn.total_cost,
+                'odometer': txn.odometer,
+                'vendor': txn.vendor,
+                'location_label': txn.location_label,
+                'entry_source': txn.entry_source,
+            })
+
+    @staticmethod
+    def _stored_decimal(field_name, value):
+        """value rounded the way the field stores it, so file and database values compare equal"""
+        if value is None:
+            return None
+        places = FuelTransaction._meta.get_field(field_name).decimal_places
+        return Decimal(value).quantize(Decimal(1).scaleb(-places))
+
+    @classmethod
+    def transaction_key(cls, asset_pk, timestamp, volume, total_cost):
+        """The unique_fuel_transaction fields, as stored"""
+        return (
+            str(asset_pk), timestamp,
+            cls._stored_decimal('volume', volume), cls._stored_decimal('total_cost', total_cost)
+        )
+
+    def _existing_keys(self, transactions):
+        """Keys of stored transactions overlapping these assets and dates, in one query"""
+        if not transactions:
+            return set()
+        timestamps = [txn.timestamp for txn in transactions]
+        existing = FuelTransaction.objects.filter(
+            asset_id__in={txn.asset_id for txn in transactions},
+            timestamp__gte=min(timestamps),
+            timestamp__lte=max(timestamps)
+        ).values_list('asset_id', 'timestamp', 'volume', 'total_cost')
+        return {self.transaction_key(*values) for values in existing.iterator()}
+
+    def _is_stored(self, txn):
+        return FuelTransaction.objects.filter(
+            asset_id=txn.asset_id, timestamp=txn.timestamp, volume=txn.volume, total_cost=txn.total_cost
+        ).exists()
+
+    def _skip_duplicates(self, chunk):
+        """Drop rows that already exist in the database or earlier in the file"""
+        existing = self._existing_keys([txn for _, _, txn in chunk])
+        unique = []
+        for row_num, row, txn in chunk:
+            key = self.transaction_key(txn.asset_id, txn.timestamp, txn.volume, txn.total_cost)
+            if key in existing or key in self._seen_keys:
+                self.duplicates += 1
+                if len(self.warnings) < self.MAX_REPORTED_ERRORS:
+                    self.warnings[row_num] = 'Duplicate transaction skipped'
+                continue
+            self._seen_keys.add(key)
+            unique.append((row_num, row, txn))
+        return unique
+
+    def _load_readings(self, asset_pk, timestamp):
+        """Fetch the latest odometer/engine-hour readings before timestamp"""
+        previous = FuelTransaction.objects.filter(asset_id=asset_pk, timestamp__lt=timestamp)
+        return {
+            'odometer': previous.filter(odometer__isnull=False).order_by('-timestamp')
+                                .values_list('odometer', flat=True).first(),
+            'engine_hours': previous.filter(engine_hours__isnull=False).order_by('-timestamp')
+                                    .values_list('engine_hours', flat=True).first(),
+        }
+
+    def _apply_derived_fields(self, transactions):
+        """
+        Fill in pricing and efficiency metrics the way FuelTransaction.save()
+        would. Previous readings are tracked per asset as the file is walked,
+        so the database is consulted once per asset rather than once per row
+        (and again only if the file goes back in time for that asset).
+        """
+        transactions.sort(key=lambda txn: (str(txn.asset_id), txn.timestamp))
+        for txn in transactions:
+            txn._calculate_pricing()
+
+            # 'before' holds readings strictly earlier than 'timestamp',
+            # 'through' also includes rows at 'timestamp' seen so far
+            state = self._readings.get(txn.asset_id)
+            if state is None or txn.timestamp < state['timestamp']:
+                before = self._load_readings(txn.asset_id, txn.timestamp)
+                state = {'timestamp': txn.timestamp, 'before': before, 'through': dict(before)}
+            elif txn.timestamp > state['timestamp']:
+                state = {
+                    'timestamp': txn.timestamp,
+                    'before': state['through'],
+                    'through': dict(state['through']),
+                }
+
+            txn.apply_efficiency_metrics(
+                previous_odometer=state['before']['odometer'],
+                previous_engine_hours=state['before']['engine_hours']
+            )
+
+            if txn.odometer:
+                state['through']['odometer'] = txn.odometer
+            if txn.engine_hours:
+                state['through']['engine_hours'] = txn.engine_hours
+            self._readings[txn.asset_id] = state
+
+    def _insert_chunk(self, chunk):
+        """Insert a chunk of (row_num, row, transaction) in one transaction"""
+        chunk = self._skip_duplicates(chunk)
+        transactions = [txn for _, _, txn in chunk]
+        self._apply_derived_fields(transactions)
+
+        try:
+            with transaction.atomic():
+                FuelTransaction.objects.bulk_create(transactions, batch_size=self.chunk_size)
+            self.imported_rows += len(transactions)
+            self.site_ids.update(txn.fuel_site_id for txn in transactions if txn.fuel_site_id)
+        except IntegrityError:
+            # Fall back to row-by-row inserts so one bad row doesn't sink the
+            # chunk; rows committed concurrently since the duplicate check ran
+            # are reported as duplicates
+            for row_num, row, txn in chunk:
+                try:
+                    with transaction.atomic():
+                        txn.save(force_insert=True)
+                    self.imported_rows += 1
+                    if txn.fuel_site_id:
+                        self.site_ids.add(txn.fuel_site_id)
+                except IntegrityError as e:
+                    if self._is_stored(txn):
+                        self.duplicates += 1
+                        if len(self.warnings) < self.MAX_REPORTED_ERRORS:
+                            self.warnings[row_num] = 'Duplicate transaction skipped'
+                    else:
+                        self._record_error(row_num, row, str(e))
+
+        self.chunks += 1
+        self._report_progress()
+
+    def _process_batch(self, batch):
+        chunk = self.parse_batch(batch)
+        if chunk:
+            self._insert_chunk(chunk)
+        else:
+            self._report_progress()
+
+    def _report_progress(self):
+        if self.progress_callback:
+            self.progress_callback(self.progress())
+
+    def progress(self):
+        """Current progress snapshot"""
+        percent = None
+        if self.file_size:
+            percent = min(100, round(self.bytes_read * 100 / self.file_size, 1))
+        return {
+            'processed_rows': self.processed_rows,
+            'imported_rows': self.imported_rows,
+            'invalid_rows': self.invalid_rows,
+            'duplicates': self.duplicates,
+            'chunks': self.chunks,
+            'percent': percent,
+        }
+
+    def run(self):
+        """Validate and insert every row in the file"""
+        batch = []
+        for row_num, row in self.iter_rows():
+            self.processed_rows += 1
+            batch.append((row_num, row))
+            if len(batch) >= self.chunk_size:
+                self._process_batch(batch)
+                batch = []
+
+        if batch:
+            self._process_batch(batch)
+
+        # Fold the new dispenses into on-site tank inventory
+        if self.site_ids:
+            self.tank_results = reconcile_sites(self.site_ids)
+
+        message = f'Imported {self.imported_rows} transactions successfully'
+        if self.duplicates:
+            message += f' ({self.duplicates} duplicates skipped)'
+
+        return {
+            'message': message,
+            'total_rows': self.processed_rows,
+            'valid_rows': self.imported_rows,
+            'invalid_rows': self.invalid_rows,
+            'duplicates': self.duplicates,
+            'chunks': self.chunks,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'tanks_reconciled': len(self.tank_results),
+            'variance_alerts': sum(result['variance_alerts'] for result in self.tank_results),
+        }
+
+    def preview(self):
+        """
+        Validate a sample of the file without writing anything.
+        Stops after sample_size rows and extrapolates the row count from
+        the share of the file that was read.
+        """
+        batch = []
+        sampled_bytes = 0
+        truncated = False
+        for row_num, row in self.iter_rows():
+            if self.processed_rows >= self.sample_size:
+                truncated = True
+                break
+            self.processed_rows += 1
+            sampled_bytes = self.bytes_read - self.header_bytes
+            batch.append((row_num, row))
+
+        unique = self._skip_duplicates(self.parse_batch(batch))
+        for _, _, txn in unique:
+            self._sample(txn)
+
+        total_rows = self.processed_rows
+        if truncated and sampled_bytes and self.file_size:
+            data_bytes = self.file_size - self.header_bytes
+            total_rows = round(self.processed_rows * data_bytes / sampled_bytes)
+
+        return {
+            'total_rows': total_rows,
+            'sampled_rows': self.processed_rows,
+            'is_estimate': truncated,
+            'valid_rows': len(unique),
+            'invalid_rows': self.invalid_rows,
+            'duplicates': self.duplicates,
+            'sample_valid': self.sample_valid,
+            'sample_invalid': self.sample_invalid,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'provider': self.adapter.name,
+            'column_mapping': self.adapter.columns,
+            'required_columns': self.adapter.required_columns,
+            'optional_columns': self.adapter.optional_columns,
+        }
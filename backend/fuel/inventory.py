@@ -0,0 +1,241 @@
+"""
+Tank inventory reconciliation for on-site fuel sites
+
+Each FuelTank keeps a running dispensed total and a watermark (the
+created_at of the last FuelTransaction folded in), so a reconcile pass only
+reads transactions inserted since the previous pass. created_at is assigned
+before a row commits, so a row can become visible after a pass has moved the
+watermark past it (chunked imports commit chunk by chunk). Each pass
+therefore re-reads the WATERMARK_LAG before the watermark and skips the rows
+it already counted there (FuelTank.recently_counted). Periods run between
+consecutive tank readings:
+
+    expected = opening reading + deliveries - dispensed
+    variance = closing reading - expected
+
+Only periods that are new, or that a back-dated transaction, delivery or
+reading has touched, are recomputed. The watermark only sees inserts; after
+transactions are edited or deleted, reconcile with rebuild=True.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import FuelTransaction, FuelTank, FuelAlert, TankReconciliation
+
+
+# Longest a transaction may take to commit after its created_at and still be
+# counted by the incremental passes
+WATERMARK_LAG = timedelta(minutes=15)
+
+
+def dispensed_transactions(tank):
+    """Transactions drawn from this tank (matched by site and product)"""
+    return FuelTransaction.objects.filter(fuel_site_id=tank.site_id, product_type=tank.product_type)
+
+
+def _dispensed_between(tank, start, end):
+    """Volume dispensed in (start, end], in tank units"""
+    totals = dispensed_transactions(tank).filter(
+        timestamp__gt=start, timestamp__lte=end
+    ).values('unit').annotate(total=Sum('volume')).values_list('unit', 'total')
+    return sum((tank.from_transaction_volume(total, unit) for unit, total in totals), Decimal('0'))
+
+
+def _delivered_between(tank, start, end):
+    total = tank.deliveries.filter(
+        delivered_at__gt=start, delivered_at__lte=end
+    ).aggregate(total=Sum('volume'))['total']
+    return total or Decimal('0')
+
+
+def _sync_alert(tank, reconciliation):
+    """Raise an alert for an out-of-tolerance period, or clear a stale one"""
+    alert = reconciliation.alert
+    if reconciliation.within_tolerance:
+        if alert and alert.status in ('open', 'acknowledged'):
+            alert.status = 'resolved'
+            alert.resolved_at = timezone.now()
+            alert.resolution_notes = 'Variance back within tolerance after recomputation'
+            alert.save()
+        return False
+
+    loss = reconciliation.variance < 0
+    severity = 'high' if abs(reconciliation.variance) > 2 * reconciliation.tolerance else 'medium'
+    description = (
+        f"{tank.name} at {tank.site.name}: measured {reconciliation.closing_volume} {tank.unit}, "
+        f"expected {reconciliation.expected_volume.quantize(Decimal('0.1'))} {tank.unit} "
+        f"({reconciliation.period_start:%Y-%m-%d %H:%M} to {reconciliation.period_end:%Y-%m-%d %H:%M}). "
+        f"Variance {reconciliation.variance.quantize(Decimal('0.1')):+} {tank.unit} exceeds tolerance of "
+        f"{reconciliation.tolerance.quantize(Decimal('0.1'))} {tank.unit}."
+    )
+
+    # Update the period's open alert in place; a closed one gets a fresh alert
+    if alert is None or alert.status not in ('open', 'acknowledged'):
+        alert = FuelAlert(alert_type='inventory_variance', fuel_site=tank.site)
+    alert.severity = severity
+    alert.title = f"Tank {'loss' if loss else 'gain'}: {tank.name}"
+    alert.description = description
+    alert.threshold_value = reconciliation.tolerance.quantize(Decimal('0.01'))
+    alert.actual_value = reconciliation.variance.quantize(Decimal('0.01'))
+    alert.save()
+
+    if reconciliation.alert_id != alert.id:
+        reconciliation.alert = alert
+        reconciliation.save(update_fields=['alert'])
+    return True
+
+
+def _reconcile_period(tank, opening, closing):
+    delivered = _delivered_between(tank, opening.reading_time, closing.reading_time)
+    dispensed = _dispensed_between(tank, opening.reading_time, closing.reading_time)
+    expected = opening.volume + delivered - dispensed
+    variance = closing.volume - expected
+    tolerance = tank.tolerance_volume + dispensed * tank.tolerance_percent / 100
+
+    reconciliation, _ = TankReconciliation.objects.update_or_create(
+        tank=tank,
+        period_end=closing.reading_time,
+        defaults={
+            'period_start': opening.reading_time,
+            'opening_volume': opening.volume,
+            'delivered': delivered,
+            'dispensed': dispensed,
+            'expected_volume': expected,
+            'closing_volume': closing.volume,
+            'variance': variance,
+            'variance_percent': (variance * 100 / dispensed).quantize(Decimal('0.01')) if dispensed else None,
+            'tolerance': tolerance,
+            'within_tolerance': abs(variance) <= tolerance,
+        }
+    )
+    return reconciliation
+
+
+def reconcile_tank(tank, rebuild=False):
+    """
+    Bring one tank's running total and period reconciliations up to date.
+    rebuild=True recounts every transaction and recomputes every period.
+    Returns a summary of what changed.
+    """
+    with transaction.atomic():
+        tank = FuelTank.objects.select_for_update().select_related('site').get(pk=tank.pk)
+        previous_alerts = {}
+        if rebuild:
+            tank.dispensed_total = Decimal('0')
+            tank.transactions_counted_through = None
+            tank.recently_counted = []
+            # Recomputed periods take over their alerts instead of raising duplicates
+            previous_alerts = dict(
+                tank.reconciliations.filter(alert__isnull=False).values_list('period_end', 'alert_id')
+            )
+            tank.reconciliations.all().delete()
+        dirty_since = tank.recompute_from
+        watermark = tank.transactions_counted_through
+        already_counted = set(tank.recently_counted)
+
+        # Fold in transactions inserted since the last pass
+        candidates = dispensed_transactions(tank)
+        if watermark:
+            candidates = candidates.filter(created_at__gt=watermark - WATERMARK_LAG)
+
+        added = Decimal('0')
+        counted = 0
+        window = []
+        for pk, timestamp, volume, unit, created_at in candidates.values_list(
+                'pk', 'timestamp', 'volume', 'unit', 'created_at').iterator():
+            window.append((str(pk), created_at))
+            if str(pk) in already_counted:
+                continue
+            added += tank.from_transaction_volume(volume, unit)
+            counted += 1
+            watermark = created_at if watermark is None else max(watermark, created_at)
+            # A back-dated fill changes any period it falls into
+            dirty_since = timestamp if dirty_since is None else min(dirty_since, timestamp)
+        recently_counted = [
+            pk for pk, created_at in window if watermark and created_at > watermark - WATERMARK_LAG
+        ]
+
+        # Periods ending before the earliest change are still valid
+        kept = tank.reconciliations.all()
+        if dirty_since is not None:
+            kept = kept.filter(period_end__lt=dirty_since)
+        last_kept = kept.order_by('-period_end').first()
+
+        readings = tank.readings.order_by('reading_time')
+        if last_kept:
+            readings = readings.filter(reading_time__gte=last_kept.period_end)
+        readings = list(readings)
+
+        periods = []
+        alerts = 0
+        for opening, closing in zip(readings, readings[1:]):
+            reconciliation = _reconcile_period(tank, opening, closing)
+            if reconciliation.alert_id is None and reconciliation.period_end in previous_alerts:
+                reconciliation.alert_id = previous_alerts.pop(reconciliation.period_end)
+                reconciliation.save(update_fields=['alert'])
+            periods.append(reconciliation.period_end)
+            if _sync_alert(tank, reconciliation):
+                alerts += 1
+
+        # Periods whose closing reading was deleted
+        stale = tank.reconciliations.exclude(period_end__in=periods)
+        if last_kept:
+            stale = stale.filter(period_end__gt=last_kept.period_end)
+        stale_alerts = list(stale.filter(alert__isnull=False).values_list('alert_id', flat=True))
+        stale.delete()
+        FuelAlert.objects.filter(
+            pk__in=stale_alerts + list(previous_alerts.values()), status__in=['open', 'acknowledged']
+        ).update(
+            status='resolved',
+            resolved_at=timezone.now(),
+            resolution_notes='Reconciliation period no longer exists after recomputation'
+        )
+
+        FuelTank.objects.filter(pk=tank.pk).update(
+            dispensed_total=tank.dispensed_total + added,
+            transactions_counted_through=watermark,
+            recently_counted=recently_counted,
+            updated_at=timezone.now()
+        )
+        # Only clear the flag if nothing marked the tank dirty meanwhile
+        FuelTank.objects.filter(pk=tank.pk, recompute_from=tank.recompute_from).update(recompute_from=None)
+
+    return {
+        'tank': str(tank.pk),
+        'transactions_counted': counted,
+        'dispensed_added': added,
+        'periods_reconciled': len(periods),
+        'variance_alerts': alerts,
+    }
+
+
+def reconcile_sites(site_ids, rebuild=False):
+    """Reconcile every tank at the given sites"""
+    return [reconcile_tank(tank, rebuild=rebuild) for tank in FuelTank.objects.filter(site_id__in=site_ids)]
+
+
+def book_inventory(tank):
+    """
+    Estimated current level: last reading plus deliveries minus fuel
+    dispensed since that reading.
+    """
+    last_reading = tank.readings.order_by('-reading_time').first()
+    if last_reading is None:
+        return None
+
+    now = timezone.now()
+    delivered = _delivered_between(tank, last_reading.reading_time, now)
+    dispensed = _dispensed_between(tank, last_reading.reading_time, now)
+    volume = last_reading.volume + delivered - dispensed
+    return {
+        'last_reading_volume': last_reading.volume,
+        'last_reading_time': last_reading.reading_time,
+        'delivered_since': delivered,
+        'dispensed_since': dispensed,
+        'book_volume': volume,
+        'percent_full': round(float(volume / tank.capacity * 100), 1),
+    }
@@ -0,0 +1,121 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:23
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_asset_image_asset_thumbnail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('fuel', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FuelTank',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('product_type', models.CharField(choices=[('gasoline', 'Gasoline'), ('diesel', 'Diesel'), ('def', 'Diesel Exhaust Fluid (DEF)'), ('cng', 'Compressed Natural Gas'), ('lng', 'Liquefied Natural Gas'), ('propane', 'Propane'), ('electricity', 'Electricity'), ('other', 'Other')], max_length=20)),
+                ('capacity', models.DecimalField(decimal_places=1, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('1'))])),
+                ('unit', models.CharField(choices=[('gal', 'Gallons'), ('L', 'Liters')], default='gal', max_length=10)),
+                ('tolerance_volume', models.DecimalField(decimal_places=1, default=Decimal('0'), help_text='Allowed variance per period, in tank units', max_digits=8)),
+                ('tolerance_percent', models.DecimalField(decimal_places=2, default=Decimal('1.00'), help_text='Allowed variance as a percentage of dispensed volume', max_digits=5)),
+                ('dispensed_total', models.DecimalField(decimal_places=3, default=Decimal('0'), help_text='Running total dispensed, in tank units', max_digits=14)),
+                ('transactions_counted_through', models.DateTimeField(blank=True, help_text='created_at of the last transaction counted', null=True)),
+                ('recompute_from', models.DateTimeField(blank=True, help_text='Earliest time whose periods need recomputing', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tanks', to='fuel.fuelsite')),
+            ],
+            options={
+                'ordering': ['site', 'name'],
+                'unique_together': {('site', 'product_type')},
+            },
+        ),
+        migrations.AddField(
+            model_name='fuelalert',
+            name='fuel_site',
+            field=models.ForeignKey(blank=True, help_text='Site for inventory alerts', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='fuel.fuelsite'),
+        ),
+        migrations.AlterField(
+            model_name='fuelalert',
+            name='alert_type',
+            field=models.CharField(choices=[('low_mpg', 'Low MPG'), ('odometer_rollback', 'Odometer Rollback'), ('high_price', 'High Unit Price'), ('missing_odometer', 'Missing Odometer'), ('duplicate_transaction', 'Possible Duplicate'), ('unusual_volume', 'Unusual Volume'), ('inventory_variance', 'Tank Inventory Variance')], max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='fuelalert',
+            name='asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fuel_alerts', to='assets.asset'),
+        ),
+        migrations.CreateModel(
+            name='TankReconciliation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('opening_volume', models.DecimalField(decimal_places=1, max_digits=10)),
+                ('delivered', models.DecimalField(decimal_places=3, default=Decimal('0'), max_digits=12)),
+                ('dispensed', models.DecimalField(decimal_places=3, default=Decimal('0'), max_digits=12)),
+                ('expected_volume', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('closing_volume', models.DecimalField(decimal_places=1, max_digits=10)),
+                ('variance', models.DecimalField(decimal_places=3, help_text='Measured minus expected; negative means unaccounted loss', max_digits=12)),
+                ('variance_percent', models.DecimalField(blank=True, decimal_places=2, help_text='Variance as a percentage of dispensed volume', max_digits=8, null=True)),
+                ('tolerance', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('within_tolerance', models.BooleanField(default=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('alert', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reconciliations', to='fuel.fuelalert')),
+                ('tank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliations', to='fuel.fueltank')),
+            ],
+            options={
+                'ordering': ['-period_end'],
+                'indexes': [models.Index(fields=['tank', '-period_end'], name='fuel_tankre_tank_id_18a784_idx'), models.Index(fields=['within_tolerance'], name='fuel_tankre_within__9d1d59_idx')],
+                'unique_together': {('tank', 'period_end')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TankReading',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('reading_time', models.DateTimeField(default=django.utils.timezone.now)),
+                ('volume', models.DecimalField(decimal_places=1, help_text='Measured volume, in tank units', max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0'))])),
+                ('source', models.CharField(choices=[('stick', 'Manual Stick Reading'), ('atg', 'Automatic Tank Gauge')], default='stick', max_length=10)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recorded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tank_readings_recorded', to=settings.AUTH_USER_MODEL)),
+                ('tank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='fuel.fueltank')),
+            ],
+            options={
+                'ordering': ['-reading_time'],
+                'indexes': [models.Index(fields=['tank', 'reading_time'], name='fuel_tankre_tank_id_736f62_idx')],
+                'unique_together': {('tank', 'reading_time')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TankDelivery',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('delivered_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('volume', models.DecimalField(decimal_places=1, help_text='Volume delivered, in tank units', max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.1'))])),
+                ('supplier', models.CharField(blank=True, max_length=200, null=True)),
+                ('ticket_number', models.CharField(blank=True, help_text='Bill of lading or delivery ticket', max_length=100, null=True)),
+                ('total_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tank_deliveries_created', to=settings.AUTH_USER_MODEL)),
+                ('tank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='fuel.fueltank')),
+            ],
+            options={
+                'verbose_name_plural': 'Tank deliveries',
+                'ordering': ['-delivered_at'],
+                'indexes': [models.Index(fields=['tank', 'delivered_at'], name='fuel_tankde_tank_id_16cc32_idx')],
+            },
+        ),
+    ]
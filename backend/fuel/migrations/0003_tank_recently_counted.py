@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fuel', '0002_tank_inventory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fueltank',
+            name='recently_counted',
+            field=models.JSONField(blank=True, default=list, help_text='IDs of counted transactions inside the watermark lag window'),
+        ),
+    ]
@@ -73,6 +73,13 @@ class FuelTransaction(models.Model):
         ('kWh', 'Kilowatt Hours'),
     ]
     
+    # Units per gallon (gasoline gallon equivalent for kWh)
+    UNITS_PER_GALLON = {
+        'gal': Decimal('1'),
+        'L': Decimal('3.78541'),
+        'kWh': Decimal('33.7'),
+    }
+    
     # Primary fields
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     asset = models.ForeignKey('assets.Asset', on_delete=models.CASCADE, related_name='fuel_transactions')
@@ -145,16 +152,20 @@ class FuelTransaction(models.Model):
     
     def save(self, *args, **kwargs):
         # Calculate total_cost from unit_price if missing
-        if self.unit_price and not self.total_cost:
-            self.total_cost = self.volume * self.unit_price
-        elif self.total_cost and not self.unit_price:
-            self.unit_price = self.total_cost / self.volume if self.volume > 0 else Decimal('0')
+        self._calculate_pricing()
         
         # Calculate efficiency metrics
         self._calculate_efficiency_metrics()
         
         super().save(*args, **kwargs)
     
+    def _calculate_pricing(self):
+        """Derive total_cost or unit_price from whichever one was provided"""
+        if self.unit_price and not self.total_cost:
+            self.total_cost = self.volume * self.unit_price
+        elif self.total_cost and not self.unit_price:
+            self.unit_price = self.total_cost / self.volume if self.volume > 0 else Decimal('0')
+    
     def _calculate_efficiency_metrics(self):
         """Calculate MPG, cost per mile, and fuel per hour"""
         if not self.odometer:
@@ -167,51 +178,61 @@ class FuelTransaction(models.Model):
             odometer__isnull=False
         ).order_by('-timestamp').first()
         
-        if previous_txn and previous_txn.odometer:
-            self.distance_delta = self.odometer - previous_txn.odometer
+        previous_hours_txn = None
+        if self.engine_hours:
+            previous_hours_txn = FuelTransaction.objects.filter(
+                asset=self.asset,
+                timestamp__lt=self.timestamp,
+                engine_hours__isnull=False
+            ).order_by('-timestamp').first()
+        
+        self.apply_efficiency_metrics(
+            previous_odometer=previous_txn.odometer if previous_txn else None,
+            previous_engine_hours=previous_hours_txn.engine_hours if previous_hours_txn else None
+        )
+    
+    def apply_efficiency_metrics(self, previous_odometer=None, previous_engine_hours=None):
+        """
+        Calculate efficiency metrics from the asset's previous readings.
+        Bulk import paths track previous readings themselves and call this
+        directly instead of querying for them row by row.
+        """
+        if not self.odometer:
+            return
+        
+        if previous_odometer:
+            self.distance_delta = self.odometer - previous_odometer
             
             if self.distance_delta > 0:
                 # Calculate MPG (skip DEF as it's not fuel for propulsion)
                 if self.product_type != 'def':
-                    if self.unit == 'gal':
-                        self.mpg = self.distance_delta / self.volume
-                    elif self.unit == 'L':
-                        # Convert liters to gallons for MPG calculation
-                        gallons = self.volume / Decimal('3.78541')
-                        self.mpg = self.distance_delta / gallons
-                    elif self.unit == 'kWh':
-                        # Calculate MPGe (miles per gallon equivalent)
-                        # 1 gallon gasoline = 33.7 kWh
-                        gallon_equivalent = self.volume / Decimal('33.7')
-                        self.mpg = self.distance_delta / gallon_equivalent
+                    # Liters are converted to gallons; kWh gives MPGe
+                    # (miles per gallon equivalent)
+                    if self.unit in self.UNITS_PER_GALLON:
+                        self.mpg = self.distance_delta / self.to_gallons(self.volume, self.unit)
                 
                 # Calculate cost per mile
                 if self.total_cost:
                     self.cost_per_mile = self.total_cost / self.distance_delta
         
         # Calculate fuel per hour if engine hours available
-        if self.engine_hours:
-            previous_hours_txn = FuelTransaction.objects.filter(
-                asset=self.asset,
-                timestamp__lt=self.timestamp,
-                engine_hours__isnull=False
-            ).order_by('-timestamp').first()
-            
-            if previous_hours_txn and previous_hours_txn.engine_hours:
-                hours_delta = self.engine_hours - previous_hours_txn.engine_hours
-                if hours_delta > 0:
-                    self.fuel_per_hour = self.volume / hours_delta
+        if self.engine_hours and previous_engine_hours:
+            hours_delta = self.engine_hours - previous_engine_hours
+            if hours_delta > 0:
+                self.fuel_per_hour = self.volume / hours_delta
+    
+    @classmethod
+    def to_gallons(cls, volume, unit):
+        """Convert a volume in the given unit to gallons (or gallon equivalent)"""
+        factor = cls.UNITS_PER_GALLON.get(unit)
+        if factor is None or factor == 1:
+            return volume
+        return volume / factor
     
     @property
     def normalized_volume_gallons(self):
         """Convert volume to gallons for consistent reporting"""
-        if self.unit == 'gal':
-            return self.volume
-        elif self.unit == 'L':
-            return self.volume / Decimal('3.78541')
-        elif self.unit == 'kWh':
-            return self.volume / Decimal('33.7')  # kWh to gallon equivalent
-        return self.volume
+        return self.to_gallons(self.volume, self.unit)
     
     @property
     def is_anomaly_candidate(self):
@@ -269,6 +290,171 @@ class FuelCard(models.Model):
         return f"{self.provider.upper()} ****{self.card_last4}"
 
 
+class FuelTank(models.Model):
+    """Storage tank at an on-site fuel site, reconciled against dispensed fuel"""
+    UNIT_CHOICES = [
+        ('gal', 'Gallons'),
+        ('L', 'Liters'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    site = models.ForeignKey(FuelSite, on_delete=models.CASCADE, related_name='tanks')
+    name = models.CharField(max_length=100)
+    product_type = models.CharField(max_length=20, choices=FuelTransaction.PRODUCT_TYPE_CHOICES)
+    capacity = models.DecimalField(max_digits=10, decimal_places=1, validators=[MinValueValidator(Decimal('1'))])
+    unit = models.CharField(max_length=10, choices=UNIT_CHOICES, default='gal')
+    
+    # Variance tolerance: fixed allowance plus a share of the period's dispensed volume
+    tolerance_volume = models.DecimalField(max_digits=8, decimal_places=1, default=Decimal('0'),
+                                         help_text="Allowed variance per period, in tank units")
+    tolerance_percent = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('1.00'),
+                                          help_text="Allowed variance as a percentage of dispensed volume")
+    
+    # Incremental reconciliation state
+    dispensed_total = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal('0'),
+                                        help_text="Running total dispensed, in tank units")
+    transactions_counted_through = models.DateTimeField(blank=True, null=True,
+                                                      help_text="created_at of the last transaction counted")
+    recently_counted = models.JSONField(default=list, blank=True,
+                                        help_text="IDs of counted transactions inside the watermark lag window")
+    recompute_from = models.DateTimeField(blank=True, null=True,
+                                        help_text="Earliest time whose periods need recomputing")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['site', 'name']
+        # Dispenses are matched to tanks by site and product
+        unique_together = ['site', 'product_type']
+    
+    def __str__(self):
+        return f"{self.site.name} - {self.name} ({self.product_type})"
+    
+    def from_transaction_volume(self, volume, unit):
+        """Convert a transaction volume into this tank's unit"""
+        gallons = FuelTransaction.to_gallons(volume, unit)
+        if self.unit == 'gal':
+            return gallons
+        return gallons * FuelTransaction.UNITS_PER_GALLON[self.unit]
+    
+    def mark_dirty(self, since):
+        """Flag periods ending at or after `since` for recomputation"""
+        if self.recompute_from is None or since < self.recompute_from:
+            self.recompute_from = since
+            FuelTank.objects.filter(pk=self.pk).update(recompute_from=since)
+
+
+class TankDelivery(models.Model):
+    """Fuel delivered into a tank"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tank = models.ForeignKey(FuelTank, on_delete=models.CASCADE, related_name='deliveries')
+    delivered_at = models.DateTimeField(default=timezone.now)
+    volume = models.DecimalField(max_digits=10, decimal_places=1, validators=[MinValueValidator(Decimal('0.1'))],
+                               help_text="Volume delivered, in tank units")
+    supplier = models.CharField(max_length=200, blank=True, null=True)
+    ticket_number = models.CharField(max_length=100, blank=True, null=True,
+                                   help_text="Bill of lading or delivery ticket")
+    total_cost = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    notes = models.TextField(blank=True, null=True)
+    
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='tank_deliveries_created')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-delivered_at']
+        verbose_name_plural = "Tank deliveries"
+        indexes = [
+            models.Index(fields=['tank', 'delivered_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.tank.name}: +{self.volume} {self.tank.unit} on {self.delivered_at.date()}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.tank.mark_dirty(self.delivered_at)
+    
+    def delete(self, *args, **kwargs):
+        self.tank.mark_dirty(self.delivered_at)
+        return super().delete(*args, **kwargs)
+
+
+class TankReading(models.Model):
+    """Measured tank level (stick reading or tank gauge)"""
+    SOURCE_CHOICES = [
+        ('stick', 'Manual Stick Reading'),
+        ('atg', 'Automatic Tank Gauge'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tank = models.ForeignKey(FuelTank, on_delete=models.CASCADE, related_name='readings')
+    reading_time = models.DateTimeField(default=timezone.now)
+    volume = models.DecimalField(max_digits=10, decimal_places=1, validators=[MinValueValidator(Decimal('0'))],
+                               help_text="Measured volume, in tank units")
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='stick')
+    notes = models.TextField(blank=True, null=True)
+    
+    recorded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='tank_readings_recorded')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-reading_time']
+        unique_together = ['tank', 'reading_time']
+        indexes = [
+            models.Index(fields=['tank', 'reading_time']),
+        ]
+    
+    def __str__(self):
+        return f"{self.tank.name}: {self.volume} {self.tank.unit} at {self.reading_time}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.tank.mark_dirty(self.reading_time)
+    
+    def delete(self, *args, **kwargs):
+        self.tank.mark_dirty(self.reading_time)
+        return super().delete(*args, **kwargs)
+
+
+class TankReconciliation(models.Model):
+    """Book vs. measured inventory for a tank between two consecutive readings"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tank = models.ForeignKey(FuelTank, on_delete=models.CASCADE, related_name='reconciliations')
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    
+    # All volumes in tank units
+    opening_volume = models.DecimalField(max_digits=10, decimal_places=1)
+    delivered = models.DecimalField(max_digits=12, decimal_places=3, default=Decimal('0'))
+    dispensed = models.DecimalField(max_digits=12, decimal_places=3, default=Decimal('0'))
+    expected_volume = models.DecimalField(max_digits=12, decimal_places=3)
+    closing_volume = models.DecimalField(max_digits=10, decimal_places=1)
+    variance = models.DecimalField(max_digits=12, decimal_places=3,
+                                 help_text="Measured minus expected; negative means unaccounted loss")
+    variance_percent = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True,
+                                         help_text="Variance as a percentage of dispensed volume")
+    tolerance = models.DecimalField(max_digits=12, decimal_places=3)
+    within_tolerance = models.BooleanField(default=True)
+    
+    alert = models.ForeignKey('FuelAlert', on_delete=models.SET_NULL, blank=True, null=True,
+                            related_name='reconciliations')
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-period_end']
+        unique_together = ['tank', 'period_end']
+        indexes = [
+            models.Index(fields=['tank', '-period_end']),
+            models.Index(fields=['within_tolerance']),
+        ]
+    
+    def __str__(self):
+        return f"{self.tank.name}: {self.period_start.date()} - {self.period_end.date()} ({self.variance:+})"
+
+
 class FuelAlert(models.Model):
     """Fuel-related alerts and anomalies"""
     ALERT_TYPE_CHOICES = [
@@ -278,6 +464,7 @@ class FuelAlert(models.Model):
         ('missing_odometer', 'Missing Odometer'),
         ('duplicate_transaction', 'Possible Duplicate'),
         ('unusual_volume', 'Unusual Volume'),
+        ('inventory_variance', 'Tank Inventory Variance'),
     ]
     
     SEVERITY_CHOICES = [
@@ -300,9 +487,12 @@ class FuelAlert(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
     
     # Related objects
-    asset = models.ForeignKey('assets.Asset', on_delete=models.CASCADE, related_name='fuel_alerts')
+    asset = models.ForeignKey('assets.Asset', on_delete=models.CASCADE, related_name='fuel_alerts',
+                            blank=True, null=True)
     transaction = models.ForeignKey(FuelTransaction, on_delete=models.CASCADE, 
                                   related_name='alerts', blank=True, null=True)
+    fuel_site = models.ForeignKey(FuelSite, on_delete=models.CASCADE, related_name='alerts',
+                                blank=True, null=True, help_text="Site for inventory alerts")
     
     # Alert details
     title = models.CharField(max_length=200)
@@ -328,7 +518,8 @@ class FuelAlert(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.alert_type}: {self.asset.asset_id} - {self.title}"
+        subject = self.asset.asset_id if self.asset else self.fuel_site.name if self.fuel_site else '-'
+        return f"{self.alert_type}: {subject} - {self.title}"
 
 
 class UnitsPolicy(models.Model):
@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.utils import timezone
-from .models import FuelTransaction, FuelSite, FuelCard, FuelAlert, UnitsPolicy
+from .models import (
+    FuelTransaction, FuelSite, FuelCard, FuelAlert, UnitsPolicy,
+    FuelTank, TankDelivery, TankReading, TankReconciliation
+)
+from assets.fieldsets import SparseFieldsetMixin
 from assets.serializers import AssetListSerializer
 from decimal import Decimal
 from datetime import datetime, timedelta
@@ -20,7 +24,7 @@ class FuelSiteSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class FuelTransactionListSerializer(serializers.ModelSerializer):
+class FuelTransactionListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Simplified serializer for fuel transaction lists"""
     asset_details = AssetListSerializer(source='asset', read_only=True)
     fuel_site_name = serializers.CharField(source='fuel_site.name', read_only=True)
@@ -42,6 +46,7 @@ class FuelTransactionListSerializer(serializers.ModelSerializer):
             'mpg', 'cost_per_mile', 'distance_delta', 'is_anomaly', 'days_ago',
             'created_by_username', 'created_at'
         ]
+        expandable_fields = ['asset_details']
     
     def get_is_anomaly(self, obj):
         """Check if this transaction has any anomaly flags"""
@@ -53,7 +58,7 @@ class FuelTransactionListSerializer(serializers.ModelSerializer):
         return delta.days
 
 
-class FuelTransactionDetailSerializer(serializers.ModelSerializer):
+class FuelTransactionDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Detailed serializer for fuel transactions"""
     asset_details = AssetListSerializer(source='asset', read_only=True)
     fuel_site_details = FuelSiteSerializer(source='fuel_site', read_only=True)
@@ -86,6 +91,7 @@ class FuelTransactionDetailSerializer(serializers.ModelSerializer):
             'id', 'distance_delta', 'mpg', 'cost_per_mile', 'fuel_per_hour',
             'created_at', 'updated_at'
         ]
+        expandable_fields = ['asset_details', 'fuel_site_details', 'created_by_details']
     
     def get_created_by_details(self, obj):
         """Get creator user details"""
@@ -194,7 +200,7 @@ class FuelTransactionCreateUpdateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class FuelCardSerializer(serializers.ModelSerializer):
+class FuelCardSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for fuel cards"""
     assigned_asset_details = AssetListSerializer(source='assigned_asset', read_only=True)
     provider_display = serializers.CharField(source='get_provider_display', read_only=True)
@@ -208,9 +214,83 @@ class FuelCardSerializer(serializers.ModelSerializer):
             'external_id', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = ['assigned_asset_details']
 
 
-class FuelAlertSerializer(serializers.ModelSerializer):
+class FuelTankSerializer(serializers.ModelSerializer):
+    """Serializer for on-site fuel tanks"""
+    site_name = serializers.CharField(source='site.name', read_only=True)
+    product_type_display = serializers.CharField(source='get_product_type_display', read_only=True)
+    
+    class Meta:
+        model = FuelTank
+        fields = [
+            'id', 'site', 'site_name', 'name', 'product_type', 'product_type_display',
+            'capacity', 'unit', 'tolerance_volume', 'tolerance_percent',
+            'dispensed_total', 'transactions_counted_through', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'dispensed_total', 'transactions_counted_through', 'created_at', 'updated_at'
+        ]
+    
+    def validate_site(self, value):
+        """Tanks only exist at on-site fuel sites"""
+        if value.site_type != 'onsite':
+            raise serializers.ValidationError('Tanks can only be added to on-site fuel sites.')
+        return value
+
+
+class TankDeliverySerializer(serializers.ModelSerializer):
+    """Serializer for tank deliveries"""
+    tank_name = serializers.CharField(source='tank.name', read_only=True)
+    
+    class Meta:
+        model = TankDelivery
+        fields = [
+            'id', 'tank', 'tank_name', 'delivered_at', 'volume', 'supplier',
+            'ticket_number', 'total_cost', 'notes', 'created_by', 'created_at'
+        ]
+        read_only_fields = ['id', 'created_by', 'created_at']
+
+
+class TankReadingSerializer(serializers.ModelSerializer):
+    """Serializer for tank level readings"""
+    tank_name = serializers.CharField(source='tank.name', read_only=True)
+    source_display = serializers.CharField(source='get_source_display', read_only=True)
+    
+    class Meta:
+        model = TankReading
+        fields = [
+            'id', 'tank', 'tank_name', 'reading_time', 'volume', 'source',
+            'source_display', 'notes', 'recorded_by', 'created_at'
+        ]
+        read_only_fields = ['id', 'recorded_by', 'created_at']
+    
+    def validate(self, data):
+        """A reading can't exceed the tank's capacity"""
+        tank = data.get('tank') or getattr(self.instance, 'tank', None)
+        if tank and data.get('volume') is not None and data['volume'] > tank.capacity:
+            raise serializers.ValidationError({
+                'volume': f'Reading exceeds tank capacity of {tank.capacity} {tank.unit}.'
+            })
+        return data
+
+
+class TankReconciliationSerializer(serializers.ModelSerializer):
+    """Serializer for per-period tank reconciliations"""
+    tank_name = serializers.CharField(source='tank.name', read_only=True)
+    
+    class Meta:
+        model = TankReconciliation
+        fields = [
+            'id', 'tank', 'tank_name', 'period_start', 'period_end', 'opening_volume',
+            'delivered', 'dispensed', 'expected_volume', 'closing_volume', 'variance',
+            'variance_percent', 'tolerance', 'within_tolerance', 'alert', 'computed_at'
+        ]
+        read_only_fields = fields
+
+
+class FuelAlertSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for fuel alerts"""
     asset_details = AssetListSerializer(source='asset', read_only=True)
     transaction_details = FuelTransactionListSerializer(source='transaction', read_only=True)
@@ -230,11 +310,12 @@ class FuelAlertSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'alert_type', 'alert_type_display', 'severity', 'severity_display',
             'status', 'status_display', 'asset', 'asset_details', 'transaction',
-            'transaction_details', 'title', 'description', 'threshold_value',
+            'transaction_details', 'fuel_site', 'title', 'description', 'threshold_value',
             'actual_value', 'resolved_by', 'resolved_by_details', 'resolved_at',
             'resolution_notes', 'days_open', 'is_overdue', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = ['asset_details', 'transaction_details', 'resolved_by_details']
     
     def get_resolved_by_details(self, obj):
         """Get resolver user details"""
@@ -322,6 +403,8 @@ class FuelImportPreviewSerializer(serializers.Serializer):
     """Serializer for CSV import preview"""
     
     total_rows = serializers.IntegerField()
+    sampled_rows = serializers.IntegerField()
+    is_estimate = serializers.BooleanField()
     valid_rows = serializers.IntegerField()
     invalid_rows = serializers.IntegerField()
     duplicates = serializers.IntegerField()
@@ -335,6 +418,7 @@ class FuelImportPreviewSerializer(serializers.Serializer):
     warnings = serializers.DictField()
     
     # Column mapping
+    provider = serializers.CharField()
     column_mapping = serializers.DictField()
     required_columns = serializers.ListField()
     optional_columns = serializers.ListField()
\ No newline at end of file
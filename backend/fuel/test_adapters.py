@@ -0,0 +1,116 @@
+from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from decimal import Decimal
+from pathlib import Path
+
+from assets.models import Asset
+from .adapters import GenericCSVAdapter, WEXAdapter, VoyagerAdapter, FuelMasterAdapter, detect_adapter
+from .importers import FuelCSVImporter
+from .models import FuelTransaction, FuelCard, FuelSite
+
+
+SAMPLES_DIR = Path(__file__).resolve().parent / 'samples'
+
+
+def sample_file(name):
+    """Load one of the provider sample exports as an upload"""
+    return SimpleUploadedFile(name, (SAMPLES_DIR / name).read_bytes(), content_type='text/csv')
+
+
+class ProviderAdapterTestCase(TestCase):
+    def setUp(self):
+        self.pickup = Asset.objects.create(
+            asset_id='TRK-0001', vehicle_type='truck', make='Ford', model='F-150', year=2022
+        )
+        self.tractor = Asset.objects.create(
+            asset_id='TRK-0002', vehicle_type='tractor', make='Volvo', model='VNL', year=2021
+        )
+        self.ev = Asset.objects.create(
+            asset_id='EV-0001', vehicle_type='car', make='Chevrolet', model='Bolt', year=2023
+        )
+
+    def test_detects_provider_from_header(self):
+        self.assertIsInstance(detect_adapter(['Asset ID', 'Date', 'Product Type', 'Volume']), GenericCSVAdapter)
+        self.assertIsInstance(detect_adapter(WEXAdapter.columns.keys()), WEXAdapter)
+        self.assertIsInstance(detect_adapter(VoyagerAdapter.columns.keys()), VoyagerAdapter)
+        self.assertIsInstance(detect_adapter(FuelMasterAdapter.columns.keys()), FuelMasterAdapter)
+
+    def test_wex_sample(self):
+        FuelCard.objects.create(provider='wex', card_last4='1234', external_id='WEX-1234',
+                                assigned_asset=self.pickup)
+        importer = FuelCSVImporter(sample_file('wex_transactions.csv'))
+        result = importer.run()
+
+        self.assertIsInstance(importer.adapter, WEXAdapter)
+        self.assertEqual(result['valid_rows'], 3)
+        self.assertEqual(result['errors'], {
+            4: "No asset assigned to card 'XXXXXXXXXXX5555'",
+            5: "Invalid product type: 'kerosene'",
+        })
+
+        first, second = FuelTransaction.objects.filter(asset=self.pickup).order_by('timestamp')
+        self.assertEqual(first.entry_source, 'fuel_card')
+        self.assertEqual(first.timestamp.hour, 7)
+        self.assertEqual(first.payment_ref, 'WX100231')
+        self.assertEqual(first.location_label, 'Springfield, IL')
+        # Total derived from units x unit cost when the provider leaves it blank
+        self.assertEqual(second.total_cost, Decimal('47.36'))
+        self.assertEqual(second.mpg, Decimal('21.99'))
+
+        diesel = FuelTransaction.objects.get(asset=self.tractor)
+        self.assertEqual((diesel.product_type, diesel.unit), ('diesel', 'gal'))
+
+    def test_voyager_sample_normalizes_units(self):
+        FuelCard.objects.create(provider='voyager', card_last4='4321', external_id='V-77',
+                                assigned_asset=self.tractor)
+        result = FuelCSVImporter(sample_file('voyager_transactions.csv'), adapter=VoyagerAdapter()).run()
+
+        self.assertEqual(result['valid_rows'], 3)
+        liters = FuelTransaction.objects.filter(asset=self.tractor).order_by('timestamp')
+        self.assertEqual([txn.unit for txn in liters], ['L', 'L'])
+        self.assertEqual(liters[0].timestamp.minute, 15)
+        self.assertAlmostEqual(float(liters[1].normalized_volume_gallons), 36.98, places=2)
+
+        charge = FuelTransaction.objects.get(asset=self.ev)
+        self.assertEqual((charge.product_type, charge.unit), ('electricity', 'kWh'))
+
+    def test_fuelmaster_sample_links_site(self):
+        site = FuelSite.objects.create(name='Main Yard', site_type='onsite', external_id='YARD-1')
+        result = FuelCSVImporter(sample_file('fuelmaster_transactions.csv')).run()
+
+        self.assertEqual(result['valid_rows'], 2)
+        self.assertEqual(result['errors'], {3: "Asset 'TRK-0404' does not exist"})
+
+        txns = FuelTransaction.objects.order_by('timestamp')
+        self.assertTrue(all(txn.fuel_site_id == site.id for txn in txns))
+        self.assertEqual(txns[0].entry_source, 'tank_controller')
+        self.assertIsNone(txns[0].total_cost)
+        self.assertEqual(txns[1].fuel_per_hour, Decimal('3.143'))
+
+    def test_fuelmaster_unknown_site_rejected(self):
+        FuelSite.objects.create(name='Main Yard', site_type='onsite', external_id='YARD-1')
+        rows = [
+            {'Date': '03/01/2024', 'Vehicle': 'TRK-0002', 'Product': 'DIESEL', 'Quantity': '10', 'Site': 'YARD-1'},
+            {'Date': '03/01/2024', 'Vehicle': 'TRK-0002', 'Product': 'DIESEL', 'Quantity': '12', 'Site': 'YARD-9'},
+            {'Date': '03/01/2024', 'Vehicle': 'TRK-0002', 'Product': 'DIESEL', 'Quantity': '14', 'Site': ''},
+        ]
+        valid, unknown, blank = FuelMasterAdapter().parse_rows(rows, FuelCSVImporter(None))
+
+        self.assertIsNotNone(valid.fuel_site_id)
+        self.assertEqual(unknown, "Fuel site 'YARD-9' does not exist")
+        self.assertIsNone(blank.fuel_site_id)
+
+    def test_errors_reported_in_field_order(self):
+        rows = [
+            {'Asset ID': 'NOPE', 'Date': 'bad', 'Product Type': 'gasoline', 'Volume': '1'},
+            {'Asset ID': 'TRK-0001', 'Date': 'bad', 'Product Type': 'gasoline', 'Volume': '1'},
+            {'Asset ID': 'TRK-0001', 'Date': '2024-01-01', 'Product Type': 'gasoline', 'Volume': '-1'},
+        ]
+        importer = FuelCSVImporter(None)
+        results = GenericCSVAdapter().parse_rows(rows, importer)
+
+        self.assertEqual(results, [
+            "Asset 'NOPE' does not exist",
+            "Invalid date: 'bad' (expected YYYY-MM-DD)",
+            'volume: Ensure this value is greater than or equal to 0.001.',
+        ])
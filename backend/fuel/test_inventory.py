@@ -0,0 +1,198 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from assets.models import Asset
+from .importers import FuelCSVImporter
+from .inventory import reconcile_tank, book_inventory
+from .models import FuelTransaction, FuelSite, FuelTank, FuelAlert, TankDelivery, TankReading
+
+
+def at(day, hour=0):
+    return timezone.make_aware(datetime(2024, 3, day, hour))
+
+
+class TankReconciliationTestCase(TestCase):
+    def setUp(self):
+        self.asset = Asset.objects.create(
+            asset_id='TRK-0002', vehicle_type='truck', make='Volvo', model='VNL', year=2021
+        )
+        self.site = FuelSite.objects.create(name='Main Yard', site_type='onsite', external_id='YARD-1')
+        self.tank = FuelTank.objects.create(
+            site=self.site, name='Diesel 1', product_type='diesel', capacity=Decimal('1000'),
+            tolerance_volume=Decimal('5'), tolerance_percent=Decimal('1.00')
+        )
+
+    def dispense(self, when, volume, unit='gal'):
+        return FuelTransaction.objects.create(
+            asset=self.asset, timestamp=when, product_type='diesel', volume=Decimal(volume),
+            unit=unit, total_cost=Decimal('10.00'), fuel_site=self.site
+        )
+
+    def read(self, when, volume):
+        return TankReading.objects.create(tank=self.tank, reading_time=when, volume=Decimal(volume))
+
+    def test_period_variance_within_tolerance(self):
+        self.read(at(1), '500')
+        TankDelivery.objects.create(tank=self.tank, delivered_at=at(1, 12), volume=Decimal('300'))
+        self.dispense(at(1, 6), '100')
+        self.dispense(at(2, 6), '50')
+        self.read(at(3), '648')
+
+        result = reconcile_tank(self.tank)
+
+        self.assertEqual(result['transactions_counted'], 2)
+        self.assertEqual(result['periods_reconciled'], 1)
+        period = self.tank.reconciliations.get()
+        self.assertEqual(period.expected_volume, Decimal('650'))
+        self.assertEqual(period.variance, Decimal('-2'))
+        self.assertEqual(period.tolerance, Decimal('6.5'))
+        self.assertTrue(period.within_tolerance)
+        self.assertFalse(FuelAlert.objects.exists())
+
+    def test_incremental_passes_only_touch_new_data(self):
+        self.read(at(1), '500')
+        self.dispense(at(1, 6), '100')
+        self.read(at(2), '400')
+        reconcile_tank(self.tank)
+
+        # Nothing new: no transactions counted, no periods recomputed
+        result = reconcile_tank(self.tank)
+        self.assertEqual(result['transactions_counted'], 0)
+        self.assertEqual(result['periods_reconciled'], 0)
+
+        # A new reading closes one more period
+        self.dispense(at(2, 6), '20')
+        self.read(at(3), '350')
+        result = reconcile_tank(self.tank)
+        self.assertEqual(result['transactions_counted'], 1)
+        self.assertEqual(result['periods_reconciled'], 1)
+
+        self.tank.refresh_from_db()
+        self.assertEqual(self.tank.dispensed_total, Decimal('120'))
+        latest = self.tank.reconciliations.first()
+        self.assertEqual(latest.variance, Decimal('-30'))
+        self.assertFalse(latest.within_tolerance)
+
+        alert = FuelAlert.objects.get()
+        self.assertEqual(alert.alert_type, 'inventory_variance')
+        self.assertEqual(alert.fuel_site, self.site)
+        self.assertEqual(latest.alert, alert)
+
+    def test_backdated_transaction_recomputes_period(self):
+        self.read(at(1), '500')
+        self.dispense(at(1, 6), '100')
+        self.read(at(2), '360')
+        reconcile_tank(self.tank)
+        alert = FuelAlert.objects.get()
+        self.assertEqual(alert.status, 'open')
+
+        # The missing fill turns up in a later import, in liters
+        self.dispense(at(1, 9), '151.4164', unit='L')
+        reconcile_tank(self.tank)
+
+        period = self.tank.reconciliations.get()
+        self.assertEqual(period.dispensed.quantize(Decimal('0.01')), Decimal('140.00'))
+        self.assertTrue(period.within_tolerance)
+        alert.refresh_from_db()
+        self.assertEqual(alert.status, 'resolved')
+
+    def test_late_commit_behind_watermark_counted_once(self):
+        self.read(at(1), '500')
+        first = self.dispense(at(1, 6), '100')
+        self.dispense(at(1, 7), '20')
+        self.read(at(2), '380')
+        reconcile_tank(self.tank)
+
+        # A row from a chunk that committed after that pass, created before it
+        late = self.dispense(at(1, 8), '30')
+        FuelTransaction.objects.filter(pk=late.pk).update(created_at=first.created_at - timedelta(seconds=1))
+        result = reconcile_tank(self.tank)
+        self.assertEqual(result['transactions_counted'], 1)
+        self.assertEqual(reconcile_tank(self.tank)['transactions_counted'], 0)
+
+        self.tank.refresh_from_db()
+        self.assertEqual(self.tank.dispensed_total, Decimal('150'))
+        self.assertEqual(self.tank.reconciliations.get().dispensed, Decimal('150'))
+
+    def test_rebuild_keeps_period_alerts(self):
+        self.read(at(1), '500')
+        self.dispense(at(1, 6), '100')
+        self.read(at(2), '360')
+        reconcile_tank(self.tank)
+        alert = FuelAlert.objects.get()
+
+        reconcile_tank(self.tank, rebuild=True)
+        self.assertEqual(FuelAlert.objects.get(), alert)
+        self.assertEqual(self.tank.reconciliations.get().alert, alert)
+
+        # A period that disappears takes its alert with it
+        TankReading.objects.filter(reading_time=at(2)).delete()
+        reconcile_tank(self.tank, rebuild=True)
+        alert.refresh_from_db()
+        self.assertEqual(alert.status, 'resolved')
+        self.assertFalse(self.tank.reconciliations.exists())
+
+    def test_book_inventory(self):
+        self.read(at(1), '500')
+        TankDelivery.objects.create(tank=self.tank, delivered_at=at(2), volume=Decimal('200'))
+        self.dispense(at(3), '75')
+
+        inventory = book_inventory(self.tank)
+        self.assertEqual(inventory['book_volume'], Decimal('625'))
+        self.assertEqual(inventory['percent_full'], 62.5)
+
+    def test_import_reconciles_touched_sites(self):
+        self.read(at(1), '500')
+        self.read(at(3), '431.5')
+        sample = Path(__file__).resolve().parent / 'samples' / 'fuelmaster_transactions.csv'
+        upload = SimpleUploadedFile(sample.name, sample.read_bytes())
+
+        result = FuelCSVImporter(upload).run()
+
+        self.assertEqual(result['tanks_reconciled'], 1)
+        self.assertEqual(result['variance_alerts'], 0)
+        self.tank.refresh_from_db()
+        self.assertEqual(self.tank.dispensed_total, Decimal('68.5'))
+        self.assertEqual(self.tank.reconciliations.get().variance, Decimal('0'))
+
+
+class TankInventoryAPITestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='yardmanager', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.site = FuelSite.objects.create(name='Main Yard', site_type='onsite')
+        self.tank = FuelTank.objects.create(
+            site=self.site, name='Diesel 1', product_type='diesel', capacity=Decimal('1000')
+        )
+
+    def test_reading_closes_period(self):
+        TankReading.objects.create(tank=self.tank, reading_time=at(1), volume=Decimal('500'))
+        response = self.client.post('/api/fuel/tank-readings/', {
+            'tank': self.tank.id, 'reading_time': at(2).isoformat(), 'volume': '500'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(f'/api/fuel/tanks/{self.tank.id}/reconciliations/')
+        self.assertEqual(response.data['count'], 1)
+        self.assertTrue(response.data['results'][0]['within_tolerance'])
+
+    def test_reading_over_capacity_rejected(self):
+        response = self.client.post('/api/fuel/tank-readings/', {
+            'tank': self.tank.id, 'reading_time': at(2).isoformat(), 'volume': '1200'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tank_requires_onsite_site(self):
+        retail = FuelSite.objects.create(name='Corner Station', site_type='retail')
+        response = self.client.post('/api/fuel/tanks/', {
+            'site': retail.id, 'name': 'T1', 'product_type': 'diesel', 'capacity': '500'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
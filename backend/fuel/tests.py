@@ -1,3 +1,208 @@
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User, Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.utils import timezone
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from assets.models import Asset
+from .models import FuelTransaction
+from .importers import FuelCSVImporter
+
+
+HEADER = 'Asset ID,Date,Product Type,Volume,Unit,Total Cost,Odometer,Vendor,Location\n'
+
+
+def make_csv(rows, name='fuel.csv'):
+    """Build an uploaded CSV file from a list of row strings"""
+    content = HEADER + ''.join(f'{row}\n' for row in rows)
+    return SimpleUploadedFile(name, content.encode('utf-8'), content_type='text/csv')
+
+
+class FuelCSVImporterTestCase(TestCase):
+    def setUp(self):
+        self.asset = Asset.objects.create(
+            asset_id='TRK-0001', vehicle_type='truck', make='Ford', model='F-150', year=2022
+        )
+
+    def test_import_inserts_in_chunks(self):
+        rows = [
+            f'TRK-0001,2024-01-{day:02d},gasoline,10,gal,35.00,{1000 + day * 100},Shell,Main St'
+            for day in range(1, 8)
+        ]
+        progress = []
+        importer = FuelCSVImporter(make_csv(rows), chunk_size=3, progress_callback=progress.append)
+        result = importer.run()
+
+        self.assertEqual(result['valid_rows'], 7)
+        self.assertEqual(result['invalid_rows'], 0)
+        self.assertEqual(result['chunks'], 3)
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(progress[-1]['percent'], 100)
+        self.assertEqual(FuelTransaction.objects.count(), 7)
+
+    def test_import_computes_efficiency_across_chunks(self):
+        rows = [
+            'TRK-0001,2024-01-01,gasoline,10,gal,35.00,1000,,',
+            'TRK-0001,2024-01-02,gasoline,10,gal,35.00,1200,,',
+            'TRK-0001,2024-01-03,gasoline,10,gal,35.00,1500,,',
+        ]
+        FuelCSVImporter(make_csv(rows), chunk_size=2).run()
+
+        txns = FuelTransaction.objects.order_by('timestamp')
+        self.assertIsNone(txns[0].mpg)
+        self.assertEqual(txns[1].mpg, Decimal('20.00'))
+        self.assertEqual(txns[2].mpg, Decimal('30.00'))
+        self.assertEqual(txns[2].unit_price, Decimal('3.5000'))
+
+    def test_import_reports_row_errors(self):
+        rows = [
+            'TRK-0001,2024-01-01,gasoline,10,L,35.00,,,',
+            'NOPE-0001,2024-01-02,gasoline,10,gal,35.00,,,',
+            'TRK-0001,01/03/2024,gasoline,10,gal,35.00,,,',
+            'TRK-0001,2024-01-04,gasoline,0,gal,35.00,,,',
+        ]
+        result = FuelCSVImporter(make_csv(rows)).run()
+
+        self.assertEqual(result['valid_rows'], 1)
+        self.assertEqual(result['invalid_rows'], 3)
+        self.assertEqual(set(result['errors']), {2, 3, 4})
+        self.assertEqual(FuelTransaction.objects.get().unit, 'L')
+
+    def test_preview_samples_and_estimates(self):
+        rows = [
+            f'TRK-0001,2024-01-{day:02d},diesel,10,gal,35.00,,,'
+            for day in range(1, 21)
+        ]
+        preview = FuelCSVImporter(make_csv(rows), sample_size=5).preview()
+
+        self.assertTrue(preview['is_estimate'])
+        self.assertEqual(preview['sampled_rows'], 5)
+        self.assertEqual(preview['valid_rows'], 5)
+        self.assertEqual(preview['total_rows'], 20)
+        self.assertEqual(FuelTransaction.objects.count(), 0)
+
+    def test_reimport_skips_duplicates(self):
+        rows = [
+            'TRK-0001,2024-01-01,gasoline,10,gal,35.00,1000,,',
+            'TRK-0001,2024-01-02,gasoline,12.5,gal,40.00,1200,,',
+        ]
+        FuelCSVImporter(make_csv(rows)).run()
+        result = FuelCSVImporter(make_csv(rows + ['TRK-0001,2024-01-03,gasoline,9,gal,30.00,1400,,'])).run()
+
+        self.assertEqual(result['duplicates'], 2)
+        self.assertEqual(result['valid_rows'], 1)
+        self.assertEqual(result['invalid_rows'], 0)
+        self.assertEqual(FuelTransaction.objects.count(), 3)
+
+    def test_duplicates_within_file_and_preview(self):
+        row = 'TRK-0001,2024-01-01,gasoline,10.000,gal,35,1000,,'
+        FuelTransaction.objects.create(
+            asset=self.asset, timestamp=timezone.make_aware(datetime(2024, 1, 2)),
+            product_type='gasoline', volume=Decimal('5'), total_cost=Decimal('20.00')
+        )
+        rows = [row, row, 'TRK-0001,2024-01-02,gasoline,5,gal,20,,,']
+
+        preview = FuelCSVImporter(make_csv(rows)).preview()
+        self.assertEqual(preview['valid_rows'], 1)
+        self.assertEqual(preview['duplicates'], 2)
+        self.assertEqual(set(preview['warnings']), {2, 3})
+
+    def test_rows_committed_concurrently_counted_as_duplicates(self):
+        rows = [
+            'TRK-0001,2024-01-01,gasoline,10,gal,35.00,1000,,',
+            'TRK-0001,2024-01-02,gasoline,12.5,gal,40.00,1200,,',
+        ]
+        FuelTransaction.objects.create(
+            asset=self.asset, timestamp=timezone.make_aware(datetime(2024, 1, 1)),
+            product_type='gasoline', volume=Decimal('10'), total_cost=Decimal('35')
+        )
+        # As if the row was committed after the duplicate check ran
+        with mock.patch.object(FuelCSVImporter, '_existing_keys', return_value=set()):
+            result = FuelCSVImporter(make_csv(rows)).run()
+
+        self.assertEqual(result['valid_rows'], 1)
+        self.assertEqual(result['duplicates'], 1)
+        self.assertEqual(result['invalid_rows'], 0)
+        self.assertEqual(FuelTransaction.objects.count(), 2)
+
+    def test_transaction_key_matches_stored_values(self):
+        key = FuelCSVImporter.transaction_key
+        self.assertEqual(key(1, None, Decimal('10'), Decimal('35.0')), key(1, None, Decimal('10.000'), Decimal('35.00')))
+        self.assertEqual(key(1, None, Decimal('10.0004'), None), key(1, None, Decimal('10.000'), None))
+        self.assertNotEqual(key(1, None, Decimal('10'), Decimal('35')), key(1, None, Decimal('10'), Decimal('35.01')))
+
+    def test_missing_columns_rejected(self):
+        upload = SimpleUploadedFile('fuel.csv', b'Asset ID,Date\nTRK-0001,2024-01-01\n')
+        with self.assertRaises(ValueError):
+            FuelCSVImporter(upload).run()
+
+
+class FuelImportAPITestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='fleetadmin', password='testpass123')
+        self.user.groups.add(Group.objects.create(name='Admin'))
+        self.client.force_authenticate(user=self.user)
+        Asset.objects.create(
+            asset_id='TRK-0001', vehicle_type='truck', make='Ford', model='F-150', year=2022
+        )
+
+    def test_import_csv_endpoint(self):
+        upload = make_csv(['TRK-0001,2024-01-01,gasoline,10,gal,35.00,1000,Shell,Main St'])
+        response = self.client.post(
+            '/api/fuel/transactions/import_csv/', {'file': upload}, format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['valid_rows'], 1)
+        self.assertEqual(FuelTransaction.objects.get().created_by, self.user)
+
+    def test_import_csv_preview_endpoint(self):
+        upload = make_csv(['TRK-0001,2024-01-01,gasoline,10,gal,35.00,1000,Shell,Main St'])
+        response = self.client.post(
+            '/api/fuel/transactions/import_csv/',
+            {'file': upload, 'preview_only': 'true'},
+            format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_rows'], 1)
+        self.assertFalse(response.data['is_estimate'])
+        self.assertEqual(FuelTransaction.objects.count(), 0)
+
+
+class FuelFieldsetTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='fleetadmin', password='testpass123')
+        self.user.groups.add(Group.objects.create(name='Admin'))
+        self.client.force_authenticate(user=self.user)
+        asset = Asset.objects.create(
+            asset_id='TRK-0001', vehicle_type='truck', make='Ford', model='F-150', year=2022
+        )
+        for day in range(1, 4):
+            FuelTransaction.objects.create(
+                asset=asset, timestamp=timezone.make_aware(datetime(2024, 1, day)),
+                product_type='diesel', volume=Decimal('10'), unit='gal', total_cost=Decimal('40.00')
+            )
+
+    def test_unexpanded_asset_is_not_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/fuel/transactions/', {'expand': ''})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row = response.data['results'][0]
+        self.assertNotIn('asset_details', row)
+        self.assertIn('asset', row)
+        self.assertFalse([query for query in queries if 'assets_asset' in query['sql']])
+
+    def test_expanded_asset_is_joined(self):
+        response = self.client.get('/api/fuel/transactions/', {'fields': 'id,asset_details'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'asset_details'})
+        self.assertEqual(response.data['results'][0]['asset_details']['asset_id'], 'TRK-0001')
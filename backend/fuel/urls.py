@@ -2,13 +2,17 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     FuelTransactionViewSet, FuelSiteViewSet, FuelCardViewSet,
-    FuelAlertViewSet, UnitsPolicyViewSet
+    FuelAlertViewSet, UnitsPolicyViewSet, FuelTankViewSet, TankDeliveryViewSet,
+    TankReadingViewSet
 )
 
 # Create router and register viewsets
 router = DefaultRouter()
 router.register(r'transactions', FuelTransactionViewSet, basename='fuel-transactions')
 router.register(r'sites', FuelSiteViewSet, basename='fuel-sites')
+router.register(r'tanks', FuelTankViewSet, basename='fuel-tanks')
+router.register(r'tank-deliveries', TankDeliveryViewSet, basename='fuel-tank-deliveries')
+router.register(r'tank-readings', TankReadingViewSet, basename='fuel-tank-readings')
 router.register(r'cards', FuelCardViewSet, basename='fuel-cards')
 router.register(r'alerts', FuelAlertViewSet, basename='fuel-alerts')
 router.register(r'policy', UnitsPolicyViewSet, basename='fuel-policy')
@@ -5,29 +5,41 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Avg, Sum, Count, Q, Max, Min
 from django.utils import timezone
 from datetime import datetime, timedelta
-import csv
-import io
-from decimal import Decimal
 from authentication.permissions import FuelTransactionPermission, RoleBasedPermission
+from authentication.filters import ScopeFilterBackend
+from authentication.audit_middleware import AuditedViewSetMixin, set_audit_resource
+from assets.fieldsets import ExpandableQueryMixin
 
-from .models import FuelTransaction, FuelSite, FuelCard, FuelAlert, UnitsPolicy
+from .models import (
+    FuelTransaction, FuelSite, FuelCard, FuelAlert, UnitsPolicy,
+    FuelTank, TankDelivery, TankReading
+)
 from .serializers import (
     FuelTransactionListSerializer, FuelTransactionDetailSerializer,
     FuelTransactionCreateUpdateSerializer, FuelSiteSerializer, FuelCardSerializer,
     FuelAlertSerializer, UnitsPolicySerializer, FuelStatsSerializer,
-    FuelImportPreviewSerializer
+    FuelImportPreviewSerializer, FuelTankSerializer, TankDeliverySerializer,
+    TankReadingSerializer, TankReconciliationSerializer
 )
-from assets.models import Asset
+from .importers import FuelCSVImporter
+from .adapters import ADAPTERS, get_adapter
+from .inventory import reconcile_tank, reconcile_sites, book_inventory
+from jobs.runner import enqueue, should_run_in_background
+from jobs.serializers import BackgroundJobSerializer
 
 
-class FuelTransactionViewSet(viewsets.ModelViewSet):
+class FuelTransactionViewSet(AuditedViewSetMixin, ExpandableQueryMixin, viewsets.ModelViewSet):
     """ViewSet for fuel transactions with full CRUD operations"""
     
     queryset = FuelTransaction.objects.select_related(
-        'asset', 'fuel_site', 'created_by'
+        'fuel_site', 'created_by'
     ).prefetch_related('alerts')
     permission_classes = [FuelTransactionPermission]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [ScopeFilterBackend, DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    scope_fields = {
+        'department': 'asset__department', 'vehicle_type': 'asset__vehicle_type', 'asset_id': 'asset__asset_id'
+    }
+    scope_view_all_permission = 'fuel.view_all'
     
     # Filtering
     filterset_fields = {
@@ -50,6 +62,7 @@ class FuelTransactionViewSet(viewsets.ModelViewSet):
         'timestamp', 'total_cost', 'volume', 'mpg', 'cost_per_mile', 'created_at'
     ]
     ordering = ['-timestamp']
+    expansion_select_related = {'asset_details': ['asset']}
     
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
@@ -89,7 +102,7 @@ class FuelTransactionViewSet(viewsets.ModelViewSet):
             # For now, we'll return all and filter in the serializer
             pass
         
-        return queryset
+        return self.expand_queryset(queryset)
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
@@ -209,86 +222,49 @@ class FuelTransactionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Read and parse CSV
+        preview_only = str(request.data.get('preview_only', 'false')).lower() == 'true'
+        
+        try:
+            chunk_size = int(request.data.get('chunk_size', FuelCSVImporter.DEFAULT_CHUNK_SIZE))
+            sample_size = int(request.data.get('sample_size', FuelCSVImporter.DEFAULT_SAMPLE_SIZE))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'chunk_size and sample_size must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Provider file format; detected from the header row when not given
+        provider = request.data.get('provider') or None
+        if provider and provider not in ADAPTERS:
+            return Response(
+                {'error': f'Unknown provider format. Choose from: {", ".join(ADAPTERS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        set_audit_resource(request, 'fuel', resource_name=f'CSV import: {csv_file.name}')
+        
+        # Previews only sample the file, so they always run inline
+        if not preview_only and should_run_in_background(request, csv_file):
+            job = enqueue(
+                'fuel_import', user=request.user, upload=csv_file,
+                params={'chunk_size': max(1, chunk_size), 'provider': provider}
+            )
+            return Response(BackgroundJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        
+        importer = FuelCSVImporter(
+            csv_file,
+            user=request.user,
+            chunk_size=max(1, chunk_size),
+            sample_size=max(1, sample_size),
+            adapter=get_adapter(provider) if provider else None
+        )
+        
         try:
-            decoded_file = csv_file.read().decode('utf-8')
-            csv_data = csv.DictReader(io.StringIO(decoded_file))
-            
-            preview_only = request.data.get('preview_only', 'false').lower() == 'true'
-            
-            valid_rows = []
-            invalid_rows = []
-            errors = {}
-            
-            for row_num, row in enumerate(csv_data, 1):
-                try:
-                    # Map CSV columns to model fields
-                    # This is a basic mapping - could be made configurable
-                    transaction_data = {
-                        'asset': Asset.objects.get(asset_id=row.get('Asset ID')).id,
-                        'timestamp': datetime.strptime(row.get('Date'), '%Y-%m-%d'),
-                        'product_type': row.get('Product Type', '').lower(),
-                        'volume': Decimal(row.get('Volume', '0')),
-                        'unit': row.get('Unit', 'gal').lower(),
-                        'total_cost': Decimal(row.get('Total Cost', '0')),
-                        'odometer': Decimal(row.get('Odometer', '0')) if row.get('Odometer') else None,
-                        'vendor': row.get('Vendor', ''),
-                        'location_label': row.get('Location', ''),
-                        'entry_source': 'csv_import'
-                    }
-                    
-                    if preview_only:
-                        valid_rows.append(transaction_data)
-                    else:
-                        serializer = FuelTransactionCreateUpdateSerializer(
-                            data=transaction_data, context={'request': request}
-                        )
-                        if serializer.is_valid():
-                            serializer.save()
-                            valid_rows.append(transaction_data)
-                        else:
-                            invalid_rows.append(row)
-                            errors[row_num] = serializer.errors
-                
-                except Exception as e:
-                    invalid_rows.append(row)
-                    errors[row_num] = str(e)
-            
             if preview_only:
-                preview_data = {
-                    'total_rows': len(valid_rows) + len(invalid_rows),
-                    'valid_rows': len(valid_rows),
-                    'invalid_rows': len(invalid_rows),
-                    'duplicates': 0,  # Would need dedup logic
-                    'sample_valid': valid_rows[:5],
-                    'sample_invalid': invalid_rows[:5],
-                    'errors': errors,
-                    'warnings': {},
-                    'column_mapping': {
-                        'Asset ID': 'asset',
-                        'Date': 'timestamp',
-                        'Product Type': 'product_type',
-                        'Volume': 'volume',
-                        'Unit': 'unit',
-                        'Total Cost': 'total_cost',
-                        'Odometer': 'odometer',
-                        'Vendor': 'vendor',
-                        'Location': 'location_label'
-                    },
-                    'required_columns': ['Asset ID', 'Date', 'Product Type', 'Volume'],
-                    'optional_columns': ['Unit', 'Total Cost', 'Odometer', 'Vendor', 'Location']
-                }
-                
-                serializer = FuelImportPreviewSerializer(preview_data)
+                serializer = FuelImportPreviewSerializer(importer.preview())
                 return Response(serializer.data)
             
-            else:
-                return Response({
-                    'message': f'Imported {len(valid_rows)} transactions successfully',
-                    'valid_rows': len(valid_rows),
-                    'invalid_rows': len(invalid_rows),
-                    'errors': errors
-                }, status=status.HTTP_201_CREATED)
+            return Response(importer.run(), status=status.HTTP_201_CREATED)
         
         except Exception as e:
             return Response(
@@ -309,12 +285,118 @@ class FuelSiteViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'address', 'external_id']
     ordering_fields = ['name', 'site_type', 'created_at']
     ordering = ['name']
+    
+    @action(detail=True, methods=['post'])
+    def reconcile(self, request, pk=None):
+        """Reconcile inventory for every tank at this site"""
+        site = self.get_object()
+        rebuild = str(request.data.get('rebuild', 'false')).lower() == 'true'
+        return Response({'site': site.id, 'tanks': reconcile_sites([site.id], rebuild=rebuild)})
 
 
-class FuelCardViewSet(viewsets.ModelViewSet):
+class FuelTankViewSet(viewsets.ModelViewSet):
+    """ViewSet for on-site fuel tanks"""
+    
+    queryset = FuelTank.objects.select_related('site')
+    serializer_class = FuelTankSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    
+    filterset_fields = ['site', 'product_type']
+    search_fields = ['name', 'site__name']
+    ordering_fields = ['name', 'product_type', 'created_at']
+    ordering = ['site__name', 'name']
+    
+    @action(detail=True, methods=['get'])
+    def inventory(self, request, pk=None):
+        """Current book inventory estimated from the last reading"""
+        tank = self.get_object()
+        inventory = book_inventory(tank)
+        if inventory is None:
+            return Response(
+                {'error': 'No readings recorded for this tank'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        inventory['dispensed_total'] = tank.dispensed_total
+        return Response(inventory)
+    
+    @action(detail=True, methods=['get'])
+    def reconciliations(self, request, pk=None):
+        """Per-period reconciliations, newest first"""
+        tank = self.get_object()
+        queryset = tank.reconciliations.select_related('tank')
+        if str(request.query_params.get('exceptions_only', 'false')).lower() == 'true':
+            queryset = queryset.filter(within_tolerance=False)
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(TankReconciliationSerializer(page, many=True).data)
+        return Response(TankReconciliationSerializer(queryset, many=True).data)
+    
+    @action(detail=True, methods=['post'])
+    def reconcile(self, request, pk=None):
+        """Bring this tank's reconciliation up to date"""
+        tank = self.get_object()
+        rebuild = str(request.data.get('rebuild', 'false')).lower() == 'true'
+        return Response(reconcile_tank(tank, rebuild=rebuild))
+
+
+class TankDeliveryViewSet(viewsets.ModelViewSet):
+    """ViewSet for tank deliveries"""
+    
+    queryset = TankDelivery.objects.select_related('tank')
+    serializer_class = TankDeliverySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    
+    filterset_fields = {
+        'tank': ['exact'],
+        'tank__site': ['exact'],
+        'delivered_at': ['gte', 'lte', 'date'],
+    }
+    search_fields = ['supplier', 'ticket_number']
+    ordering_fields = ['delivered_at', 'volume']
+    ordering = ['-delivered_at']
+    
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+
+class TankReadingViewSet(viewsets.ModelViewSet):
+    """ViewSet for tank level readings; each new reading closes a period"""
+    
+    queryset = TankReading.objects.select_related('tank')
+    serializer_class = TankReadingSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    
+    filterset_fields = {
+        'tank': ['exact'],
+        'tank__site': ['exact'],
+        'source': ['exact'],
+        'reading_time': ['gte', 'lte', 'date'],
+    }
+    ordering_fields = ['reading_time', 'volume']
+    ordering = ['-reading_time']
+    
+    def perform_create(self, serializer):
+        reading = serializer.save(recorded_by=self.request.user)
+        reconcile_tank(reading.tank)
+    
+    def perform_update(self, serializer):
+        reading = serializer.save()
+        reconcile_tank(reading.tank)
+    
+    def perform_destroy(self, instance):
+        tank = instance.tank
+        instance.delete()
+        reconcile_tank(tank)
+
+
+class FuelCardViewSet(ExpandableQueryMixin, viewsets.ModelViewSet):
     """ViewSet for fuel cards"""
     
-    queryset = FuelCard.objects.select_related('assigned_asset')
+    queryset = FuelCard.objects.all()
     serializer_class = FuelCardSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -323,14 +405,16 @@ class FuelCardViewSet(viewsets.ModelViewSet):
     search_fields = ['card_last4', 'external_id']
     ordering_fields = ['provider', 'card_last4', 'status', 'created_at']
     ordering = ['provider', 'card_last4']
+    expansion_select_related = {'assigned_asset_details': ['assigned_asset']}
+    
+    def get_queryset(self):
+        return self.expand_queryset(super().get_queryset())
 
 
-class FuelAlertViewSet(viewsets.ModelViewSet):
+class FuelAlertViewSet(ExpandableQueryMixin, viewsets.ModelViewSet):
     """ViewSet for fuel alerts"""
     
-    queryset = FuelAlert.objects.select_related(
-        'asset', 'transaction', 'resolved_by'
-    )
+    queryset = FuelAlert.objects.all()
     serializer_class = FuelAlertSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -345,6 +429,14 @@ class FuelAlertViewSet(viewsets.ModelViewSet):
     search_fields = ['title', 'description', 'asset__asset_id']
     ordering_fields = ['created_at', 'severity', 'status', 'alert_type']
     ordering = ['-created_at']
+    expansion_select_related = {
+        'asset_details': ['asset'],
+        'transaction_details': ['transaction__asset', 'transaction__fuel_site', 'transaction__created_by'],
+        'resolved_by_details': ['resolved_by'],
+    }
+    
+    def get_queryset(self):
+        return self.expand_queryset(super().get_queryset())
     
     @action(detail=True, methods=['post'])
     def resolve(self, request, pk=None):
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import BackgroundJob
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'job_type', 'status', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['job_type', 'status']
+    readonly_fields = ['id', 'progress', 'result', 'error', 'worker', 'attempts',
+                       'created_at', 'started_at', 'finished_at', 'updated_at']
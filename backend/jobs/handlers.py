@@ -0,0 +1,53 @@
+"""
+Built-in job handlers for the CSV import endpoints and image processing
+"""
+from rest_framework import status
+
+from assets.images import process_asset_image
+from assets.importers import import_assets_csv
+from drivers.images import process_driver_photo
+from drivers.importers import import_drivers_csv
+from fuel.adapters import get_adapter
+from fuel.importers import FuelCSVImporter
+from .runner import register
+
+
+@register('asset_import')
+def run_asset_import(job, progress_callback):
+    with job.input_file.open('rb') as csv_file:
+        return import_assets_csv(csv_file, progress_callback=progress_callback)
+
+
+@register('driver_import')
+def run_driver_import(job, progress_callback):
+    with job.input_file.open('rb') as csv_file:
+        return import_drivers_csv(csv_file, progress_callback=progress_callback)
+
+
+@register('fuel_import')
+def run_fuel_import(job, progress_callback):
+    provider = job.params.get('provider')
+    with job.input_file.open('rb') as csv_file:
+        importer = FuelCSVImporter(
+            csv_file,
+            user=job.created_by,
+            chunk_size=job.params.get('chunk_size'),
+            progress_callback=progress_callback,
+            adapter=get_adapter(provider) if provider else None
+        )
+        try:
+            return importer.run(), status.HTTP_201_CREATED
+        except ValueError as e:
+            return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
+
+
+@register('asset_image')
+def run_asset_image(job, progress_callback):
+    result = process_asset_image(job.params['id'], job.params['source_hash'])
+    return {'image_status': result}, status.HTTP_200_OK
+
+
+@register('driver_photo')
+def run_driver_photo(job, progress_callback):
+    result = process_driver_photo(job.params['id'], job.params['source_hash'])
+    return {'photo_status': result}, status.HTTP_200_OK
@@ -0,0 +1,72 @@
+"""
+Management command running queued background jobs in a process pool
+"""
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import connections
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing
+import socket
+import os
+import time
+
+from jobs.runner import claim_next_job, recover_stale_jobs, renew_leases
+from jobs.worker import worker_init, execute
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (CSV imports) using a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'JOBS_WORKERS', 2),
+                            help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait between polls when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+
+        self.stdout.write(f'Starting job runner {worker_name} with {workers} worker(s)...')
+
+        # Spawned children get their own DB connections instead of sharing ours
+        context = multiprocessing.get_context('spawn')
+        running = {}  # future -> job id
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=worker_init) as pool:
+            try:
+                while True:
+                    # Keep our jobs' leases fresh and requeue those of dead runners
+                    renew_leases(list(running.values()))
+                    recover_stale_jobs()
+
+                    # Claim jobs until every worker is busy
+                    while len(running) < workers:
+                        job_id = claim_next_job(worker_name)
+                        if job_id is None:
+                            break
+                        connections.close_all()
+                        running[pool.submit(execute, job_id)] = job_id
+                        self.stdout.write(f'Started job {job_id}')
+
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        running.pop(future)
+                        try:
+                            self.stdout.write(f'Finished job {future.result()}')
+                        except Exception as e:
+                            self.stderr.write(f'Worker error: {e}')
+            except KeyboardInterrupt:
+                self.stdout.write('Shutting down, waiting for running jobs...')
+
+        self.stdout.write(self.style.SUCCESS('Job runner stopped'))
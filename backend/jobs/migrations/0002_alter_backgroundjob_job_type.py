@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='job_type',
+            field=models.CharField(choices=[('asset_import', 'Asset CSV Import'), ('driver_import', 'Driver CSV Import'), ('fuel_import', 'Fuel Transaction CSV Import'), ('asset_image', 'Asset Image Processing'), ('driver_photo', 'Driver Photo Processing')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import models
+from django.contrib.auth.models import User
+from django.utils import timezone
+import uuid
+
+
+class BackgroundJob(models.Model):
+    """Long-running work (imports, recomputes) executed by the run_jobs worker"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    JOB_TYPE_CHOICES = [
+        ('asset_import', 'Asset CSV Import'),
+        ('driver_import', 'Driver CSV Import'),
+        ('fuel_import', 'Fuel Transaction CSV Import'),
+        ('asset_image', 'Asset Image Processing'),
+        ('driver_photo', 'Driver Photo Processing'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job_type = models.CharField(max_length=50, choices=JOB_TYPE_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    
+    # Inputs
+    params = models.JSONField(default=dict, blank=True, help_text="Handler-specific parameters")
+    input_file = models.FileField(upload_to='jobs/inputs/%Y/%m/%d/', blank=True, null=True)
+    
+    # Outputs
+    progress = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    # Execution
+    worker = models.CharField(max_length=100, blank=True, help_text="Worker that claimed the job")
+    attempts = models.PositiveIntegerField(default=0)
+    
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='background_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['created_by', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_job_type_display()} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+    
+    @property
+    def duration_seconds(self):
+        """Wall-clock run time so far (or in total once finished)"""
+        if not self.started_at:
+            return None
+        end = self.finished_at or timezone.now()
+        return round((end - self.started_at).total_seconds(), 1)
+    
+    def update_progress(self, progress):
+        """Persist progress without touching other columns"""
+        self.progress = progress
+        BackgroundJob.objects.filter(pk=self.pk).update(progress=progress, updated_at=timezone.now())
@@ -0,0 +1,154 @@
+"""
+Job registry, queueing and execution for background jobs
+"""
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+from .models import BackgroundJob
+
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def register(job_type):
+    """
+    Decorator registering a handler for a job type.
+    Handlers are called as handler(job, progress_callback) and return
+    (result_data, http_status); a status of 400 or above marks the job failed.
+    """
+    def decorator(func):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+def get_handler(job_type):
+    return _handlers.get(job_type)
+
+
+def should_run_in_background(request, upload=None):
+    """
+    Decide whether an import request should be queued instead of run inline.
+    Clients can ask explicitly with background=true; uploads larger than
+    JOBS_BACKGROUND_THRESHOLD bytes are always queued.
+    """
+    requested = str(request.query_params.get(
+        'background', request.data.get('background', 'false')
+    )).lower() == 'true'
+    if requested:
+        return True
+
+    threshold = getattr(settings, 'JOBS_BACKGROUND_THRESHOLD', None)
+    return bool(upload is not None and threshold and upload.size > threshold)
+
+
+def enqueue(job_type, user=None, upload=None, params=None):
+    """Create a queued job, storing the uploaded file for the worker"""
+    if job_type not in _handlers:
+        raise ValueError(f'No handler registered for job type: {job_type}')
+
+    job = BackgroundJob(
+        job_type=job_type,
+        params=params or {},
+        created_by=user if user and user.is_authenticated else None,
+    )
+    if upload is not None:
+        job.input_file.save(upload.name, upload, save=False)
+    job.save()
+    return job
+
+
+def claim_next_job(worker_name):
+    """
+    Atomically move the oldest queued job to running and return its id.
+    The conditional UPDATE makes this safe with several workers polling.
+    """
+    candidates = BackgroundJob.objects.filter(status='queued').order_by('created_at')
+    for job_id in candidates.values_list('id', flat=True)[:10]:
+        claimed = BackgroundJob.objects.filter(pk=job_id, status='queued').update(
+            status='running',
+            worker=worker_name,
+            started_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            BackgroundJob.objects.filter(pk=job_id).update(attempts=F('attempts') + 1)
+            return job_id
+    return None
+
+
+def renew_leases(job_ids):
+    """Mark jobs this runner is still executing as alive (see recover_stale_jobs)"""
+    if job_ids:
+        BackgroundJob.objects.filter(pk__in=job_ids, status='running').update(updated_at=timezone.now())
+
+
+def recover_stale_jobs():
+    """
+    Requeue running jobs whose lease (updated_at, renewed by their runner and
+    by progress updates) is older than JOBS_LEASE_SECONDS - their worker
+    died. Jobs that already used JOBS_MAX_ATTEMPTS are marked failed instead.
+    Returns the number of jobs recovered.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'JOBS_LEASE_SECONDS', 600))
+    max_attempts = getattr(settings, 'JOBS_MAX_ATTEMPTS', 3)
+    stale = BackgroundJob.objects.filter(status='running', updated_at__lt=cutoff)
+
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status='failed',
+        error='The worker running this job stopped responding',
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status='queued',
+        worker='',
+        started_at=None,
+        updated_at=timezone.now(),
+    )
+    if failed or requeued:
+        logger.warning('Recovered stale jobs: %d requeued, %d failed', requeued, failed)
+    return failed + requeued
+
+
+def run_job(job_id):
+    """Execute a claimed job and record its outcome"""
+    close_old_connections()
+    job = BackgroundJob.objects.get(pk=job_id)
+    handler = get_handler(job.job_type)
+
+    try:
+        if handler is None:
+            raise ValueError(f'No handler registered for job type: {job.job_type}')
+
+        result, http_status = handler(job, job.update_progress)
+        failed = http_status >= 400
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            status='failed' if failed else 'completed',
+            result=result,
+            error=result.get('error', '') if failed and isinstance(result, dict) else '',
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if not failed and job.input_file:
+            job.input_file.delete(save=False)
+            BackgroundJob.objects.filter(pk=job.pk).update(input_file=None)
+    except Exception as e:
+        # The traceback stays in the server log; API clients see the message
+        logger.exception('Background job %s (%s) failed', job.pk, job.job_type)
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            status='failed',
+            error=str(e) or e.__class__.__name__,
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    finally:
+        close_old_connections()
+
+    return job_id
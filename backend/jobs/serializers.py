@@ -0,0 +1,20 @@
+from rest_framework import serializers
+from .models import BackgroundJob
+
+
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    job_type_display = serializers.CharField(source='get_job_type_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+    is_finished = serializers.ReadOnlyField()
+    duration_seconds = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            'id', 'job_type', 'job_type_display', 'status', 'status_display',
+            'params', 'progress', 'result', 'error', 'attempts',
+            'created_by', 'created_by_username', 'created_at', 'started_at',
+            'finished_at', 'updated_at', 'is_finished', 'duration_seconds'
+        ]
+        read_only_fields = fields
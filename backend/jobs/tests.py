@@ -0,0 +1,146 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User, Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework import status
+import shutil
+import tempfile
+
+from assets.models import Asset
+from .models import BackgroundJob
+from .runner import enqueue, claim_next_job, recover_stale_jobs, renew_leases, run_job
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+ASSET_CSV = (
+    'asset_id,vehicle_type,make,model,year\n'
+    'TRK-0001,truck,Ford,F-150,2022\n'
+    'TRK-0002,spaceship,Ford,F-150,2022\n'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BackgroundJobRunnerTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='testpass123')
+
+    def test_claim_and_run_asset_import(self):
+        upload = SimpleUploadedFile('assets.csv', ASSET_CSV.encode('utf-8'))
+        job = enqueue('asset_import', user=self.user, upload=upload)
+        self.assertEqual(job.status, 'queued')
+
+        self.assertEqual(claim_next_job('test-worker'), job.id)
+        self.assertIsNone(claim_next_job('test-worker'))
+        run_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.result['success_count'], 1)
+        self.assertEqual(job.result['error_count'], 1)
+        self.assertFalse(job.input_file)
+        self.assertTrue(Asset.objects.filter(asset_id='TRK-0001').exists())
+
+    def test_failed_import_marks_job_failed(self):
+        upload = SimpleUploadedFile('assets.csv', b'asset_id,make\nTRK-0001,Ford\n')
+        job = enqueue('asset_import', user=self.user, upload=upload)
+        claim_next_job('test-worker')
+        run_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Missing required columns', job.error)
+
+    def test_crash_error_hides_traceback(self):
+        upload = SimpleUploadedFile('assets.csv', ASSET_CSV.encode('utf-8'))
+        job = enqueue('asset_import', user=self.user, upload=upload)
+        claim_next_job('test-worker')
+        with mock.patch('jobs.handlers.import_assets_csv', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('jobs.runner', level='ERROR') as logs:
+            run_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'disk full')
+        self.assertIn('Traceback', logs.output[0])
+
+    @override_settings(JOBS_LEASE_SECONDS=60, JOBS_MAX_ATTEMPTS=2)
+    def test_stale_running_jobs_recovered(self):
+        job = enqueue('asset_import', user=self.user, upload=SimpleUploadedFile('a.csv', b'x'))
+        claim_next_job('dead-worker')
+        alive = enqueue('asset_import', user=self.user, upload=SimpleUploadedFile('b.csv', b'x'))
+        claim_next_job('live-worker')
+        long_ago = timezone.now() - timedelta(minutes=5)
+        BackgroundJob.objects.update(updated_at=long_ago)
+        renew_leases([alive.id])
+
+        with self.assertLogs('jobs.runner', level='WARNING'):
+            self.assertEqual(recover_stale_jobs(), 1)
+        job.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((job.status, job.worker), ('queued', ''))
+        self.assertEqual(alive.status, 'running')
+
+        # The second run's worker dies too: no more attempts left
+        self.assertEqual(claim_next_job('dead-worker'), job.id)
+        BackgroundJob.objects.filter(pk=job.pk).update(updated_at=long_ago)
+        with self.assertLogs('jobs.runner', level='WARNING'):
+            self.assertEqual(recover_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+
+    def test_unknown_job_type_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue('nonexistent', user=self.user)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BackgroundImportAPITestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='fleetadmin', password='testpass123')
+        self.user.groups.add(Group.objects.create(name='Admin'))
+        self.client.force_authenticate(user=self.user)
+
+    def test_background_import_returns_job(self):
+        upload = SimpleUploadedFile('drivers.csv', b'driver_id,first_name,last_name,email\n')
+        response = self.client.post(
+            '/api/drivers/drivers/bulk_import/',
+            {'file': upload, 'background': 'true'},
+            format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+
+        response = self.client.get(f"/api/jobs/{response.data['id']}/progress/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['is_finished'])
+
+    @override_settings(JOBS_BACKGROUND_THRESHOLD=10)
+    def test_large_upload_is_queued(self):
+        self.client.force_authenticate(user=User.objects.create_superuser(username='root', password='x'))
+        upload = SimpleUploadedFile('assets.csv', ASSET_CSV.encode('utf-8'))
+        response = self.client.post('/api/assets/bulk_import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(BackgroundJob.objects.get().job_type, 'asset_import')
+        self.assertFalse(Asset.objects.exists())
+
+    def test_jobs_are_private_to_their_owner(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        enqueue('asset_import', user=other)
+
+        self.client.force_authenticate(user=User.objects.create_user(username='viewer', password='x'))
+        response = self.client.get('/api/jobs/')
+        self.assertEqual(response.data['count'], 0)
@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import BackgroundJobViewSet
+
+# Create router and register viewsets
+router = DefaultRouter()
+router.register(r'', BackgroundJobViewSet, basename='background-jobs')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,36 @@
+from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django_filters.rest_framework import DjangoFilterBackend
+
+from .models import BackgroundJob
+from .serializers import BackgroundJobSerializer
+
+
+class BackgroundJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for polling background job status and results"""
+    
+    serializer_class = BackgroundJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['job_type', 'status']
+    
+    def get_queryset(self):
+        """Users see their own jobs; admins see everything"""
+        queryset = BackgroundJob.objects.select_related('created_by')
+        user = self.request.user
+        if user.is_superuser or user.groups.filter(name='Admin').exists():
+            return queryset
+        return queryset.filter(created_by=user)
+    
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """Lightweight status/progress payload for polling"""
+        job = self.get_object()
+        return Response({
+            'id': job.id,
+            'status': job.status,
+            'progress': job.progress,
+            'is_finished': job.is_finished,
+            'duration_seconds': job.duration_seconds,
+        })
@@ -0,0 +1,20 @@
+"""
+Entry points for run_jobs worker processes.
+
+Workers are spawned fresh, so this module must stay importable before
+Django is set up: anything touching models is imported inside functions.
+"""
+import os
+
+
+def worker_init():
+    """Set up Django in a freshly spawned worker process"""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+
+def execute(job_id):
+    """Run a claimed job inside the worker process"""
+    from .runner import run_job
+    return run_job(job_id)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.utils import timezone
+from assets.images import image_srcset
 from assets.models import Asset
 from .models import LocationUpdate, LocationZone, AssetLocationSummary
 
@@ -139,7 +140,8 @@ class AssetLocationSummarySerializer(serializers.ModelSerializer):
             'vehicle_type': obj.asset.vehicle_type,
             'status': obj.asset.status,
             'department': obj.asset.department,
-            'thumbnail': obj.asset.thumbnail.url if obj.asset.thumbnail else None
+            'thumbnail': obj.asset.thumbnail.url if obj.asset.thumbnail else None,
+            'image_srcset': image_srcset(obj.asset.image_variants)
         }
     
     def get_zone_details(self, obj):
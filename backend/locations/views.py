@@ -8,6 +8,8 @@ from django.utils import timezone
 from datetime import timedelta
 from assets.models import Asset
 from authentication.permissions import GranularLocationPermission, GranularZonePermission
+from authentication.filters import ScopeFilterBackend
+from authentication.audit_middleware import AuditedViewSetMixin
 
 from .models import LocationUpdate, LocationZone, AssetLocationSummary
 from .serializers import (
@@ -20,14 +22,18 @@ from .serializers import (
 )
 
 
-class LocationUpdateViewSet(viewsets.ModelViewSet):
+class LocationUpdateViewSet(AuditedViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing location updates
     """
     queryset = LocationUpdate.objects.select_related('asset').all()
     serializer_class = LocationUpdateSerializer
     permission_classes = [GranularLocationPermission]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [ScopeFilterBackend, DjangoFilterBackend, SearchFilter, OrderingFilter]
+    scope_fields = {
+        'department': 'asset__department', 'vehicle_type': 'asset__vehicle_type', 'asset_id': 'asset__asset_id'
+    }
+    scope_view_all_permission = 'locations.view_all'
     
     # Filtering options
     filterset_fields = ['source', 'asset__vehicle_type', 'asset__status']
@@ -75,6 +81,7 @@ class LocationUpdateViewSet(viewsets.ModelViewSet):
         summaries = AssetLocationSummary.objects.select_related(
             'asset', 'current_zone'
         ).all()
+        summaries = ScopeFilterBackend().filter_queryset(request, summaries, self)
         
         # Filter by asset status if requested
         status_filter = request.query_params.get('status')
@@ -245,7 +252,9 @@ class AssetLocationSummaryViewSet(viewsets.ReadOnlyModelViewSet):
     ).all()
     serializer_class = AssetLocationSummarySerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [ScopeFilterBackend, DjangoFilterBackend, SearchFilter]
+    scope_fields = LocationUpdateViewSet.scope_fields
+    scope_view_all_permission = 'locations.view_all'
     
     filterset_fields = ['source', 'asset__vehicle_type', 'asset__status']
     search_fields = ['asset__asset_id', 'address']
@@ -274,7 +283,7 @@ class AssetLocationSummaryViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def map_data(self, request):
         """Optimized endpoint for map display"""
-        queryset = self.get_queryset()
+        queryset = ScopeFilterBackend().filter_queryset(request, self.get_queryset(), self)
         
         # Only include assets with recent locations (last 24 hours by default)
         hours = request.query_params.get('within_hours', 24)